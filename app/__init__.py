@@ -6,14 +6,26 @@ HackShop 应用工厂入口模块。
 2. 创建 Flask 应用实例并加载配置
 3. 初始化日志系统（控制台 + 文件轮转）
 4. 绑定 SQLAlchemy ORM 与 Flask-Migrate 数据库迁移
-5. 注册各业务蓝图（前台、认证、订单、用户中心、管理后台）
+5. 加载静态资源 manifest（指纹化 + 预压缩，见 scripts/build_assets.py）
+6. 启用动态响应压缩（gzip / brotli 协商，见 app/utils/compression.py）
+7. 注册商品图片衍生尺寸模板过滤器（image_src / image_srcset）
+8. 启动站内信发件箱投递、购物车回写、库存结算与超时订单取消线程
+   （见 app/utils/outbox.py、app/utils/cart.py、app/utils/inventory.py、app/utils/order_expiry.py）
+9. 注册各业务蓝图（前台、认证、订单、用户中心、管理后台）
 """
 
 from flask import Flask
 from flask_migrate import Migrate
 from app.config import Config
 from app.models.db import db
+from app.utils.assets import init_assets
+from app.utils.cart import init_cart
+from app.utils.compression import init_compression
+from app.utils.images import init_images
+from app.utils.inventory import init_inventory
 from app.utils.logging_config import init_logging
+from app.utils.order_expiry import init_order_expiry
+from app.utils.outbox import init_outbox
 
 
 def create_app(config_class=Config):
@@ -23,6 +35,13 @@ def create_app(config_class=Config):
     init_logging()
     db.init_app(application)
     Migrate(application, db)
+    init_assets(application)
+    init_compression(application)
+    init_images(application)
+    init_outbox(application)
+    init_cart(application)
+    init_inventory(application)
+    init_order_expiry(application)
 
     from app.controller.main import main_bp
     from app.controller.auth import auth_bp
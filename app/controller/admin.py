@@ -10,6 +10,7 @@
 - 储值券生成
 - 批量商品导入（Excel / JSON URL）
 - 系统设置
+- 运行指标（/admin/metrics：目录缓存、整页缓存命中率、响应压缩率、库存预占等）
 
 相关漏洞：
 - V-Admin-AES：前端硬编码 AES 密钥加密管理员密码，可被逆向破解
@@ -32,6 +33,15 @@ from sqlalchemy.exc import SQLAlchemyError
 from sqlalchemy.orm import joinedload, selectinload
 
 from app.models.db import Admin, Goods, Order, User, Voucher, db, GOODS_ON_SALE, GOODS_OFF_SALE, VOUCHER_UNUSED
+from app.utils.catalog_cache import bump_catalog_version, cache_stats
+from app.utils.compression import compression_stats
+from app.utils.db import redis_stats
+from app.utils.images import schedule_variants
+from app.utils.inventory import inventory_stats, reset_available
+from app.utils.order_expiry import expiry_stats
+from app.utils.order_history import invalidate_order_history
+from app.utils.outbox import outbox_stats
+from app.utils.page_cache import page_cache_stats
 from app.utils.tools import admin_auth, generate_uuid_hex, get_order_status_meta, is_admin_login, unique_filename
 
 try:
@@ -53,18 +63,22 @@ def _upload_dir() -> str:
 
 
 def _save_uploaded_image(file_storage):
-    # 图片上传仅负责存储与回写路径，校验在业务层处理。
+    # 图片上传仅负责存储与回写路径，校验在业务层处理；缩略图 / WebP 等衍生图在后台线程生成。
     if not file_storage or not file_storage.filename:
         return ""
     filename = unique_filename(file_storage.filename)
     file_storage.save(os.path.join(_upload_dir(), filename))
-    return "/uploads/" + filename
+    url = "/uploads/" + filename
+    schedule_variants(url)
+    return url
 
 
-def _commit_or_flash(success_msg: str, error_log: str, redirect_endpoint: str):
-    # 后台表单提交统一事务与提示处理，减少重复代码。
+def _commit_or_flash(success_msg: str, error_log: str, redirect_endpoint: str, on_success=None):
+    # 后台表单提交统一事务与提示处理，减少重复代码；on_success 仅在提交成功后执行。
     try:
         db.session.commit()
+        if on_success:
+            on_success()
         flash(success_msg, "success")
     except SQLAlchemyError:
         db.session.rollback()
@@ -227,6 +241,17 @@ def settings():
     return render_template("admin/settings.html")
 
 
+@admin_bp.route("/metrics")
+@is_admin_login
+def metrics():
+    # 运行指标（JSON）：目录缓存 / 整页缓存命中率、各端点响应压缩率与 CPU 开销、
+    # 当前 worker 的 Redis 连接池占用与分命令耗时、站内信发件箱队列深度 / 批大小 / 投递延迟、
+    # 库存模式与预占 / 待结算数量、超时订单取消的累计数量与吞吐。
+    return jsonify({"catalog_cache": cache_stats(), "page_cache": page_cache_stats(),
+                    "compression": compression_stats(), "redis": redis_stats(), "mail_outbox": outbox_stats(),
+                    "inventory": inventory_stats(), "order_expiry": expiry_stats()})
+
+
 @admin_bp.route("/vouchers")
 @is_admin_login
 def vouchers():
@@ -275,7 +300,7 @@ def product_add():
         mainimg=_save_uploaded_image(request.files.get("image")) or "https://images.unsplash.com/photo-1523275335684-37898b6baf30?w=800",
     )
     db.session.add(goods)
-    return _commit_or_flash("商品添加成功", "product_add commit failed", "admin.products")
+    return _commit_or_flash("商品添加成功", "product_add commit failed", "admin.products", on_success=bump_catalog_version)
 
 
 @admin_bp.route("/product/<int:goods_id>/edit", methods=["POST"])
@@ -298,7 +323,12 @@ def product_edit(goods_id):
     if new_img:
         goods.mainimg = new_img
 
-    return _commit_or_flash("商品更新成功", "product_edit commit failed", "admin.products")
+    def on_success():
+        bump_catalog_version()
+        # reserve 模式下 Redis 可用库存按新的 goods.stock 重建（direct 模式下该键不存在）。
+        reset_available(goods_id)
+
+    return _commit_or_flash("商品更新成功", "product_edit commit failed", "admin.products", on_success=on_success)
 
 
 @admin_bp.route("/product/<int:goods_id>/toggle", methods=["POST"])
@@ -306,7 +336,7 @@ def product_edit(goods_id):
 def product_toggle(goods_id):
     goods = Goods.query.get_or_404(goods_id)
     goods.status = GOODS_OFF_SALE if (goods.status or GOODS_ON_SALE) == GOODS_ON_SALE else GOODS_ON_SALE
-    return _commit_or_flash("商品状态已更新", "product_toggle commit failed", "admin.products")
+    return _commit_or_flash("商品状态已更新", "product_toggle commit failed", "admin.products", on_success=bump_catalog_version)
 
 
 @admin_bp.route("/product/<int:goods_id>/delete", methods=["POST"])
@@ -314,7 +344,7 @@ def product_toggle(goods_id):
 def product_delete(goods_id):
     goods = Goods.query.get_or_404(goods_id)
     goods.status = "1"  # 软删除，避免订单外键冲突。
-    return _commit_or_flash("商品已下架", "product_delete commit failed", "admin.products")
+    return _commit_or_flash("商品已下架", "product_delete commit failed", "admin.products", on_success=bump_catalog_version)
 
 
 @admin_bp.route("/order/<order_number>/status", methods=["POST"])
@@ -330,7 +360,8 @@ def order_update_status(order_number):
     order.payment_status = next_status
     if next_status == "paid" and not order.paid_at:
         order.paid_at = datetime.now()
-    return _commit_or_flash("订单状态已更新", "order_update_status commit failed", "admin.orders")
+    return _commit_or_flash("订单状态已更新", "order_update_status commit failed", "admin.orders",
+                            on_success=lambda: invalidate_order_history(order.user_id))
 
 
 @admin_bp.route("/logout")
@@ -434,6 +465,7 @@ def products_batch_import():
             imported += 1
 
         db.session.commit()
+        bump_catalog_version()
         return jsonify({"success": True, "imported": imported})
     except Exception:
         db.session.rollback()
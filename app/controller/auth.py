@@ -12,16 +12,17 @@
 - V-Host-Inject：密码重置链接直接使用请求 Host 头拼接，可被篡改指向恶意域名
 
 before_app_request 钩子：
-  每次请求前根据 session['user_id'] 从数据库加载用户对象到 g.user，
-  供其他蓝图和模板直接使用。
+  每次请求前根据 session['user_id'] 设置 g.user（Redis 缓存的用户快照，见 app/utils/identity.py），
+  供其他蓝图和模板直接使用；静态资源 / 上传文件 / 健康检查请求跳过。
 """
 
 import logging
 
-from flask import Blueprint, g, jsonify, redirect, render_template, request, session, url_for
+from flask import Blueprint, jsonify, redirect, render_template, request, session, url_for
 
 from app.models.db import User, db
 from app.utils.db import redis_client
+from app.utils.identity import invalidate_user, load_identity
 from app.utils.tools import authenticate_user, request_data, safe_commit, send_reset_url, verify_email_code
 
 # 认证蓝图：登录、注册、找回密码与重置密码流程。
@@ -31,9 +32,8 @@ logger = logging.getLogger(__name__)
 
 @auth_bp.before_app_request
 def load_logged_in_user():
-    # 将当前登录用户写入 g.user，供其他路由直接读取。
-    user_id = session.get("user_id")
-    g.user = db.session.get(User, user_id) if user_id is not None else None
+    # 将当前登录用户快照写入 g.user，供其他路由直接读取；需要修改用户时用 current_user_for_update()。
+    load_identity()
 
 
 @auth_bp.route("/user/login", methods=["GET", "POST"])
@@ -143,4 +143,5 @@ def reset_password(token):
     if err:
         return err
     redis_client.delete(f"reset_token:{token}")
+    invalidate_user(user.id)
     return jsonify({"status": "ok", "message": "密码重置成功"}), 200
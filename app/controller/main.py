@@ -2,27 +2,56 @@
 前台主站蓝图（Main Blueprint）。
 
 功能：
-- 首页商品展示（分页 + 分类筛选）
+- 首页商品展示（服务端分面筛选 + 排序 + keyset 游标分页，分面计数见 app/utils/facets.py）
 - 商品详情页（轮播图、规格、推荐）
-- 搜索（关键词 + 分类 + 排序）
-- 站内信收件箱（inbox）
-- 邮箱验证码发送
+- 搜索（进程内倒排索引 + BM25 排序 + 分页，见 app/utils/search.py）
+- 搜索联想（/api/suggest，有序数组前缀索引，见 app/utils/suggest.py）
+- 站内信收件箱（inbox：id keyset 分页 + /api/mails/wait 长轮询推送新邮件，见 app/utils/mailbox.py）
+- 邮箱验证码发送（邮件进入发件箱，后台批量写库，见 app/utils/outbox.py）
 - 文件上传（商品图片等）
+- 健康检查（/healthz）
 - 系统初始化（/setup：创建管理员 + 导入 product.json）
 
+首页 / 商品详情 / 搜索页对匿名访客启用整页缓存（app/utils/page_cache.py）；
+首页、商品详情、/api/goods、/api/mails 支持 ETag / Last-Modified 条件请求（app/utils/http_cache.py）。
+
 相关漏洞：
 - V-SSRF：管理后台批量导入拉取外部 URL 时存在 SSRF 风险
 """
 
+import hashlib
 import json
 import logging
 import os
+import time
 
-from flask import Blueprint, abort, flash, jsonify, redirect, render_template, request, send_from_directory, url_for
+from flask import Blueprint, abort, flash, jsonify, redirect, render_template, request, send_from_directory, session, url_for
+from redis.exceptions import RedisError
 from sqlalchemy.exc import SQLAlchemyError
 
-from app.models.db import Admin, Goods, GoodsImage, GoodsSpec, MailLog, db, GOODS_ON_SALE
+from app.models.db import Admin, Goods, GoodsImage, GoodsSpec, MailLog, db
+from app.utils.catalog import clamp_page_size, get_goods_detail, get_goods_page, normalize_sort
+from app.utils.catalog_cache import bump_catalog_version, catalog_version
 from app.utils.db import redis_client
+from app.utils.facets import facet_index
+from app.utils.http_cache import conditional_get
+from app.utils.images import responsive_image
+from app.utils.mailbox import (
+    MAIL_MAX_PAGE_SIZE,
+    MAIL_PAGE_SIZE,
+    MAIL_RETRY_AFTER,
+    MAIL_WAIT_TIMEOUT,
+    bump_mail_version,
+    clamp_mail_limit,
+    fetch_mails,
+    mail_dict,
+    mail_notifier,
+    mail_version,
+)
+from app.utils.outbox import enqueue_mail
+from app.utils.page_cache import cache_anonymous_page
+from app.utils.search import search_index
+from app.utils.suggest import suggest_index
 from app.utils.tools import generate_mailcode, request_data, safe_commit
 
 
@@ -31,42 +60,144 @@ main_bp = Blueprint("main", __name__)
 logger = logging.getLogger(__name__)
 
 
+def _listing_args():
+    # 首页与列表接口共用的分面筛选/排序/游标参数。
+    return {
+        "category": (request.args.get("category") or "").strip() or None,
+        "brand": (request.args.get("brand") or "").strip() or None,
+        "price": (request.args.get("price") or "").strip() or None,
+        "in_stock": request.args.get("in_stock") in ("1", "on", "true"),
+        "sort": normalize_sort(request.args.get("sort", "default")),
+        "cursor": request.args.get("cursor") or None,
+    }
+
+
+def _is_anonymous_page_request() -> bool:
+    # 个性化页面（已登录导航栏、flash 消息）不参与 HTTP 协商缓存。
+    return not session.get("user_id") and "_flashes" not in session
+
+
+def _url_digest() -> str:
+    return hashlib.sha1(request.full_path.rstrip("?").encode("utf-8")).hexdigest()[:16]
+
+
+def _listing_validators(limit=None):
+    # 列表内容只取决于目录版本号与 URL；Last-Modified 取本页商品的最大 updated_at，
+    # limit 须与视图一致，保证取的是同一页。
+    try:
+        version = catalog_version()
+    except RedisError:
+        return None
+    goods, _ = get_goods_page(limit=limit, **_listing_args())
+    last_modified = max((g["updated_at"] for g in goods if g.get("updated_at")), default=None)
+    return f"list-{version}-{_url_digest()}", last_modified
+
+
+def _index_validators():
+    return _listing_validators() if _is_anonymous_page_request() else None
+
+
+def _api_goods_validators():
+    return _listing_validators(limit=request.args.get("per_page"))
+
+
+def _product_validators(id):
+    # 行版本：商品 id + updated_at，来自缓存的商品记录，不加载 ORM 对象。
+    if not _is_anonymous_page_request():
+        return None
+    product = get_goods_detail(id)
+    if not product:
+        return None
+    return f"goods-{id}-{product.get('updated_at')}", product.get("updated_at")
+
+
+def _mails_validators():
+    try:
+        return f"mails-{mail_version()}-{_url_digest()}", None
+    except RedisError:
+        return None
+
+
 @main_bp.route("/", methods=["GET"])
+@conditional_get(_index_validators)
+@cache_anonymous_page
 def index():
-    # 首页仅展示上架商品（status=0）。
-    return render_template("main/index.html", goods=Goods.query.filter_by(status=GOODS_ON_SALE).all())
+    # 首页仅展示上架商品（status=0）的第一页，后续页由 /api/goods 按游标加载。
+    args = _listing_args()
+    goods, next_cursor = get_goods_page(**args)
+    return render_template(
+        "main/index.html",
+        goods=goods,
+        next_cursor=next_cursor,
+        filters=args,
+        facets=facet_index.counts(args["category"]),
+    )
+
+
+@main_bp.route("/api/facets", methods=["GET"])
+def api_facets():
+    # 分面计数：内存增量维护，与商品总量无关。
+    return jsonify(facet_index.counts((request.args.get("category") or "").strip() or None))
+
+
+@main_bp.route("/api/goods", methods=["GET"])
+@conditional_get(_api_goods_validators)
+def api_goods():
+    # 首页"加载更多"接口：服务端筛选 + 排序 + keyset 分页。
+    args = _listing_args()
+    goods, next_cursor = get_goods_page(limit=request.args.get("per_page"), **args)
+    items = [dict(item, image=responsive_image(item["mainimg"])) for item in goods]
+    return jsonify({"items": items, "next_cursor": next_cursor})
 
 
 @main_bp.route("/product-detail/<int:id>", methods=["GET"])
+@conditional_get(_product_validators)
+@cache_anonymous_page
 def product_detail(id):
-    product = db.session.get(Goods, id)
+    product = get_goods_detail(id)
     if not product:
         abort(404)
     return render_template("main/product-detail.html", product=product)
 
 
+SEARCH_PAGE_SIZE = 20
+
+
 @main_bp.route("/search/<query>", methods=["GET"])
+@cache_anonymous_page
 def search(query):
-    # 搜索不到时回退到最近商品，避免空页影响演示流程。
-    like_kw = f"%{query}%"
-    product = (
-        Goods.query.filter(
-            Goods.status == GOODS_ON_SALE,
-            (Goods.goodsname.ilike(like_kw)) | (Goods.category.ilike(like_kw)),
-        )
-        .order_by(Goods.id.desc())
-        .first()
-    ) or Goods.query.filter_by(status=GOODS_ON_SALE).order_by(Goods.id.desc()).first()
+    # 倒排索引检索（BM25 排序），替代 ILIKE '%q%' 全表扫描，支持多结果分页。
+    page = max(request.args.get("page", 1, type=int), 1)
+    results, total = search_index.search(query, page=page, per_page=SEARCH_PAGE_SIZE)
+    pages = (total + SEARCH_PAGE_SIZE - 1) // SEARCH_PAGE_SIZE
+    data = {"page": page, "pages": pages, "total": total, "query": query}
+    return render_template("main/search.html", data=data, results=results)
 
-    if not product:
-        abort(404)
-    return render_template("main/search.html", data={"page": "search page", "query": query}, product=product)
+
+@main_bp.route("/api/search", methods=["GET"])
+def api_search():
+    query = (request.args.get("q") or "").strip()
+    page = max(request.args.get("page", 1, type=int), 1)
+    per_page = clamp_page_size(request.args.get("per_page"), default=SEARCH_PAGE_SIZE)
+    results, total = search_index.search(query, page=page, per_page=per_page)
+    return jsonify({"items": results, "total": total, "page": page, "per_page": per_page})
+
+
+@main_bp.route("/api/suggest", methods=["GET"])
+def api_suggest():
+    # 搜索联想：内存前缀索引，按销量排序；Server-Timing 头给出服务端耗时。
+    start = time.perf_counter()
+    items = suggest_index.suggest(request.args.get("q", ""), limit=request.args.get("limit", type=int))
+    response = jsonify({"items": items})
+    response.headers["Server-Timing"] = f"suggest;dur={(time.perf_counter() - start) * 1000:.3f}"
+    return response
 
 
 @main_bp.route("/inbox", methods=["GET", "POST"])
 def inbox():
-    mails = MailLog.query.order_by(MailLog.created_at.desc()).all()
-    return render_template("main/inbox.html", mail_list=mails)
+    # 只渲染最新一页，历史邮件由"加载更多"按 id keyset 分页拉取，新邮件由长轮询推送。
+    mails, next_before_id = fetch_mails(limit=MAIL_PAGE_SIZE)
+    return render_template("main/inbox.html", mail_list=mails, next_before_id=next_before_id)
 
 
 @main_bp.route("/send_mail", methods=["POST"])
@@ -79,50 +210,57 @@ def send_mail():
 
     code = generate_mailcode()
     redis_client.setex(f"mailcode:{email}", 600, code)
-    db.session.add(
-        MailLog(
+    # 邮件进入发件箱，由后台线程批量写库并推送，请求内不再单独提交事务。
+    try:
+        enqueue_mail(
             subject="验证码",
             sender="system@hackshop.local",
             receiver=email,
             content=f"{email}，您的验证码是：{code}。",
         )
-    )
-    err = safe_commit("send_mail commit failed", (jsonify({"status": "error", "message": "验证码发送失败，请稍后重试"}), 500))
-    if err:
-        return err
+    except SQLAlchemyError:
+        logger.exception("send_mail enqueue failed")
+        return jsonify({"status": "error", "message": "验证码发送失败，请稍后重试"}), 500
     return jsonify({"status": "ok", "message": "验证码已发送", "email": email}), 200
 
 
 @main_bp.route("/api/mails", methods=["GET"])
+@conditional_get(_mails_validators)
 def api_mails():
+    # 按 id 做 keyset 分页（before_id 翻历史 / since_id 取新邮件），不再 OFFSET + COUNT(*)。
+    before_id = request.args.get("before_id", type=int)
     since_id = request.args.get("since_id", type=int)
-    page = request.args.get("page", 1, type=int)
-    per_page = request.args.get("per_page", 50, type=int)
-    per_page = min(per_page, 100)  # 限制单次最大返回量
-
-    query = MailLog.query
-    if since_id:
-        query = query.filter(MailLog.id > since_id)
-    pagination = query.order_by(MailLog.created_at.desc()).paginate(page=page, per_page=per_page, error_out=False)
-    return jsonify(
-        {
-            "items": [
-                {
-                    "id": m.id,
-                    "subject": m.subject,
-                    "sender": m.sender,
-                    "receiver": m.receiver,
-                    "content": m.content,
-                    "created_at": m.created_at.strftime("%Y-%m-%d %H:%M:%S"),
-                    "is_read": m.is_read,
-                }
-                for m in pagination.items
-            ],
-            "total": pagination.total,
-            "page": pagination.page,
-            "pages": pagination.pages,
-        }
-    )
+    mails, next_cursor = fetch_mails(before_id=before_id, since_id=since_id,
+                                     limit=clamp_mail_limit(request.args.get("per_page")))
+    if since_id is not None and not before_id:
+        return jsonify({"items": [mail_dict(m) for m in mails], "next_since_id": next_cursor})
+    return jsonify({"items": [mail_dict(m) for m in mails], "next_before_id": next_cursor})
+
+
+@main_bp.route("/api/mails/wait", methods=["GET"])
+def api_mails_wait():
+    # 长轮询：有比 since_id 更新的邮件立即返回，否则挂起到新邮件通知或超时。
+    since_id = max(request.args.get("since_id", 0, type=int), 0)
+    timeout = min(max(request.args.get("timeout", MAIL_WAIT_TIMEOUT, type=int), 1), MAIL_WAIT_TIMEOUT)
+    # 先记下已通知的最大 id 再查询：不大于它的邮件在查询前均已提交，查询结果必然包含。
+    notified = mail_notifier.latest_id
+    mails, truncated = fetch_mails(since_id=since_id, limit=MAIL_MAX_PAGE_SIZE)
+    retry_after = None
+    if not mails:
+        woke = mail_notifier.wait(since_id, timeout)
+        if woke is None:
+            retry_after = MAIL_RETRY_AFTER
+        elif woke:
+            notified = mail_notifier.latest_id
+            mails, truncated = fetch_mails(since_id=since_id, limit=MAIL_MAX_PAGE_SIZE)
+    if mails:
+        # 游标只前进到本次实际返回的最大 id；超过一批时客户端立即再取下一批。
+        cursor = mails[0].id
+    else:
+        # 没有可返回的邮件时游标随通知前进，对应邮件已被归档也不会反复立即返回。
+        cursor = max(since_id, notified)
+    return jsonify({"items": [mail_dict(m) for m in mails], "cursor": cursor, "retry_after": retry_after,
+                    "has_more": truncated is not None})
 
 
 @main_bp.route("/api/mail/<int:mail_id>/read", methods=["POST"])
@@ -138,9 +276,16 @@ def api_mail_read(mail_id: int):
     err = safe_commit("api_mail_read commit failed", (jsonify({"status": "error", "message": "更新邮件状态失败"}), 500))
     if err:
         return err
+    bump_mail_version()
     return jsonify({"status": "ok", "id": mail.id, "is_read": mail.is_read})
 
 
+@main_bp.route("/healthz", methods=["GET"])
+def healthz():
+    # 存活探针：不访问 session / 数据库（见 app/utils/identity.py 的 ANONYMOUS_ENDPOINTS）。
+    return jsonify({"status": "ok"})
+
+
 @main_bp.route("/uploads/<path:filename>")
 def uploads(filename):
     upload_dir = os.path.join(os.path.dirname(__file__), "..", "uploads")
@@ -235,6 +380,8 @@ def setup():
 
         try:
             db.session.commit()
+            if imported:
+                bump_catalog_version()
             # 初始化成功后用 lock 文件防止重复导入。
             if can_init and os.path.exists(json_path):
                 try:
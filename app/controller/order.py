@@ -2,30 +2,52 @@
 订单蓝图（Order Blueprint）。
 
 功能：
-- 购物车操作：添加、减少、更新数量、单个移除、批量移除
-- 购物车结算：选中商品 → 创建待支付订单
-- 订单支付：余额扣款 + 库存扣减
+- 购物车操作：添加、减少、更新数量、单个移除、批量移除（存储引擎见 app/utils/cart.py，行标识为商品 ID）
+- 购物车结算：选中商品 → 创建待支付订单（订单一条 INSERT、明细一条多行 INSERT，金额 Decimal 精确合计）
+- 订单支付：余额扣款 + 库存扣减（INVENTORY_MODE=reserve 时改为 Redis 原子预占 + 异步结算，见 app/utils/inventory.py）
 
 相关漏洞：
 - V-CSRF-Pay：支付表单未携带 CSRF Token，可被跨站伪造支付请求
-- V-Race-Condition：扣减库存时未加锁，并发请求可导致超卖
+- V-Race-Condition：扣减库存时未加锁，并发请求可导致超卖（默认 direct 模式）
 - V-IDOR-View：支付接口仅按订单 ID 查询，未校验当前用户是否为订单所有者
 
+结算与支付接口支持可选的 Idempotency-Key 请求头（IDEMPOTENCY_ENABLED=1 时生效，见 app/utils/idempotency.py）。
+
 app_context_processor：
-  将购物车商品数量 cart_count 注入所有模板上下文，
-  使导航栏可直接显示购物车角标。
+  将购物车商品数量 cart_count 以惰性代理注入所有模板上下文，
+  使导航栏可直接显示购物车角标；未渲染角标的模板不读取计数。
 """
 
 import logging
 from datetime import datetime
-from uuid import uuid4
+from decimal import Decimal
 
-from flask import Blueprint, abort, g, jsonify, redirect, render_template, request, url_for
+from flask import Blueprint, abort, g, jsonify, redirect, render_template, request, session, url_for
+from redis.exceptions import RedisError
+from sqlalchemy import insert, update
 from sqlalchemy.exc import SQLAlchemyError
-from sqlalchemy.orm import joinedload
-
-from app.models.db import CartItem, Goods, Order, OrderItem, db
-from app.utils.tools import generate_uuid_hex, is_login
+from werkzeug.local import LocalProxy
+
+from app.models.db import Goods, Order, OrderItem, db
+from app.utils.cart import cart_store
+from app.utils.catalog import get_goods_detail
+from app.utils.catalog_cache import bump_catalog_version, invalidate_goods
+from app.utils.identity import current_user_for_update, invalidate_user
+from app.utils.idempotency import idempotent
+from app.utils.inventory import (
+    INSUFFICIENT,
+    RESERVED,
+    add_settlements,
+    confirm_reservation,
+    hold_items,
+    inventory_mode,
+    release_reservation,
+    reserve_stock,
+)
+from app.utils.order_history import invalidate_order_history
+from app.utils.order_ids import generate_order_id, order_id_datetime
+from app.utils.page_cache import purge_page
+from app.utils.tools import is_login
 
 
 # 订单蓝图：购物车、创建订单与支付流程。
@@ -47,9 +69,9 @@ def _parse_positive_int(raw, default=1):
         return default
 
 
-def _generate_order_number(user_id: int) -> str:
-    # 避免同一用户同一秒多次下单导致 order_number 唯一键冲突。
-    return f"{datetime.now():%Y%m%d%H%M%S%f}{int(user_id):04d}{uuid4().hex[:6]}"
+def _generate_order_number(order_id: str) -> str:
+    # 订单号 = 下单日期 + 订单主键：主键全局唯一，订单号随之唯一，且同样按时间有序。
+    return f"{order_id_datetime(order_id):%Y%m%d}{order_id}"
 
 
 def _auth_required_json():
@@ -69,37 +91,57 @@ def _json_db_error(log_key: str, message: str):
     return jsonify({"success": False, "message": message}), 500
 
 
+def _cart_goods_ids(raw_ids):
+    # 购物车行标识即商品 ID；前端可能传字符串，非法值直接忽略。
+    ids = []
+    for raw in raw_ids if isinstance(raw_ids, list) else []:
+        try:
+            ids.append(int(raw))
+        except (TypeError, ValueError):
+            continue
+    return ids
+
+
+def _cart_count_for_template() -> int:
+    # 每个请求最多读取一次，结果缓存在 g 上。
+    if "cart_count" not in g:
+        g.cart_count = 0
+        if getattr(g, "user", None):
+            try:
+                g.cart_count = cart_store.count(g.user.id)
+            except (SQLAlchemyError, RedisError):
+                logger.exception("inject_cart_count failed")
+    return g.cart_count
+
+
 @order_bp.app_context_processor
 def inject_cart_count():
-    # 将购物车数量注入模板，减少页面重复查询逻辑。
-    if hasattr(g, "user") and g.user:
-        try:
-            return dict(cart_count=CartItem.query.filter_by(user_id=g.user.id).count())
-        except SQLAlchemyError:
-            logger.exception("inject_cart_count failed")
-    return dict(cart_count=0)
+    # 将购物车数量注入模板：惰性代理，只有模板真正渲染 cart_count（导航栏角标）时才读取计数器。
+    return dict(cart_count=LocalProxy(_cart_count_for_template))
 
 
 @order_bp.route("/cart")
 def cart():
     if not g.user:
         return redirect(url_for("auth.login"))
-    cart_items = CartItem.query.options(joinedload(CartItem.goods)).filter_by(user_id=g.user.id).all()
+    quantities = cart_store.items(g.user.id)
+    goods_by_id = {goods.id: goods for goods in Goods.query.filter(Goods.id.in_(list(quantities))).all()} if quantities else {}
     items_data = []
-    for item in cart_items:
-        if not item.goods:
+    for goods_id, quantity in quantities.items():
+        goods = goods_by_id.get(goods_id)
+        if not goods:
             continue
         items_data.append(
             {
-                "id": item.id,
+                "id": goods.id,
                 "goods": {
-                    "id": item.goods.id,
-                    "goodsname": item.goods.goodsname,
-                    "model": item.goods.model,
-                    "price": item.goods.price,
-                    "mainimg": item.goods.mainimg,
+                    "id": goods.id,
+                    "goodsname": goods.goodsname,
+                    "model": goods.model,
+                    "price": goods.price,
+                    "mainimg": goods.mainimg,
                 },
-                "quantity": item.quantity,
+                "quantity": quantity,
                 "selected": True,
             }
         )
@@ -113,36 +155,29 @@ def add_to_cart():
         return auth_resp
 
     data = _json_data()
-    goods_id = data.get("goods_id")
+    goods_id = _cart_goods_ids([data.get("goods_id")])
     quantity = _parse_positive_int(data.get("quantity"), default=1)
     check_exists = bool(data.get("check_exists", False))
 
     if not goods_id:
         return jsonify({"success": False, "message": "缺少商品ID"}), 400
+    goods_id = goods_id[0]
 
-    goods = db.session.get(Goods, goods_id)
+    # 库存来自商品详情缓存（库存变化时已失效），购物车读写只访问 cart_store。
+    goods = get_goods_detail(goods_id)
     if not goods:
         return jsonify({"success": False, "message": "商品不存在"}), 404
 
-    cart_item = CartItem.query.filter_by(user_id=g.user.id, goods_id=goods_id).first()
-    current_quantity = cart_item.quantity if cart_item else 0
-    if goods.stock < current_quantity + quantity:
-        return jsonify({"success": False, "message": "库存不足"}), 400
-
-    if cart_item:
-        if check_exists:
-            return jsonify({"success": False, "message": "商品已在购物车中", "code": "ALREADY_EXISTS"})
-        cart_item.quantity += quantity
-    else:
-        db.session.add(CartItem(user_id=g.user.id, goods_id=goods_id, quantity=quantity))
-
     try:
-        db.session.commit()
-    except SQLAlchemyError:
+        current_quantity = cart_store.quantity(g.user.id, goods_id)
+        if goods["stock"] < current_quantity + quantity:
+            return jsonify({"success": False, "message": "库存不足"}), 400
+        if current_quantity and check_exists:
+            return jsonify({"success": False, "message": "商品已在购物车中", "code": "ALREADY_EXISTS"})
+        total, cart_count = cart_store.add(g.user.id, goods_id, quantity)
+    except (SQLAlchemyError, RedisError):
         return _json_db_error("add_to_cart commit failed", "加入购物车失败，请稍后重试")
-
-    cart_count = CartItem.query.filter_by(user_id=g.user.id).count()
-    return jsonify({"success": True, "message": "已加入购物车", "quantity": current_quantity + quantity, "cart_count": cart_count}), 200
+    return jsonify({"success": True, "message": "已加入购物车", "quantity": total, "cart_count": cart_count}), 200
 
 
 @order_bp.route("/cart/del", methods=["POST"])
@@ -152,21 +187,21 @@ def decrease_cart_item():
         return auth_resp
 
     data = _json_data()
-    goods_id = data.get("goods_id")
+    goods_id = _cart_goods_ids([data.get("goods_id")])
     quantity = _parse_positive_int(data.get("quantity"), default=1)
     if not goods_id:
         return jsonify({"success": False, "message": "缺少商品ID"}), 400
+    goods_id = goods_id[0]
 
-    cart_item = CartItem.query.filter_by(user_id=g.user.id, goods_id=goods_id).first()
-    if not cart_item:
-        return jsonify({"success": False, "message": "购物车中不存在该商品"}), 404
-
-    cart_item.quantity = max(cart_item.quantity - quantity, 1)
     try:
-        db.session.commit()
-    except SQLAlchemyError:
+        current_quantity = cart_store.quantity(g.user.id, goods_id)
+        if not current_quantity:
+            return jsonify({"success": False, "message": "购物车中不存在该商品"}), 404
+        new_quantity = max(current_quantity - quantity, 1)
+        cart_store.set_quantity(g.user.id, goods_id, new_quantity)
+    except (SQLAlchemyError, RedisError):
         return _json_db_error("decrease_cart_item commit failed", "操作失败，请稍后重试")
-    return jsonify({"success": True, "message": "商品数量已减少", "quantity": cart_item.quantity})
+    return jsonify({"success": True, "message": "商品数量已减少", "quantity": new_quantity})
 
 
 @order_bp.route("/cart/update", methods=["POST"])
@@ -176,24 +211,23 @@ def update_cart_item():
         return auth_resp
 
     data = _json_data()
-    item_id = data.get("item_id")
+    item_id = _cart_goods_ids([data.get("item_id")])
     quantity = data.get("quantity")
-    if item_id is None or quantity is None:
+    if not item_id or quantity is None:
         return jsonify({"success": False, "message": "缺少参数"}), 400
+    goods_id = item_id[0]
 
     quantity = _parse_positive_int(quantity, default=1)
-    cart_item = CartItem.query.filter_by(id=item_id, user_id=g.user.id).first()
-    if not cart_item:
-        return jsonify({"success": False, "message": "商品不存在"}), 404
-    if cart_item.goods and cart_item.goods.stock < quantity:
-        return jsonify({"success": False, "message": "库存不足"}), 400
-
-    cart_item.quantity = quantity
     try:
-        db.session.commit()
-    except SQLAlchemyError:
+        if not cart_store.quantity(g.user.id, goods_id):
+            return jsonify({"success": False, "message": "商品不存在"}), 404
+        goods = get_goods_detail(goods_id)
+        if goods and goods["stock"] < quantity:
+            return jsonify({"success": False, "message": "库存不足"}), 400
+        cart_store.set_quantity(g.user.id, goods_id, quantity)
+    except (SQLAlchemyError, RedisError):
         return _json_db_error("update_cart_item commit failed", "更新失败，请稍后重试")
-    subtotal = cart_item.quantity * (cart_item.goods.price if cart_item.goods else 0)
+    subtotal = quantity * (goods["price"] if goods else 0)
     return jsonify({"success": True, "item_subtotal": subtotal})
 
 
@@ -203,18 +237,14 @@ def remove_cart_item():
     if auth_resp:
         return auth_resp
 
-    item_id = _json_data().get("item_id")
-    if not item_id:
+    goods_ids = _cart_goods_ids([_json_data().get("item_id")])
+    if not goods_ids:
         return jsonify({"success": False, "message": "缺少参数"}), 400
 
-    cart_item = CartItem.query.filter_by(id=item_id, user_id=g.user.id).first()
-    if cart_item:
-        try:
-            db.session.delete(cart_item)
-            db.session.commit()
-        except SQLAlchemyError:
-            return _json_db_error("remove_cart_item commit failed", "删除失败，请稍后重试")
-    cart_count = CartItem.query.filter_by(user_id=g.user.id).count()
+    try:
+        cart_count = cart_store.remove(g.user.id, goods_ids)
+    except (SQLAlchemyError, RedisError):
+        return _json_db_error("remove_cart_item commit failed", "删除失败，请稍后重试")
     return jsonify({"success": True, "cart_count": cart_count})
 
 
@@ -224,78 +254,81 @@ def batch_remove_cart_items():
     if auth_resp:
         return auth_resp
 
-    item_ids = _json_data().get("item_ids", [])
-    if not item_ids:
+    goods_ids = _cart_goods_ids(_json_data().get("item_ids", []))
+    if not goods_ids:
         return jsonify({"success": False, "message": "未选择商品"}), 400
 
     try:
-        CartItem.query.filter(CartItem.id.in_(item_ids), CartItem.user_id == g.user.id).delete(synchronize_session=False)
-        db.session.commit()
-    except SQLAlchemyError:
+        cart_count = cart_store.remove(g.user.id, goods_ids)
+    except (SQLAlchemyError, RedisError):
         return _json_db_error("batch_remove_cart_items commit failed", "批量删除失败，请稍后重试")
-    cart_count = CartItem.query.filter_by(user_id=g.user.id).count()
     return jsonify({"success": True, "cart_count": cart_count})
 
 
+def _create_order(user_id: int, cart_items) -> str:
+    """
+    cart_items = [(Goods, 数量), ...]：一条 INSERT 写订单、一条多行 INSERT 写明细（不提交），返回订单 ID。
+    明细与总额一次遍历算出；price 是 Numeric（Decimal），总额从 Decimal("0") 累加，不混入浮点误差。
+    """
+    order_id = generate_order_id()
+    item_rows = [
+        {"order_id": order_id, "goods_id": goods.id, "quantity": quantity,
+         "unit_price": goods.price, "subtotal": goods.price * quantity}
+        for goods, quantity in cart_items
+    ]
+    total_amount = sum((row["subtotal"] for row in item_rows), Decimal("0"))
+    db.session.execute(insert(Order).values(
+        id=order_id,
+        order_number=_generate_order_number(order_id),
+        user_id=user_id,
+        total_amount=total_amount,
+        generatetime=datetime.now(),
+        payment_status="pending",
+        payment_method="online",
+    ))
+    db.session.execute(insert(OrderItem), item_rows)
+    return order_id
+
+
 @order_bp.route("/cart/checkout", methods=["POST"])
+@idempotent
 def checkout_cart():
     auth_resp = _auth_required_json()
     if auth_resp:
         return auth_resp
 
-    item_ids = _json_data().get("item_ids", [])
+    item_ids = _cart_goods_ids(_json_data().get("item_ids", []))
     if not item_ids:
         return jsonify({"success": False, "message": "未选择商品"}), 400
 
-    cart_items = (
-        CartItem.query.options(joinedload(CartItem.goods))
-        .filter(CartItem.id.in_(item_ids), CartItem.user_id == g.user.id)
-        .all()
-    )
+    quantities = cart_store.items(g.user.id)
+    selected = [goods_id for goods_id in item_ids if goods_id in quantities]
+    goods_by_id = {goods.id: goods for goods in Goods.query.filter(Goods.id.in_(selected)).all()} if selected else {}
+    cart_items = [(goods_by_id[goods_id], quantities[goods_id]) for goods_id in selected if goods_id in goods_by_id]
     if not cart_items:
         return jsonify({"success": False, "message": "商品无效或已失效"}), 400
 
-    order_id = generate_uuid_hex()
-    new_order = Order(
-        id=order_id,
-        order_number=_generate_order_number(g.user.id),
-        user_id=g.user.id,
-        total_amount=0.0,
-        generatetime=datetime.now(),
-        payment_status="pending",
-        payment_method="online",
-    )
-    db.session.add(new_order)
-    db.session.flush()
-
-    total_amount = 0.0
-    # 从购物车快照生成订单明细，再清空已结算商品。
-    for item in cart_items:
-        if not item.goods:
-            continue
-        subtotal = item.quantity * item.goods.price
-        total_amount += subtotal
-        db.session.add(
-            OrderItem(
-                order_id=order_id,
-                goods_id=item.goods_id,
-                quantity=item.quantity,
-                unit_price=item.goods.price,
-                subtotal=subtotal,
-            )
-        )
-        db.session.delete(item)
-    new_order.total_amount = total_amount
-
+    settled = [goods.id for goods, _ in cart_items]
     try:
+        # 订单、明细与已结算商品从 cart_items 移除在同一事务中提交，往返次数与商品数无关。
+        order_id = _create_order(g.user.id, cart_items)
+        cart_store.stage_checkout(g.user.id, settled)
         db.session.commit()
-    except SQLAlchemyError:
+    except (SQLAlchemyError, RedisError):
+        # Redis 购物车读取失败时同样回滚，不能留下未提交的订单。
         return _json_db_error("checkout_cart commit failed", "结算失败，请稍后重试")
+    invalidate_order_history(g.user.id)
+    try:
+        cart_store.finish_checkout(g.user.id, settled)
+    except RedisError:
+        # 订单与 cart_items 已提交，只是 Redis 购物车里仍留有已结算商品，用户可手动移除，不影响下单结果。
+        logger.exception("checkout_cart cart cleanup failed")
     return jsonify({"success": True, "order_id": order_id})
 
 
 @order_bp.route("/check/<order_id>", methods=["GET", "POST"])
 @is_login
+@idempotent
 def checkout(order_id):
     if request.method == "POST":
         # V-CSRF-Pay vulnerability intentionally preserved for lab.
@@ -309,6 +342,13 @@ def checkout(order_id):
     if request.method == "POST":
         if order.payment_status != "pending":
             return render_template("order/checkout.html", order=order, error="订单状态异常"), 400
+        # 余额扣减需要 ORM 对象：此处才按需加载（g.user 只是只读快照）。
+        # 快照缓存期内用户可能已被删除：与 is_login 一致，清理会话并重定向到登录页。
+        user = current_user_for_update()
+        if user is None:
+            invalidate_user(g.user.id)
+            session.clear()
+            return redirect(url_for("auth.login"))
 
         payment_method = request.form.get("payment_method", "balance")
         address_id = request.form.get("address_id")
@@ -316,19 +356,31 @@ def checkout(order_id):
             order.address_id = address_id
         if payment_method:
             order.payment_method = payment_method
-        if not g.user.balance or g.user.balance < order.total_amount:
+        if not user.balance or user.balance < order.total_amount:
             return render_template("order/checkout.html", order=order, error="余额不足")
+        if inventory_mode() == "reserve":
+            return _pay_with_reservation(order, user)
 
         for item in order.items:
             if item.goods.stock < item.quantity:
                 return render_template("order/checkout.html", order=order, error=f"商品 {item.goods.goodsname} 库存不足")
             item.goods.stock -= item.quantity
 
-        g.user.balance -= order.total_amount
+        user.balance -= order.total_amount
         order.payment_status = "paid"
         order.paid_at = datetime.now()
         try:
             db.session.commit()
+            invalidate_user(user.id)
+            # 订单属于 order.user_id（V-IDOR-View：付款人可能不是下单人）。
+            invalidate_order_history(order.user_id)
+            # 库存变化只影响详情页缓存，列表缓存保持不变。
+            goods_ids = [item.goods_id for item in order.items]
+            invalidate_goods(goods_ids)
+            purge_page(*(url_for("main.product_detail", id=goods_id) for goods_id in goods_ids))
+            if any(item.goods.stock <= 0 for item in order.items):
+                # 售罄会改变"仅看有货"筛选结果与分面计数，需整体刷新目录。
+                bump_catalog_version()
             return render_template("order/success.html", order=order)
         except SQLAlchemyError:
             db.session.rollback()
@@ -336,3 +388,51 @@ def checkout(order_id):
             return render_template("order/checkout.html", order=order, error="支付失败，请稍后重试")
 
     return render_template("order/checkout.html", order=order)
+
+
+def _pay_with_reservation(order, user):
+    """
+    reserve 模式支付：先在 Redis 原子预占库存，再在一个事务里扣余额、改订单状态并记录待结算数量。
+    goods.stock 由后台结算线程批量扣减，这里不锁商品行，热点商品的并发支付不会互相等待。
+    """
+    items = hold_items(order)
+    try:
+        state, goods_id = reserve_stock(order.id, items)
+    except RedisError:
+        logger.exception("inventory reservation failed")
+        return render_template("order/checkout.html", order=order, error="支付失败，请稍后重试")
+    if state == INSUFFICIENT:
+        goods = next(item.goods for item in order.items if item.goods_id == goods_id)
+        return render_template("order/checkout.html", order=order, error=f"商品 {goods.goodsname} 库存不足")
+    if state != RESERVED:
+        return render_template("order/checkout.html", order=order, error="订单正在支付中"), 409
+
+    try:
+        # 条件更新：预占确认后同一订单的重复提交不会再次扣款和记账。
+        paid = db.session.execute(
+            update(Order)
+            .where(Order.id == order.id, Order.payment_status == "pending")
+            .values(payment_status="paid", paid_at=datetime.now())
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        if not paid:
+            db.session.rollback()
+            release_reservation(order.id)
+            return render_template("order/checkout.html", order=order, error="订单状态异常"), 400
+        user.balance -= order.total_amount
+        add_settlements(order)
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        logger.exception("checkout payment commit failed")
+        release_reservation(order.id)
+        return render_template("order/checkout.html", order=order, error="支付失败，请稍后重试")
+
+    invalidate_user(user.id)
+    invalidate_order_history(order.user_id)
+    try:
+        confirm_reservation(order.id, items)
+    except RedisError:
+        # 预占到期后由回收线程识别为已支付订单并删除，不会把库存加回。
+        logger.exception("inventory confirm failed")
+    return render_template("order/success.html", order=order)
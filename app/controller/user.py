@@ -4,8 +4,8 @@
 功能：
 - 余额查询（/user/balance）
 - 收货地址增删改查（CRUD）
-- 储值券兑换（/user/redeem）
-- 个人中心页面（信息 / 订单 / 地址 / 资产 四个标签页）
+- 储值券兑换（/user/voucher/redeem，支持可选的 Idempotency-Key 请求头）
+- 个人中心页面（信息 / 订单 / 地址 / 资产 四个标签页；订单 keyset 分页 + 首页缓存，/user/orders 加载更多）
 - 订单详情查看（/user/order/<id>）
 
 相关漏洞：
@@ -20,8 +20,11 @@ from datetime import datetime
 from flask import Blueprint, flash, jsonify, redirect, render_template, render_template_string, request, session, url_for
 from sqlalchemy.exc import SQLAlchemyError
 
-from app.models.db import Address, Order, User, Voucher, db, VOUCHER_UNUSED, VOUCHER_USED
-from app.utils.tools import get_order_status_meta, is_login, query_order_detail_raw
+from app.models.db import Address, User, Voucher, db, VOUCHER_UNUSED, VOUCHER_USED
+from app.utils.idempotency import idempotent
+from app.utils.identity import invalidate_user
+from app.utils.order_history import order_history_page
+from app.utils.tools import is_login, query_order_detail_raw
 
 # 用户中心蓝图：地址、资产、订单与代金券能力。
 user_bp = Blueprint("user", __name__, url_prefix="/user")
@@ -71,6 +74,7 @@ def address_list():
 
 @user_bp.route("/voucher/redeem", methods=["POST"])
 @is_login
+@idempotent
 def voucher_redeem():
     # 代金券兑换流程：校验状态 -> 入账 -> 标记已使用。
     user_id = session.get("user_id")
@@ -97,6 +101,7 @@ def voucher_redeem():
 
     try:
         db.session.commit()
+        invalidate_user(user_id)
         refreshed = db.session.get(User, user_id)
         return jsonify(
             {
@@ -155,18 +160,7 @@ def _load_section_data(section: str, user_id: int, user) -> dict:
     """按标签页懒加载个人中心数据，避免一次请求拉取全部信息。"""
     data = {"page": "profile", "section": section}
     if section == "orders":
-        orders = Order.query.filter_by(user_id=user_id).order_by(Order.generatetime.desc()).all()
-        data["orders"] = [
-            {
-                "id": order.id,
-                "display_id": order.order_number,
-                "date": order.generatetime.strftime("%Y-%m-%d") if order.generatetime else "",
-                "total": order.total_amount,
-                "status_label": get_order_status_meta(order.payment_status)[0],
-                "status_class": get_order_status_meta(order.payment_status)[1],
-            }
-            for order in orders
-        ]
+        data["orders"], data["next_cursor"] = order_history_page(user_id)
     elif section == "address":
         addresses = Address.query.filter_by(user_id=user_id).all()
         data["addresses"] = [
@@ -198,11 +192,20 @@ def profile():
             user.password = new_password
         if new_username or new_password:
             _commit_or_flash("个人信息更新成功", "profile update commit failed")
+            invalidate_user(user_id)
         return redirect(url_for(_PROFILE_ENDPOINT, section="info"))
 
     return render_template("user/profile.html", data=_load_section_data(section, user_id, user))
 
 
+@user_bp.route("/orders", methods=["GET"])
+@is_login
+def orders_more():
+    # "加载更多"接口：按游标返回下一页订单摘要（JSON）。
+    orders, next_cursor = order_history_page(session.get("user_id"), request.args.get("cursor"))
+    return jsonify({"items": orders, "next_cursor": next_cursor})
+
+
 @user_bp.route("/order/<order_id>", methods=["GET"])
 @is_login
 def order_detail(order_id):
@@ -4,6 +4,7 @@ HackShop 数据模型定义模块。
 包含以下核心模型：
 - Admin       : 管理员账号
 - MailLog     : 站内信 / 邮件日志（验证码、密码重置等）
+- MailLogArchive : 过期站内信归档（按天分桶，zlib 压缩）
 - User        : 前台用户
 - Address     : 用户收货地址
 - Goods       : 商品（含图片、规格子表）
@@ -13,6 +14,7 @@ HackShop 数据模型定义模块。
 - Voucher     : 储值券 / 代金券
 - Order       : 订单主表
 - OrderItem   : 订单明细行
+- StockSettlement : 预占库存模式下待扣减到 goods.stock 的数量
 
 关系概览：
   User  1──N  Order  1──N  OrderItem  N──1  Goods
@@ -68,6 +70,22 @@ class MailLog(db.Model):
     is_read = db.Column(db.Boolean, default=False, nullable=False)
 
 
+class MailLogArchive(db.Model):
+    """
+    过期站内信归档块：同一天（bucket_date）的一批 MailLog 序列化为 JSON Lines 后 zlib 压缩存入 payload。
+    一天的邮件可能分布在多个块中（按批次写入），由 app/utils/mail_retention.py 维护。
+    """
+    __tablename__ = 'mail_log_archives'
+    id = db.Column(db.Integer, primary_key=True)
+    bucket_date = db.Column(db.Date, nullable=False, index=True)
+    first_id = db.Column(db.Integer, nullable=False)
+    last_id = db.Column(db.Integer, nullable=False)
+    row_count = db.Column(db.Integer, nullable=False)
+    raw_bytes = db.Column(db.Integer, nullable=False)          # 压缩前 JSON Lines 字节数
+    payload = db.Column(db.LargeBinary(length=2 ** 24 - 1), nullable=False)   # MySQL 中为 MEDIUMBLOB
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
+
+
 # ===================== 前台用户 =====================
 class User(db.Model):
     """前台注册用户，靶场保留明文密码以演示认证风险。"""
@@ -200,7 +218,7 @@ class Voucher(db.Model):
 class Order(db.Model):
     """
     订单主表。
-    - id: UUID 去横线后的 32 位字符串
+    - id: 19 位按时间递增的 Snowflake 风格主键（见 app/utils/order_ids.py；早期订单为 32 位 UUID，可迁移）
     - payment_status: pending → paid → shipped → completed / cancelled
     - V-IDOR-View 漏洞：支付接口未校验订单归属
     """
@@ -232,3 +250,18 @@ class OrderItem(db.Model):
     subtotal = db.Column(Numeric(10, 2), nullable=False)
     order = db.relationship('Order', back_populates='items')
     goods = db.relationship('Goods', back_populates='order_items')
+
+
+# ===================== 待结算库存扣减 =====================
+class StockSettlement(db.Model):
+    """
+    预占库存模式（INVENTORY_MODE=reserve）下已支付、尚未扣到 goods.stock 的数量。
+    与支付在同一事务中写入，由 app/utils/inventory.py 的结算线程批量扣减 goods.stock 后删除。
+    goods_id 不设外键：商品被删除后对应的扣减直接作废，不阻塞删除。
+    """
+    __tablename__ = 'stock_settlements'
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.String(32), nullable=False, index=True)
+    goods_id = db.Column(db.Integer, nullable=False, index=True)
+    quantity = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.now, nullable=False)
@@ -2,8 +2,31 @@
 HackShop 工具包 (app.utils)。
 
 子模块：
-- db.py             : Redis 客户端初始化
+- assets.py         : 静态资源指纹化（url_for 改写）与预压缩文件分发
+- background.py     : 进程内后台循环线程（每个 worker 一个，fork 后自动重启）
+- cart.py           : 购物车存储引擎（Redis 哈希 + 回写 cart_items / 纯 SQL 模式）
+- catalog.py        : 首页商品列表（服务端筛选、排序、keyset 游标分页）
+- catalog_cache.py  : 商品目录 Redis 读穿缓存（版本号失效 + 防击穿锁 + 命中统计）
+- catalog_index.py  : 进程内目录索引基类（首次全量构建 + 按目录版本增量同步）
+- compression.py    : 动态响应压缩（gzip / brotli 协商、流式压缩、按端点统计）
+- db.py             : Redis 客户端（连接池 / 超时 / 重试、批量辅助、分命令耗时统计）
+- facets.py         : 首页分面计数（分类 / 品牌 / 价格区间 / 有货，增量维护）
+- http_cache.py     : 条件请求（ETag / Last-Modified → 304）装饰器
+- idempotency.py    : Idempotency-Key 请求重放（默认关闭，开启后重复 / 并发重复的 POST 不再执行事务）
+- identity.py       : 请求级登录身份（Redis 用户快照 g.user，静态资源请求跳过）
+- images.py         : 商品图片衍生尺寸与 WebP（后台线程生成，模板 srcset 过滤器）
+- inventory.py      : 库存扣减模式（默认 direct；reserve 为 Redis 原子预占 + 异步结算）
 - logging_config.py : 日志系统初始化（控制台 + 文件轮转）
+- mail_retention.py : 站内信保留策略（过期邮件按天压缩归档到 mail_log_archives）
+- mailbox.py        : 站内信 keyset 分页、版本号（ETag）与新邮件 pub/sub 长轮询通知
+- memory_redis.py   : 进程内 Redis 替身（REDIS_BACKEND=memory，开发 / 测试 / 基准用）
+- order_expiry.py   : 超时未支付订单分批取消（后台线程 + Redis 互斥锁）
+- order_history.py  : 个人中心订单列表（keyset 分页 + 首页摘要缓存）
+- order_ids.py      : 订单主键生成（Snowflake 风格 64 位，按时间递增的 19 位字符串）
+- outbox.py         : 站内信发件箱（Redis 队列 + 后台线程按大小 / 时间批量 INSERT）
+- page_cache.py     : 匿名访客整页缓存（首页 / 详情 / 搜索）
+- search.py         : 商品搜索倒排索引（中文二元组切词 + BM25 排序）
+- suggest.py        : 搜索联想前缀索引（有序数组 + bisect，按销量排序）
 - tools.py          : 鉴权装饰器、验证码、订单号生成、AES 解密、漏洞辅助函数
 
 保持本模块无副作用，避免导入时产生循环依赖。
@@ -0,0 +1,116 @@
+"""
+静态资源指纹化（content hash）与预压缩文件分发。
+
+构建阶段由 scripts/build_assets.py 把 app/static 下的文件按内容哈希复制到 app/static/dist/，
+同时生成 .gz / .br 预压缩副本与 manifest.json（原始路径 → 带哈希路径）。
+运行阶段 init_assets(app) 读取 manifest：
+- url_for('static', filename='css/hackshop.css') 自动改写为 /static/dist/css/hackshop.<hash>.css
+- static 视图对 dist/ 下的指纹文件按 Accept-Encoding 返回预压缩副本，
+  附加 Cache-Control: immutable（文件名随内容变化，可长期缓存）与 Vary: Accept-Encoding
+
+- fingerprinted_name : 带哈希的文件名（构建脚本与测试共用的命名规则）
+- rewrite_css_urls   : 把 CSS 中 url(...) 的相对引用改写为带哈希的文件名
+- init_assets        : 注册 url_defaults 钩子并替换 static 视图
+
+未执行构建（manifest 不存在）时保持 Flask 默认行为，开发环境修改 CSS/JS 即时生效。
+"""
+
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import posixpath
+import re
+
+from flask import request, send_from_directory
+
+logger = logging.getLogger(__name__)
+
+ASSET_DIST_DIR = "dist"
+ASSET_MANIFEST = "manifest.json"
+IMMUTABLE_MAX_AGE = 365 * 24 * 3600
+# 预压缩编码按优先级排列：(Content-Encoding, 文件后缀)
+PRECOMPRESSED = (("br", ".br"), ("gzip", ".gz"))
+
+_CSS_URL_RE = re.compile(r"""url\((['"]?)([^'")]+)\1\)""")
+_URL_SUFFIX_RE = re.compile(r"([^?#]*)(.*)")
+
+
+def fingerprinted_name(path: str, content: bytes, length: int = 10) -> str:
+    """css/all.min.css → css/all.min.<sha256 前 length 位>.css"""
+    digest = hashlib.sha256(content).hexdigest()[:length]
+    stem, ext = posixpath.splitext(path)
+    return f"{stem}.{digest}{ext}"
+
+
+def rewrite_css_urls(css: str, css_path: str, manifest: dict) -> str:
+    """
+    改写 CSS 内的相对 url(...)：目标在 manifest 中时替换为带哈希的路径（保留 ?#iefix 等后缀），
+    data: / 绝对地址 / 未构建的文件保持原样。
+    """
+    base = posixpath.dirname(css_path)
+
+    def replace(match):
+        quote, ref = match.group(1), match.group(2).strip()
+        if ref.startswith(("data:", "http:", "https:", "//", "/", "#")):
+            return match.group(0)
+        path, rest = _URL_SUFFIX_RE.match(ref).groups()
+        target = posixpath.normpath(posixpath.join(base, path))
+        if target not in manifest:
+            return match.group(0)
+        hashed = posixpath.relpath(manifest[target], base) if base else manifest[target]
+        return f"url({quote}{hashed}{rest}{quote})"
+
+    return _CSS_URL_RE.sub(replace, css)
+
+
+def load_manifest(static_folder: str) -> dict:
+    """读取构建产物清单，不存在或损坏时返回空字典（即不启用指纹化）。"""
+    path = os.path.join(static_folder, ASSET_DIST_DIR, ASSET_MANIFEST)
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError):
+        logger.exception("asset manifest unreadable: %s", path)
+        return {}
+
+
+def _send_fingerprinted(static_folder: str, filename: str):
+    # 按客户端支持的编码选择预压缩副本；Content-Type 始终取原始文件类型。
+    mimetype = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    for encoding, suffix in PRECOMPRESSED:
+        if request.accept_encodings.quality(encoding) > 0 and os.path.isfile(os.path.join(static_folder, filename + suffix)):
+            response = send_from_directory(static_folder, filename + suffix, mimetype=mimetype)
+            response.headers["Content-Encoding"] = encoding
+            break
+    else:
+        response = send_from_directory(static_folder, filename, mimetype=mimetype)
+    response.headers["Cache-Control"] = f"public, max-age={IMMUTABLE_MAX_AGE}, immutable"
+    response.vary.add("Accept-Encoding")
+    return response
+
+
+def init_assets(app) -> None:
+    """加载 manifest，启用 url_for 指纹改写与预压缩分发。"""
+    manifest = load_manifest(app.static_folder)
+    if not manifest:
+        return
+    prefix = ASSET_DIST_DIR + "/"
+    fingerprinted = {prefix + hashed for hashed in manifest.values()}
+    default_static = app.view_functions["static"]
+
+    @app.url_defaults
+    def _fingerprint_static_url(endpoint, values):
+        if endpoint == "static" and values.get("filename") in manifest:
+            values["filename"] = prefix + manifest[values["filename"]]
+
+    def static(filename):
+        if filename in fingerprinted:
+            return _send_fingerprinted(app.static_folder, filename)
+        return default_static(filename=filename)
+
+    app.view_functions["static"] = static
+    logger.info("asset manifest loaded: %d files", len(manifest))
@@ -0,0 +1,63 @@
+"""
+进程内后台循环线程。
+
+Gunicorn 每个 worker 进程各有一个守护线程反复执行 step()（在应用上下文中）：
+- 惰性启动：init 时记录应用实例，由请求钩子调用 ensure() 确认线程存活
+- fork 安全：线程不会随 fork 复制，子进程中 pid 变化时重新启动
+- step() 自己负责阻塞 / 休眠；抛出异常时记录日志并退避 1 秒后继续
+
+- BackgroundLoop : 发件箱投递（outbox.py）、购物车回写（cart.py）等共用
+"""
+
+import logging
+import os
+import threading
+import time
+
+from redis.exceptions import RedisError
+
+logger = logging.getLogger(__name__)
+
+
+class BackgroundLoop:
+    """每个进程一个守护线程循环执行 step()。"""
+
+    def __init__(self, name: str, step):
+        self.name = name
+        self.step = step
+        self.app = None
+        self._lock = threading.Lock()
+        self._thread = None
+        self._pid = None
+
+    @property
+    def running(self) -> bool:
+        """当前进程中的线程是否已启动（fork 前父进程的线程不算）。"""
+        return self._thread is not None and self._thread.is_alive() and self._pid == os.getpid()
+
+    def bind(self, app) -> None:
+        """记录应用实例，并在每个请求前确认线程存活。"""
+        self.app = app
+        app.before_request(self.ensure)
+
+    def ensure(self) -> None:
+        if self.app is None or self.running:
+            return
+        with self._lock:
+            if self.running:
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+
+    def _run(self) -> None:
+        while True:
+            try:
+                with self.app.app_context():
+                    self.step()
+            except RedisError:
+                logger.warning("%s disconnected, retrying", self.name, exc_info=True)
+                time.sleep(1)
+            except Exception:
+                logger.exception("%s step failed", self.name)
+                time.sleep(1)
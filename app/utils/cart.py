@@ -0,0 +1,390 @@
+"""
+购物车存储引擎。
+
+购物车中每个商品一行，行标识即 goods_id（同一用户对同一商品只保留一条，数量累加）。
+CART_BACKEND 选择存储后端：
+- redis（默认）：每个用户的购物车是 Redis 哈希 cart:{user_id}（goods_id → 数量，另有哨兵字段 "_"
+  表示已从 cart_items 加载），热路径读写只访问 Redis；首次访问时从 cart_items 合并加载
+- sql：纯 MySQL 模式，直接读写 cart_items；Redis 只保存每个用户的行数计数器（导航栏角标）
+
+CART_DURABILITY 控制 redis 后端回写 cart_items 的时机：
+- async（默认）：变更的用户记入集合 cart:dirty，后台线程每 CART_FLUSH_SECONDS 秒批量回写
+- sync：每次变更后在请求内同步回写该用户
+- checkout：只在结算时回写；Redis 中的购物车不设过期时间，是唯一数据源
+无论哪种模式，结算都会在创建订单的同一事务中把该用户的购物车同步到 cart_items。
+
+- cart_store     : 当前后端实例（items / quantity / add / set_quantity / remove / count / stage_checkout / finish_checkout），
+                   变更方法同时返回购物车行数，接口无需再单独计数
+- init_cart      : 启动回写线程（async 模式；sync 模式下重试回写失败的用户）
+- flush_carts    : 立即回写全部待回写的购物车，返回用户数
+- sync_cart_rows : 把若干用户的目标状态合并写入 cart_items（删除 / 更新 / 插入各一条语句，不提交）
+"""
+
+import logging
+import os
+import time
+from datetime import datetime
+
+from redis.exceptions import RedisError
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.models.db import CartItem, db
+from app.utils.background import BackgroundLoop
+from app.utils.db import redis_client, redis_script
+
+logger = logging.getLogger(__name__)
+
+CART_BACKEND = os.getenv("CART_BACKEND", "redis").lower()
+CART_DURABILITY = os.getenv("CART_DURABILITY", "async").lower()
+CART_TTL = int(os.getenv("CART_TTL", str(7 * 24 * 3600)))         # Redis 购物车闲置过期秒数（checkout 模式不过期）
+CART_FLUSH_SECONDS = float(os.getenv("CART_FLUSH_SECONDS", "2"))    # async 模式回写间隔
+CART_FLUSH_BATCH = int(os.getenv("CART_FLUSH_BATCH", "200"))        # 每轮最多回写的用户数
+CART_COUNT_TTL = int(os.getenv("CART_COUNT_TTL", "86400"))           # sql 后端购物车行数计数器的过期秒数
+CART_DIRTY_KEY = "cart:dirty"
+_LOADED_FIELD = "_"
+
+# 合并加载：哨兵字段不存在时写入哨兵，并用 HSETNX 补入 cart_items 中的商品（不覆盖 Redis 中已有的新值）。
+# KEYS[1]=购物车键；ARGV[1]=过期秒数（0 表示不过期），ARGV[2..]=goods_id, 数量 交替
+_HYDRATE_LUA = """
+if redis.call('HSETNX', KEYS[1], '_', '1') == 0 then
+    return 0
+end
+for i = 2, #ARGV, 2 do
+    redis.call('HSETNX', KEYS[1], ARGV[i], ARGV[i + 1])
+end
+if tonumber(ARGV[1]) > 0 then
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+return 1
+"""
+
+
+def _hydrate_py(client, keys, args):
+    # 与 _HYDRATE_LUA 等价，仅供 REDIS_BACKEND=memory 使用。
+    if client.hexists(keys[0], _LOADED_FIELD):
+        return 0
+    client.hset(keys[0], _LOADED_FIELD, "1")
+    for field, value in zip(args[1::2], args[2::2]):
+        if not client.hexists(keys[0], field):
+            client.hset(keys[0], field, value)
+    if int(args[0]) > 0:
+        client.expire(keys[0], int(args[0]))
+    return 1
+
+
+_hydrate = redis_script(_HYDRATE_LUA, _hydrate_py)
+
+# sql 后端的行数计数器：只在计数器存在时按增量调整，不存在时返回 nil，由下一次读取用 COUNT(*) 重建。
+# KEYS[1]=计数器键；ARGV[1]=增量
+_COUNT_DELTA_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return nil
+end
+return redis.call('INCRBY', KEYS[1], ARGV[1])
+"""
+
+
+def _count_delta_py(client, keys, args):
+    # 与 _COUNT_DELTA_LUA 等价，仅供 REDIS_BACKEND=memory 使用。
+    if not client.exists(keys[0]):
+        return None
+    return client.incrby(keys[0], int(args[0]))
+
+
+_count_delta = redis_script(_COUNT_DELTA_LUA, _count_delta_py)
+
+
+def _sql_items(user_id) -> dict:
+    rows = db.session.execute(
+        select(CartItem.goods_id, CartItem.quantity).where(CartItem.user_id == user_id).order_by(CartItem.id)
+    )
+    return {goods_id: quantity for goods_id, quantity in rows}
+
+
+def sync_cart_rows(states: dict) -> None:
+    """
+    states = {user_id: {goods_id: 数量}}：把这些用户在 cart_items 中的行改成目标状态。
+    多余的行一条 DELETE，数量变化的行按主键批量 UPDATE，新商品一条多行 INSERT；不提交事务。
+    """
+    if not states:
+        return
+    rows = db.session.execute(
+        select(CartItem.id, CartItem.user_id, CartItem.goods_id, CartItem.quantity)
+        .where(CartItem.user_id.in_(list(states)))
+    ).all()
+    stale, changed, kept = [], [], set()
+    for row_id, user_id, goods_id, quantity in rows:
+        wanted = states[user_id].get(goods_id)
+        if wanted is None or (user_id, goods_id) in kept:
+            stale.append(row_id)
+            continue
+        kept.add((user_id, goods_id))
+        if wanted != quantity:
+            changed.append({"id": row_id, "quantity": wanted})
+    now = datetime.now()
+    added = [
+        {"user_id": user_id, "goods_id": goods_id, "quantity": quantity, "created_at": now}
+        for user_id, items in states.items()
+        for goods_id, quantity in items.items()
+        if (user_id, goods_id) not in kept
+    ]
+    if stale:
+        db.session.execute(delete(CartItem).where(CartItem.id.in_(stale)))
+    if changed:
+        db.session.execute(update(CartItem), changed)
+    if added:
+        db.session.execute(insert(CartItem), added)
+
+
+class SqlCartStore:
+    """
+    纯 SQL 购物车：每次变更一个事务。
+    行数计数器 cart:count:{user_id} 存在 Redis 中，变更路径按增量原子调整，模板角标不再每次 COUNT(*)；
+    同一用户的读写恰好交错时计数可能短暂偏差，CART_COUNT_TTL 到期后按 COUNT(*) 重建。
+    """
+
+    name = "sql"
+
+    @staticmethod
+    def _count_key(user_id) -> str:
+        return f"cart:count:{user_id}"
+
+    def _count_rows(self, user_id) -> int:
+        return db.session.scalar(select(func.count()).select_from(CartItem).where(CartItem.user_id == user_id))
+
+    def _adjust(self, user_id, delta: int) -> int:
+        """按增量调整计数器并返回新行数；计数器不存在或 Redis 不可用时回退为 count()。"""
+        if delta:
+            try:
+                value = _count_delta(keys=[self._count_key(user_id)], args=[delta])
+                if value is not None:
+                    return int(value)
+            except RedisError:
+                logger.warning("cart counter unavailable", exc_info=True)
+        return self.count(user_id)
+
+    def items(self, user_id) -> dict:
+        return _sql_items(user_id)
+
+    def quantity(self, user_id, goods_id) -> int:
+        return db.session.scalar(
+            select(CartItem.quantity).where(CartItem.user_id == user_id, CartItem.goods_id == goods_id)
+        ) or 0
+
+    def _save(self, user_id, goods_id, quantity: int) -> int:
+        # 返回新增的行数（0 / 1）。
+        cart_item = CartItem.query.filter_by(user_id=user_id, goods_id=goods_id).first()
+        if cart_item:
+            cart_item.quantity = quantity
+        else:
+            db.session.add(CartItem(user_id=user_id, goods_id=goods_id, quantity=quantity))
+        db.session.commit()
+        return 0 if cart_item else 1
+
+    def add(self, user_id, goods_id, quantity: int):
+        """返回 (该商品新数量, 购物车行数)。"""
+        total = self.quantity(user_id, goods_id) + quantity
+        added = self._save(user_id, goods_id, total)
+        return total, self._adjust(user_id, added)
+
+    def set_quantity(self, user_id, goods_id, quantity: int) -> int:
+        """返回购物车行数。"""
+        return self._adjust(user_id, self._save(user_id, goods_id, quantity))
+
+    def remove(self, user_id, goods_ids) -> int:
+        """返回购物车行数。"""
+        result = db.session.execute(
+            delete(CartItem).where(CartItem.user_id == user_id, CartItem.goods_id.in_(list(goods_ids)))
+        )
+        db.session.commit()
+        return self._adjust(user_id, -result.rowcount)
+
+    def count(self, user_id) -> int:
+        key = self._count_key(user_id)
+        try:
+            cached = redis_client.get(key)
+            if cached is not None:
+                return int(cached)
+        except RedisError:
+            return self._count_rows(user_id)
+        count = self._count_rows(user_id)
+        try:
+            # NX：并发变更已经重建并调整过的计数器不被这里的旧值覆盖。
+            redis_client.set(key, count, nx=True, ex=CART_COUNT_TTL)
+        except RedisError:
+            pass
+        return count
+
+    def stage_checkout(self, user_id, goods_ids) -> None:
+        """结算事务内调用：删除已结算商品的行（由调用方提交）。"""
+        db.session.execute(delete(CartItem).where(CartItem.user_id == user_id, CartItem.goods_id.in_(list(goods_ids))))
+
+    def finish_checkout(self, user_id, goods_ids) -> None:
+        """结算事务提交后调用：删除计数器，下一次读取时重建（结算不在热路径上）。"""
+        redis_client.delete(self._count_key(user_id))
+
+
+class RedisCartStore:
+    """Redis 哈希购物车，按 CART_DURABILITY 回写 cart_items。"""
+
+    name = "redis"
+
+    def __init__(self, durability: str = CART_DURABILITY):
+        self.durability = durability
+        self.ttl = 0 if durability == "checkout" else CART_TTL
+
+    @staticmethod
+    def _key(user_id) -> str:
+        return f"cart:{user_id}"
+
+    def _hydrate(self, user_id) -> dict:
+        rows = _sql_items(user_id)
+        args = [self.ttl]
+        for goods_id, quantity in rows.items():
+            args.extend((goods_id, quantity))
+        _hydrate(keys=[self._key(user_id)], args=args)
+        return rows
+
+    def _load(self, user_id) -> dict:
+        raw = redis_client.hgetall(self._key(user_id))
+        if _LOADED_FIELD not in raw:
+            self._hydrate(user_id)
+            raw = redis_client.hgetall(self._key(user_id))
+        return {int(field): int(value) for field, value in raw.items() if field != _LOADED_FIELD}
+
+    def _persist(self, user_id) -> None:
+        try:
+            sync_cart_rows({user_id: self._load(user_id)})
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            logger.exception("cart write-through failed, deferring user %s", user_id)
+            redis_client.sadd(CART_DIRTY_KEY, user_id)
+
+    def _write(self, user_id, command, *args):
+        """
+        一次事务管道：检查哨兵 + 执行变更 + 读取行数 + 续期 + 脏标记，返回 (是否已加载, 命令结果, 行数)。
+        未加载时写入已经发生，调用方需补一次合并加载（行数也随之失效）。
+        """
+        key = self._key(user_id)
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.hexists(key, _LOADED_FIELD)
+        getattr(pipe, command)(key, *args)
+        pipe.hlen(key)
+        if self.ttl:
+            pipe.expire(key, self.ttl)
+        if self.durability == "async":
+            pipe.sadd(CART_DIRTY_KEY, user_id)
+        results = pipe.execute()
+        return results[0], results[1], results[2] - 1
+
+    def _written(self, user_id) -> None:
+        if self.durability == "sync":
+            self._persist(user_id)
+
+    def items(self, user_id) -> dict:
+        return self._load(user_id)
+
+    def quantity(self, user_id, goods_id) -> int:
+        loaded, value = redis_client.hmget(self._key(user_id), [_LOADED_FIELD, str(goods_id)])
+        if loaded is None:
+            return self._hydrate(user_id).get(int(goods_id), 0)
+        return int(value or 0)
+
+    def add(self, user_id, goods_id, quantity: int):
+        """返回 (该商品新数量, 购物车行数)。"""
+        loaded, total, count = self._write(user_id, "hincrby", str(goods_id), quantity)
+        if not loaded:
+            # HSETNX 不会覆盖刚写入的增量，cart_items 中原有的数量要再加回去。
+            previous = self._hydrate(user_id).get(int(goods_id), 0)
+            if previous:
+                total = redis_client.hincrby(self._key(user_id), str(goods_id), previous)
+            count = self.count(user_id)
+        self._written(user_id)
+        return total, count
+
+    def set_quantity(self, user_id, goods_id, quantity: int) -> int:
+        """返回购物车行数。"""
+        loaded, _, count = self._write(user_id, "hset", str(goods_id), quantity)
+        if not loaded:
+            self._hydrate(user_id)
+            count = self.count(user_id)
+        self._written(user_id)
+        return count
+
+    def remove(self, user_id, goods_ids) -> int:
+        """返回购物车行数。"""
+        fields = [str(goods_id) for goods_id in goods_ids]
+        if not fields:
+            return self.count(user_id)
+        self._load(user_id)   # 先确认已加载，避免删除后合并加载又把旧商品补回来
+        _, _, count = self._write(user_id, "hdel", *fields)
+        self._written(user_id)
+        return count
+
+    def count(self, user_id) -> int:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hexists(self._key(user_id), _LOADED_FIELD)
+        pipe.hlen(self._key(user_id))
+        loaded, size = pipe.execute()
+        if not loaded:
+            return len(self._load(user_id))
+        return size - 1
+
+    def stage_checkout(self, user_id, goods_ids) -> None:
+        """结算事务内调用：把结算后的购物车状态（去掉已结算商品）写入 cart_items，由调用方提交。"""
+        remaining = self._load(user_id)
+        for goods_id in goods_ids:
+            remaining.pop(int(goods_id), None)
+        sync_cart_rows({user_id: remaining})
+
+    def finish_checkout(self, user_id, goods_ids) -> None:
+        """结算事务提交后调用：从 Redis 中移除已结算商品（cart_items 已同步，不再标记回写）。"""
+        fields = [str(goods_id) for goods_id in goods_ids]
+        if fields:
+            redis_client.hdel(self._key(user_id), *fields)
+
+
+cart_store = RedisCartStore() if CART_BACKEND == "redis" else SqlCartStore()
+
+
+def flush_carts(limit: int = None) -> int:
+    """回写 cart:dirty 中的用户（需在应用上下文中调用），返回回写的用户数。失败时放回集合。"""
+    flushed = 0
+    while limit is None or flushed < limit:
+        user_ids = redis_client.spop(CART_DIRTY_KEY, CART_FLUSH_BATCH)
+        if not user_ids:
+            break
+        pipe = redis_client.pipeline(transaction=False)
+        for user_id in user_ids:
+            pipe.hgetall(RedisCartStore._key(user_id))
+        states = {}
+        for user_id, raw in zip(user_ids, pipe.execute()):
+            # 购物车已过期或被清理时跳过，不能据此清空 cart_items。
+            if _LOADED_FIELD in raw:
+                states[int(user_id)] = {int(f): int(v) for f, v in raw.items() if f != _LOADED_FIELD}
+        try:
+            sync_cart_rows(states)
+            db.session.commit()
+        except SQLAlchemyError:
+            db.session.rollback()
+            redis_client.sadd(CART_DIRTY_KEY, *user_ids)
+            logger.exception("cart flush failed for %d users", len(user_ids))
+            break
+        flushed += len(user_ids)
+    return flushed
+
+
+def _flush_step() -> None:
+    flush_carts()
+    time.sleep(CART_FLUSH_SECONDS)
+
+
+_flusher = BackgroundLoop("cart-flush", _flush_step)
+
+
+def init_cart(app) -> None:
+    """redis 后端 async / sync 模式下，每个 worker 进程启动一个回写线程（sync 模式只处理回写失败的用户）。"""
+    if cart_store.name == "redis" and cart_store.durability != "checkout":
+        _flusher.bind(app)
@@ -0,0 +1,250 @@
+"""
+商品目录查询模块。
+
+首页商品列表的服务端筛选（分类 / 品牌 / 价格区间 / 有货）、排序与游标（keyset / seek）分页：
+- SORT_OPTIONS      : 排序方式 → 排序列与方向
+- encode_cursor     : (排序列值, id) → 不透明游标字符串
+- decode_cursor     : 游标字符串 → (排序列值, id)，非法游标返回 None
+- fetch_goods_page  : 按 (status, 排序列, id) 做 seek 分页，深翻页不产生 OFFSET 全扫
+- goods_card        : Goods → 列表卡片字典（模板与 JSON 接口共用）
+- goods_detail      : Goods → 详情页字典（含轮播图与规格）
+- get_goods_page / get_goods_detail : 上述查询的 Redis 读穿缓存版本（见 catalog_cache.py）
+
+配套索引见 scripts/ensure_indexes.py（idx_goods_status_id 等复合索引）。
+"""
+
+import base64
+import hashlib
+import json
+from decimal import Decimal, InvalidOperation
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import load_only, selectinload
+
+from app.models.db import GOODS_ON_SALE, Goods, db
+from app.utils.catalog_cache import read_through
+from app.utils.facets import PRICE_BUCKETS
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 60
+CARD_CONTENT_LIMIT = 120  # 列表卡片只展示摘要，完整描述在详情页
+
+# 排序方式 → (排序列名, 是否降序)。"default" 按上架时间（id）倒序。
+SORT_OPTIONS = {
+    "default": ("id", True),
+    "price-low": ("price", False),
+    "price-high": ("price", True),
+    "sales": ("sales_count", True),
+    "rating": ("rating_avg", True),
+}
+
+# 列表卡片所需列，避免加载 slug/created_at 等无关字段。
+_CARD_COLUMNS = (
+    Goods.id,
+    Goods.goodsname,
+    Goods.category,
+    Goods.mainimg,
+    Goods.content,
+    Goods.price,
+    Goods.original_price,
+    Goods.brand,
+    Goods.stock,
+    Goods.sales_count,
+    Goods.rating_avg,
+    Goods.updated_at,
+)
+
+
+def normalize_sort(sort: str) -> str:
+    """非法排序方式回退为默认排序。"""
+    return sort if sort in SORT_OPTIONS else "default"
+
+
+def clamp_page_size(raw, default: int = DEFAULT_PAGE_SIZE) -> int:
+    """限制单页条数在 [1, MAX_PAGE_SIZE]，非法值回退到默认值。"""
+    try:
+        value = int(raw)
+    except (TypeError, ValueError):
+        return default
+    return min(max(value, 1), MAX_PAGE_SIZE)
+
+
+def _cursor_value(sort: str, goods):
+    column, _ = SORT_OPTIONS[sort]
+    value = getattr(goods, column)
+    # Decimal 以字符串保存，解码后仍可精确比较。
+    return str(value) if isinstance(value, Decimal) else value
+
+
+def encode_cursor(sort: str, value, goods_id: int) -> str:
+    """将最后一条记录的 (排序列值, id) 编码为 URL 安全的游标。"""
+    raw = json.dumps([normalize_sort(sort), value, int(goods_id)], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(sort: str, cursor: str):
+    """
+    解析游标，返回 (排序列值, id)。
+    游标为空、格式错误或与当前排序方式不一致时返回 None（即从第一页开始）。
+    """
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        cursor_sort, value, goods_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        if cursor_sort != normalize_sort(sort):
+            return None
+        column, _ = SORT_OPTIONS[cursor_sort]
+        if column == "price":
+            value = Decimal(str(value))
+        elif column == "rating_avg":
+            value = float(value)
+        elif column in ("id", "sales_count"):
+            value = int(value)
+        return value, int(goods_id)
+    except (ValueError, TypeError, InvalidOperation, UnicodeError):
+        return None
+
+
+def goods_card(goods) -> dict:
+    """商品 → 列表卡片字典，数值字段转为 JSON 可序列化类型。"""
+    content = goods.content or ""
+    return {
+        "id": goods.id,
+        "goodsname": goods.goodsname,
+        "category": goods.category,
+        "mainimg": goods.mainimg,
+        "content": content[:CARD_CONTENT_LIMIT],
+        "price": float(goods.price or 0),
+        "original_price": float(goods.original_price) if goods.original_price is not None else None,
+        "brand": goods.brand,
+        "stock": goods.stock,
+        "sales_count": goods.sales_count or 0,
+        "rating_avg": float(goods.rating_avg or 0.0),
+        "updated_at": goods.updated_at.isoformat(timespec="seconds") if goods.updated_at else None,
+    }
+
+
+def goods_detail(goods) -> dict:
+    """商品 → 详情页字典，在列表卡片字段基础上补充完整描述、图片与规格。"""
+    data = goods_card(goods)
+    data.update(
+        {
+            "content": goods.content or "",
+            "model": goods.model,
+            "status": goods.status,
+            "rating_count": goods.rating_count or 0,
+            "images": [{"url": img.url, "is_main": img.is_main} for img in goods.images],
+            "specs": [{"name": spec.name, "value": spec.value} for spec in goods.specs],
+        }
+    )
+    return data
+
+
+def _seek_condition(sort: str, value, last_id: int):
+    # (col, id) 严格位于上一页最后一条之后：col 更"靠后"，或 col 相同且 id 更"靠后"。
+    column_name, desc = SORT_OPTIONS[sort]
+    if column_name == "id":
+        return Goods.id < last_id if desc else Goods.id > last_id
+    column = getattr(Goods, column_name)
+    if desc:
+        return or_(column < value, and_(column == value, Goods.id < last_id))
+    return or_(column > value, and_(column == value, Goods.id > last_id))
+
+
+def _order_by(sort: str):
+    column_name, desc = SORT_OPTIONS[sort]
+    column = getattr(Goods, column_name)
+    if column_name == "id":
+        return (column.desc(),) if desc else (column.asc(),)
+    if desc:
+        return column.desc(), Goods.id.desc()
+    return column.asc(), Goods.id.asc()
+
+
+def _filter_conditions(category=None, brand=None, price=None, in_stock=False):
+    # 分面筛选条件；price 为 facets.PRICE_BUCKETS 中的区间 key，非法值忽略。
+    conditions = [Goods.status == GOODS_ON_SALE]
+    if category:
+        conditions.append(Goods.category == category)
+    if brand:
+        conditions.append(Goods.brand == brand)
+    if price in PRICE_BUCKETS:
+        low, high = PRICE_BUCKETS[price]
+        conditions.append(Goods.price >= low)
+        if high is not None:
+            conditions.append(Goods.price < high)
+    if in_stock:
+        conditions.append(Goods.stock > 0)
+    return conditions
+
+
+def fetch_goods_page(
+    category: str = None,
+    sort: str = "default",
+    cursor: str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    brand: str = None,
+    price: str = None,
+    in_stock: bool = False,
+):
+    """
+    读取一页上架商品，可按分类 / 品牌 / 价格区间 / 是否有货筛选。
+
+    返回 (cards, next_cursor)：cards 为 goods_card 字典列表，
+    next_cursor 为下一页游标，没有更多数据时为 None。
+    """
+    sort = normalize_sort(sort)
+    limit = clamp_page_size(limit)
+
+    query = Goods.query.options(load_only(*_CARD_COLUMNS)).filter(
+        *_filter_conditions(category=category, brand=brand, price=price, in_stock=in_stock)
+    )
+    position = decode_cursor(sort, cursor)
+    if position is not None:
+        query = query.filter(_seek_condition(sort, *position))
+
+    # 多取一条用于判断是否还有下一页，避免额外 COUNT(*)。
+    rows = query.order_by(*_order_by(sort)).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+
+    next_cursor = None
+    if has_more and rows:
+        last = rows[-1]
+        next_cursor = encode_cursor(sort, _cursor_value(sort, last), last.id)
+    return [goods_card(g) for g in rows], next_cursor
+
+
+def get_goods_page(
+    category: str = None,
+    sort: str = "default",
+    cursor: str = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    brand: str = None,
+    price: str = None,
+    in_stock: bool = False,
+):
+    """fetch_goods_page 的缓存版本，返回值与之相同。"""
+    sort = normalize_sort(sort)
+    limit = clamp_page_size(limit)
+    in_stock = bool(in_stock)
+    ident = hashlib.sha1(json.dumps([category, sort, cursor, limit, brand, price, in_stock]).encode("utf-8")).hexdigest()
+
+    def build():
+        items, next_cursor = fetch_goods_page(
+            category=category, sort=sort, cursor=cursor, limit=limit, brand=brand, price=price, in_stock=in_stock
+        )
+        return {"items": items, "next_cursor": next_cursor}
+
+    page = read_through("list", ident, build)
+    return page["items"], page["next_cursor"]
+
+
+def get_goods_detail(goods_id: int):
+    """按 id 读取商品详情字典（带缓存），商品不存在时返回 None。"""
+    def build():
+        goods = db.session.get(Goods, goods_id, options=[selectinload(Goods.images), selectinload(Goods.specs)])
+        return goods_detail(goods) if goods else None
+
+    return read_through("goods", str(int(goods_id)), build)
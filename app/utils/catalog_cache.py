@@ -0,0 +1,157 @@
+"""
+商品目录读穿缓存（Redis）。
+
+缓存键统一挂在目录版本号下：catalog:v{version}:{kind}:{ident}。
+后台任意商品写操作调用 bump_catalog_version() 使版本号 +1，
+旧版本键不再被读取，随 TTL 自然过期，无需逐个删除。
+
+- catalog_version       : 读取当前目录版本号
+- bump_catalog_version  : 目录变更后递增版本号（后台写路径调用）
+- read_through          : 读穿缓存，未命中时用分布式锁防止缓存击穿（stampede）
+- invalidate / invalidate_goods : 仅失效指定键（如支付扣减库存后的单品记录）
+- cache_stats           : 命中/未命中等计数，供 /admin/metrics 展示
+
+stats_key 参数允许其他缓存（如整页缓存 page_cache.py）复用同一套读穿逻辑但单独计数。
+
+Redis 不可用时所有函数降级为直接查库，不影响页面可用性。
+"""
+
+import json
+import logging
+import os
+import secrets
+import time
+
+from redis.exceptions import RedisError
+
+from app.utils.db import delete_many, redis_client, release_lock
+
+logger = logging.getLogger(__name__)
+
+CATALOG_VERSION_KEY = "catalog:version"
+CATALOG_STATS_KEY = "catalog:cache:stats"
+CACHE_TTL = int(os.getenv("CATALOG_CACHE_TTL", "300"))
+LOCK_TTL = 5               # 重建锁最长持有时间（秒），防止进程崩溃后死锁
+LOCK_WAIT_SECONDS = 1.0    # 未抢到锁的请求最多等待重建结果的时间
+LOCK_POLL_INTERVAL = 0.05
+
+
+def catalog_version() -> str:
+    """读取当前目录版本号，未初始化时为 "0"。"""
+    return redis_client.get(CATALOG_VERSION_KEY) or "0"
+
+
+def bump_catalog_version() -> None:
+    """目录变更后递增版本号，使所有列表与商品缓存整体失效。"""
+    try:
+        redis_client.incr(CATALOG_VERSION_KEY)
+    except RedisError:
+        logger.exception("bump_catalog_version failed")
+
+
+def _cache_key(version: str, kind: str, ident: str) -> str:
+    return f"catalog:v{version}:{kind}:{ident}"
+
+
+def _count(stats_key: str, field: str) -> None:
+    try:
+        redis_client.hincrby(stats_key, field, 1)
+    except RedisError:
+        pass
+
+
+def _wait_for(key: str):
+    # 其他请求正在重建：短轮询等待结果，超时返回 None 由调用方直接查库。
+    deadline = time.monotonic() + LOCK_WAIT_SECONDS
+    while time.monotonic() < deadline:
+        time.sleep(LOCK_POLL_INTERVAL)
+        raw = redis_client.get(key)
+        if raw is not None:
+            return raw
+    return None
+
+
+def read_through(kind: str, ident: str, builder, ttl: int = CACHE_TTL, stats_key: str = CATALOG_STATS_KEY):
+    """
+    读穿缓存：命中直接反序列化返回；未命中时只有抢到重建锁的请求执行 builder()，
+    其余请求等待重建结果，避免热点键过期瞬间大量请求同时打到 MySQL。
+    builder() 返回值必须可 JSON 序列化；返回 None 时不写缓存。
+    """
+    try:
+        key = _cache_key(catalog_version(), kind, ident)
+        raw = redis_client.get(key)
+        if raw is not None:
+            _count(stats_key, "hits")
+            return json.loads(raw)
+
+        _count(stats_key, "misses")
+        # 锁值为本次调用的随机令牌：重建超过 LOCK_TTL 时不会释放下一个重建者已持有的锁。
+        lock_key, token = key + ":lock", secrets.token_hex(8)
+        locked = redis_client.set(lock_key, token, nx=True, ex=LOCK_TTL)
+        if not locked:
+            _count(stats_key, "lock_waits")
+            raw = _wait_for(key)
+            if raw is not None:
+                return json.loads(raw)
+    except RedisError:
+        logger.warning("catalog cache unavailable, falling back to database", exc_info=True)
+        _count(stats_key, "errors")
+        return builder()
+    if not locked:
+        return builder()
+
+    # 已抢到重建锁：builder() 只执行一次，之后的写缓存 / 释放锁失败只记录，不再重复查库。
+    try:
+        value = builder()
+    except Exception:
+        _release(lock_key, token)
+        raise
+    _count(stats_key, "builds")
+    try:
+        if value is not None:
+            redis_client.setex(key, ttl, json.dumps(value, ensure_ascii=False, separators=(",", ":")))
+    except RedisError:
+        logger.warning("catalog cache write failed", exc_info=True)
+        _count(stats_key, "errors")
+    _release(lock_key, token)
+    return value
+
+
+def _release(lock_key: str, token: str) -> None:
+    try:
+        release_lock(lock_key, token)
+    except RedisError:
+        pass
+
+
+def invalidate(kind: str, idents) -> None:
+    """失效当前版本下指定 kind 的若干缓存键。"""
+    try:
+        version = catalog_version()
+        delete_many(_cache_key(version, kind, str(ident)) for ident in idents)
+    except RedisError:
+        logger.exception("invalidate %s failed", kind)
+
+
+def invalidate_goods(goods_ids) -> None:
+    """失效指定商品的详情缓存（库存等单品字段变化时使用，不影响列表缓存）。"""
+    invalidate("goods", goods_ids)
+
+
+def cache_stats(stats_key: str = CATALOG_STATS_KEY) -> dict:
+    """返回全局命中/未命中计数与命中率（跨 Gunicorn worker 汇总在 Redis）。"""
+    try:
+        # 统计与版本号合并为一次管道往返。
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hgetall(stats_key)
+        pipe.get(CATALOG_VERSION_KEY)
+        raw, version = pipe.execute()
+        version = version or "0"
+    except RedisError:
+        return {"available": False}
+    stats = {field: int(raw.get(field, 0)) for field in ("hits", "misses", "builds", "lock_waits", "errors")}
+    lookups = stats["hits"] + stats["misses"]
+    stats["hit_ratio"] = round(stats["hits"] / lookups, 4) if lookups else 0.0
+    stats["version"] = version
+    stats["available"] = True
+    return stats
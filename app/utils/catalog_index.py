@@ -0,0 +1,117 @@
+"""
+进程内商品目录索引基类。
+
+搜索倒排索引等内存结构都由 CatalogIndex 派生，统一处理与 MySQL 的同步：
+- 首次使用时从 MySQL 全量构建（每个 Gunicorn worker 各自一份）
+- 之后按目录版本号（catalog_cache.catalog_version）判断是否有商品写入，
+  有变化时仅增量拉取 updated_at >= 水位线 的商品，上架则更新、下架则移除
+- 版本号检查做节流（SYNC_INTERVAL 秒一次），热路径不必每次访问 Redis
+
+子类实现 _add / _discard / _clear 三个钩子，均在持有 self.lock 时调用。
+"""
+
+import logging
+import os
+import threading
+import time
+from datetime import timedelta
+
+from redis.exceptions import RedisError
+
+from app.models.db import GOODS_ON_SALE, Goods
+from app.utils.catalog_cache import catalog_version
+
+logger = logging.getLogger(__name__)
+
+SYNC_INTERVAL = float(os.getenv("CATALOG_INDEX_SYNC_INTERVAL", "1.0"))
+# 水位线回退余量：DATETIME 只有秒级精度，且多实例时钟可能有偏差。
+WATERMARK_SLACK = timedelta(seconds=5)
+BUILD_BATCH_SIZE = 500
+
+
+class CatalogIndex:
+    """与商品目录保持同步的进程内索引。"""
+
+    def __init__(self):
+        self.lock = threading.RLock()
+        self.built = False
+        self._version = None
+        self._watermark = None
+        self._checked_at = 0.0
+
+    # ---- 子类钩子 ----
+    def _add(self, goods) -> None:
+        raise NotImplementedError
+
+    def _discard(self, goods_id: int) -> None:
+        raise NotImplementedError
+
+    def _clear(self) -> None:
+        raise NotImplementedError
+
+    def _query_options(self):
+        """构建/同步时附加到 Goods 查询上的 loader options（如预加载规格）。"""
+        return []
+
+    # ---- 同步逻辑 ----
+    def apply(self, goods) -> None:
+        """增量应用单个商品：上架则（重新）加入索引，否则移除。"""
+        with self.lock:
+            self._discard(goods.id)
+            if goods.status == GOODS_ON_SALE:
+                self._add(goods)
+            if goods.updated_at and (self._watermark is None or goods.updated_at > self._watermark):
+                self._watermark = goods.updated_at
+
+    def rebuild(self) -> int:
+        """从 MySQL 全量重建索引，返回索引中的商品数。"""
+        version = self._read_version()
+        query = Goods.query.options(*self._query_options()).filter(Goods.status == GOODS_ON_SALE)
+        with self.lock:
+            self._clear()
+            self._watermark = None
+            count = 0
+            for goods in query.order_by(Goods.id).yield_per(BUILD_BATCH_SIZE):
+                self.apply(goods)
+                count += 1
+            self._version = version
+            self.built = True
+        logger.info("%s rebuilt with %d goods", type(self).__name__, count)
+        return count
+
+    def sync(self) -> int:
+        """增量拉取水位线之后变更的商品（含下架），返回处理条数。"""
+        version = self._read_version()
+        with self.lock:
+            query = Goods.query.options(*self._query_options())
+            if self._watermark is not None:
+                query = query.filter(Goods.updated_at >= self._watermark - WATERMARK_SLACK)
+            changed = query.all()
+            for goods in changed:
+                self.apply(goods)
+            self._version = version
+        return len(changed)
+
+    def ensure_fresh(self) -> None:
+        """查询前调用：未构建则全量构建，目录版本号变化则增量同步。"""
+        if not self.built:
+            with self.lock:
+                if not self.built:
+                    self.rebuild()
+            return
+
+        now = time.monotonic()
+        if now - self._checked_at < SYNC_INTERVAL:
+            return
+        self._checked_at = now
+        version = self._read_version()
+        if version is not None and version != self._version:
+            self.sync()
+
+    @staticmethod
+    def _read_version():
+        try:
+            return catalog_version()
+        except RedisError:
+            logger.warning("catalog version unavailable, index sync skipped")
+            return None
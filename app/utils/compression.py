@@ -0,0 +1,207 @@
+"""
+动态响应压缩（gzip / brotli）。
+
+init_compression(app) 注册 after_request 钩子，对渲染出的 HTML 与 JSON 按 Accept-Encoding 协商压缩：
+- 优先 br（需安装 brotli），其次 gzip；客户端均不支持时原样返回
+- 流式响应（stream_with_context 等）逐块压缩并 flush，不缓冲整个响应体
+- 超过 COMPRESS_STREAM_THRESHOLD 的大响应体同样分块压缩输出，降低首字节延迟
+- 跳过：小于 COMPRESS_MIN_SIZE 的响应、已带 Content-Encoding 的响应（如预压缩静态文件）、
+  send_file 直通响应、text/event-stream、Cache-Control: no-transform、204/206/304
+
+每个端点的压缩前后字节数与压缩 CPU 时间汇总在 Redis（跨 worker），
+compression_stats() 供 /admin/metrics 展示压缩率与平均 CPU 开销。
+"""
+
+import logging
+import os
+import time
+import zlib
+
+from flask import request
+from redis.exceptions import RedisError
+
+from app.utils.db import redis_client
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESS_MIN_SIZE = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+COMPRESS_STREAM_THRESHOLD = int(os.getenv("COMPRESS_STREAM_THRESHOLD", str(256 * 1024)))
+COMPRESS_CHUNK_SIZE = 64 * 1024
+GZIP_LEVEL = int(os.getenv("COMPRESS_GZIP_LEVEL", "6"))
+BROTLI_QUALITY = int(os.getenv("COMPRESS_BROTLI_QUALITY", "5"))   # 动态压缩取中等质量，11 级 CPU 开销过高
+COMPRESS_STATS_KEY = "compression:stats"
+COMPRESSIBLE_MIMETYPES = {
+    "text/html",
+    "text/plain",
+    "text/css",
+    "text/javascript",
+    "application/javascript",
+    "application/json",
+    "application/xml",
+    "text/xml",
+    "image/svg+xml",
+}
+_STAT_FIELDS = ("responses", "bytes_in", "bytes_out", "cpu_us")
+
+
+class _GzipStream:
+    def __init__(self):
+        self._obj = zlib.compressobj(GZIP_LEVEL, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        # Z_SYNC_FLUSH：每块输出立即可解压，流式响应不会卡在压缩器缓冲区里。
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._obj.flush()
+
+
+class _BrotliStream:
+    def __init__(self):
+        self._obj = brotli.Compressor(quality=BROTLI_QUALITY)
+
+    def compress(self, data: bytes) -> bytes:
+        return self._obj.process(data) + self._obj.flush()
+
+    def finish(self) -> bytes:
+        return self._obj.finish()
+
+
+_COMPRESSORS = {"gzip": _GzipStream}
+if brotli is not None:
+    _COMPRESSORS["br"] = _BrotliStream
+
+
+def _negotiate():
+    # 质量值相同时按服务端偏好 br > gzip。
+    accept = request.accept_encodings
+    best, best_q = None, 0
+    for encoding in ("br", "gzip"):
+        q = accept.quality(encoding)
+        if encoding in _COMPRESSORS and q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def _should_compress(response) -> bool:
+    return (
+        200 <= response.status_code < 300
+        and response.status_code not in (204, 206)
+        and response.mimetype in COMPRESSIBLE_MIMETYPES
+        and "Content-Encoding" not in response.headers
+        and not response.direct_passthrough
+        and "no-transform" not in response.headers.get("Cache-Control", "")
+    )
+
+
+def _record(endpoint: str, bytes_in: int, bytes_out: int, cpu_seconds: float) -> None:
+    values = (1, bytes_in, bytes_out, int(cpu_seconds * 1_000_000))
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        for field, value in zip(_STAT_FIELDS, values):
+            pipe.hincrby(COMPRESS_STATS_KEY, f"{endpoint}|{field}", value)
+        pipe.execute()
+    except RedisError:
+        logger.debug("compression stats unavailable", exc_info=True)
+
+
+def _compress_stream(chunks, encoding: str, endpoint: str, close=None):
+    # 生成器在 WSGI 服务器迭代响应体时执行，统计在流结束后写入。
+    compressor = _COMPRESSORS[encoding]()
+    bytes_in = bytes_out = 0
+    cpu = 0.0
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode("utf-8")
+            if not chunk:
+                continue
+            started = time.process_time()
+            out = compressor.compress(chunk)
+            cpu += time.process_time() - started
+            bytes_in += len(chunk)
+            bytes_out += len(out)
+            if out:
+                yield out
+        started = time.process_time()
+        tail = compressor.finish()
+        cpu += time.process_time() - started
+        bytes_out += len(tail)
+        yield tail
+        _record(endpoint, bytes_in, bytes_out, cpu)
+    finally:
+        if close is not None:
+            close()
+
+
+def _compress_response(response):
+    if not _should_compress(response):
+        return response
+    encoding = _negotiate()
+    response.vary.add("Accept-Encoding")
+    if encoding is None:
+        return response
+    endpoint = request.endpoint or "unknown"
+
+    if response.is_streamed:
+        original = response.response
+        response.response = _compress_stream(original, encoding, endpoint, close=getattr(original, "close", None))
+        response.headers.pop("Content-Length", None)
+    else:
+        data = response.get_data()
+        if len(data) < COMPRESS_MIN_SIZE:
+            return response
+        if len(data) >= COMPRESS_STREAM_THRESHOLD:
+            chunks = (data[i:i + COMPRESS_CHUNK_SIZE] for i in range(0, len(data), COMPRESS_CHUNK_SIZE))
+            response.response = _compress_stream(chunks, encoding, endpoint)
+            response.headers.pop("Content-Length", None)
+        else:
+            started = time.process_time()
+            compressor = _COMPRESSORS[encoding]()
+            compressed = compressor.compress(data) + compressor.finish()
+            cpu = time.process_time() - started
+            if len(compressed) >= len(data):
+                return response
+            response.set_data(compressed)
+            _record(endpoint, len(data), len(compressed), cpu)
+
+    response.headers["Content-Encoding"] = encoding
+    # 压缩后字节不同：强 ETag 降级为弱 ETag，条件请求（http_cache.py）仍可命中。
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+
+def init_compression(app) -> None:
+    """在应用工厂中调用，注册压缩钩子（应最先注册，使其在其他 after_request 之后执行）。"""
+    app.after_request(_compress_response)
+
+
+def compression_stats() -> dict:
+    """返回 {endpoint: {responses, bytes_in, bytes_out, ratio, cpu_ms, cpu_ms_avg}}。"""
+    try:
+        raw = redis_client.hgetall(COMPRESS_STATS_KEY)
+    except RedisError:
+        return {"available": False}
+    endpoints = {}
+    for key, value in raw.items():
+        endpoint, _, field = key.rpartition("|")
+        endpoints.setdefault(endpoint, dict.fromkeys(_STAT_FIELDS, 0))[field] = int(value)
+    report = {}
+    for endpoint, stats in sorted(endpoints.items()):
+        responses = stats["responses"] or 1
+        report[endpoint] = {
+            "responses": stats["responses"],
+            "bytes_in": stats["bytes_in"],
+            "bytes_out": stats["bytes_out"],
+            "ratio": round(stats["bytes_out"] / stats["bytes_in"], 4) if stats["bytes_in"] else 0.0,
+            "cpu_ms": round(stats["cpu_us"] / 1000, 3),
+            "cpu_ms_avg": round(stats["cpu_us"] / 1000 / responses, 3),
+        }
+    return {"available": True, "encodings": sorted(_COMPRESSORS), "endpoints": report}
@@ -5,10 +5,33 @@ Redis 客户端初始化模块。
 - 登录防爆破（失败计数 + 临时锁定）
 - 邮箱验证码存储与校验
 - 密码重置令牌的临时存储
+- 目录 / 整页缓存、站内信通知、压缩统计等
+
+后端由 REDIS_BACKEND 选择：
+- redis（默认）：阻塞式连接池（REDIS_MAX_CONNECTIONS 上限，取连接最多等待 REDIS_POOL_TIMEOUT 秒），
+  连接 / 读写超时、连接错误指数退避重试、空闲连接健康检查；每条命令按命令名记录耗时
+- memory：进程内替身 MemoryRedis（见 memory_redis.py），无需 Redis 服务即可运行应用、测试与基准
+
+重试范围：只对 ConnectionError（建连失败、连接被重置）重试；读写超时（TimeoutError）直接抛出、不重发，
+因为超时的命令可能已在服务端执行。按命令区分：
+- 可安全重试（幂等）：GET / MGET / EXISTS / HGETALL 等读命令，SET / SETEX / DEL / EXPIRE，
+  SET NX 加锁与比较令牌释放锁
+- 重复执行会重复生效：INCR / DECRBY / HINCRBY（登录失败计数、统计、版本号）、LPUSH（发件箱）、
+  PUBLISH、EVALSHA（库存预占、登录限流脚本）；这类命令只在连接错误时重试，
+  仅当连接恰好在命令发出后、回复到达前断开时才可能重复一次
 """
 
 import os
+import threading
+import time
+
 import redis
+from redis.backoff import ExponentialBackoff
+from redis.client import Pipeline
+from redis.exceptions import RedisError
+from redis.retry import Retry
+
+from app.utils.memory_redis import MemoryRedis
 
 
 def _get_env(name: str, default: str) -> str:
@@ -17,10 +40,199 @@ def _get_env(name: str, default: str) -> str:
     return v if v else default
 
 
+REDIS_BACKEND = _get_env("REDIS_BACKEND", "redis").lower()
+REDIS_MAX_CONNECTIONS = int(_get_env("REDIS_MAX_CONNECTIONS", "32"))         # 每个 worker 进程的连接上限
+REDIS_POOL_TIMEOUT = float(_get_env("REDIS_POOL_TIMEOUT", "5"))              # 连接池耗尽时取连接的最长等待秒数
+REDIS_SOCKET_TIMEOUT = float(_get_env("REDIS_SOCKET_TIMEOUT", "2"))          # 单条命令读写超时
+REDIS_CONNECT_TIMEOUT = float(_get_env("REDIS_CONNECT_TIMEOUT", "1"))        # 建立连接超时
+REDIS_RETRY_ATTEMPTS = int(_get_env("REDIS_RETRY_ATTEMPTS", "2"))            # 连接错误的重试次数（超时不重试）
+REDIS_HEALTH_CHECK_INTERVAL = int(_get_env("REDIS_HEALTH_CHECK_INTERVAL", "30"))
+
+# 耗时直方图桶上界（毫秒），用于估算 p50 / p99，不保存每次的原始耗时。
+_LATENCY_BUCKETS_MS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, float("inf"))
+
+
+class _CommandStats:
+    """进程内分命令耗时统计；刻意不写回 Redis，避免统计本身产生额外往返。"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._commands = {}
+
+    def observe(self, command: str, seconds: float, failed: bool = False) -> None:
+        ms = seconds * 1000
+        with self._lock:
+            entry = self._commands.get(command)
+            if entry is None:
+                entry = self._commands[command] = {"calls": 0, "errors": 0, "total_ms": 0.0, "max_ms": 0.0,
+                                                   "buckets": [0] * len(_LATENCY_BUCKETS_MS)}
+            entry["calls"] += 1
+            entry["errors"] += failed
+            entry["total_ms"] += ms
+            entry["max_ms"] = max(entry["max_ms"], ms)
+            for i, bound in enumerate(_LATENCY_BUCKETS_MS):
+                if ms <= bound:
+                    entry["buckets"][i] += 1
+                    break
+
+    @staticmethod
+    def _percentile(entry: dict, q: float) -> float:
+        target, seen = entry["calls"] * q, 0
+        for bound, count in zip(_LATENCY_BUCKETS_MS, entry["buckets"]):
+            seen += count
+            if seen >= target:
+                return entry["max_ms"] if bound == float("inf") else min(bound, entry["max_ms"])
+        return entry["max_ms"]
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            entries = {name: dict(entry, buckets=list(entry["buckets"])) for name, entry in self._commands.items()}
+        return {
+            name: {
+                "calls": entry["calls"],
+                "errors": entry["errors"],
+                "avg_ms": round(entry["total_ms"] / entry["calls"], 3),
+                "p50_ms": round(self._percentile(entry, 0.5), 3),
+                "p99_ms": round(self._percentile(entry, 0.99), 3),
+                "max_ms": round(entry["max_ms"], 3),
+            }
+            for name, entry in sorted(entries.items())
+        }
+
+
+command_stats = _CommandStats()
+
+
+class InstrumentedPipeline(Pipeline):
+    """整批执行计为一次 PIPELINE 命令。"""
+
+    def execute(self, raise_on_error: bool = True):
+        started, failed = time.perf_counter(), False
+        try:
+            return super().execute(raise_on_error)
+        except RedisError:
+            failed = True
+            raise
+        finally:
+            command_stats.observe("PIPELINE", time.perf_counter() - started, failed)
+
+
+class InstrumentedRedis(redis.Redis):
+    """按命令名（GET / EVALSHA / ...）记录每次调用耗时的客户端。"""
+
+    def execute_command(self, *args, **options):
+        started, failed = time.perf_counter(), False
+        try:
+            return super().execute_command(*args, **options)
+        except RedisError:
+            failed = True
+            raise
+        finally:
+            command_stats.observe(str(args[0]).upper(), time.perf_counter() - started, failed)
+
+    def pipeline(self, transaction: bool = True, shard_hint=None):
+        return InstrumentedPipeline(self.connection_pool, self.response_callbacks, transaction, shard_hint)
+
+
+def _create_client():
+    if REDIS_BACKEND == "memory":
+        return MemoryRedis()
+    pool = redis.BlockingConnectionPool(
+        host=_get_env("REDIS_HOST", "127.0.0.1"),
+        port=int(_get_env("REDIS_PORT", "6379")),
+        db=int(_get_env("REDIS_DB", "0")),
+        password=os.getenv("REDIS_PASSWORD") or None,
+        max_connections=REDIS_MAX_CONNECTIONS,
+        timeout=REDIS_POOL_TIMEOUT,
+        socket_timeout=REDIS_SOCKET_TIMEOUT,
+        socket_connect_timeout=REDIS_CONNECT_TIMEOUT,
+        socket_keepalive=True,
+        health_check_interval=REDIS_HEALTH_CHECK_INTERVAL,
+        # 只重试连接错误：超时的 INCR / LPUSH / EVALSHA 可能已执行，重发会重复生效（见模块说明）。
+        retry=Retry(ExponentialBackoff(cap=0.5, base=0.02), REDIS_RETRY_ATTEMPTS,
+                    supported_errors=(redis.exceptions.ConnectionError,)),
+        decode_responses=True,
+    )
+    return InstrumentedRedis(connection_pool=pool)
+
+
 # 全局 Redis 客户端（decode_responses=True 使返回值自动解码为 str）
-redis_client = redis.Redis(
-    host=_get_env("REDIS_HOST", "127.0.0.1"),
-    port=int(_get_env("REDIS_PORT", "6379")),
-    db=int(_get_env("REDIS_DB", "0")),
-    decode_responses=True,
-)
+redis_client = _create_client()
+
+
+def redis_script(lua: str, fallback):
+    """
+    注册服务端脚本，返回可调用对象 script(keys=[...], args=[...])。
+    fallback(client, keys, args) 是与 Lua 等价的 Python 实现（args 与 ARGV 一样是字符串），
+    仅在 memory 后端使用，执行期间持有 MemoryRedis 的全局锁以保证原子性。
+    """
+    if not isinstance(redis_client, MemoryRedis):
+        return redis_client.register_script(lua)
+
+    def run(keys=(), args=(), client=None):
+        with redis_client._lock:
+            return fallback(redis_client, [str(k) for k in keys], [str(a) for a in args])
+
+    return run
+
+
+# 比较后删除：锁仍是调用方持有（值等于令牌）时才释放。KEYS[1]=锁键 ARGV[1]=令牌
+_UNLOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+
+def _unlock_py(client, keys, args):
+    # 与 _UNLOCK_LUA 等价，仅供 REDIS_BACKEND=memory 使用。
+    if client.get(keys[0]) == args[0]:
+        return client.delete(keys[0])
+    return 0
+
+
+_unlock = redis_script(_UNLOCK_LUA, _unlock_py)
+
+
+def release_lock(key: str, token: str) -> bool:
+    """释放以 SET key token NX EX 获取的锁；锁已过期或被他人持有时不做任何事，返回 False。"""
+    return bool(_unlock(keys=[key], args=[token]))
+
+
+def get_many(keys) -> dict:
+    """MGET 一次往返读取多个键，返回 {key: value}（不存在的键值为 None）。"""
+    keys = list(keys)
+    if not keys:
+        return {}
+    return dict(zip(keys, redis_client.mget(keys)))
+
+
+def setex_many(mapping: dict, ttl: int) -> None:
+    """非事务管道一次往返写入多个带过期时间的键。"""
+    if not mapping:
+        return
+    pipe = redis_client.pipeline(transaction=False)
+    for key, value in mapping.items():
+        pipe.setex(key, ttl, value)
+    pipe.execute()
+
+
+def delete_many(keys, chunk_size: int = 500) -> int:
+    """分块 DEL，避免单条命令携带过多参数阻塞 Redis；返回删除的键数。"""
+    keys, removed = list(keys), 0
+    for start in range(0, len(keys), chunk_size):
+        removed += redis_client.delete(*keys[start:start + chunk_size])
+    return removed
+
+
+def redis_stats() -> dict:
+    """当前进程的 Redis 客户端统计：后端、连接池占用、分命令调用次数与耗时（毫秒）。"""
+    stats = {"backend": REDIS_BACKEND, "commands": command_stats.snapshot()}
+    pool = getattr(redis_client, "connection_pool", None)
+    if pool is not None:
+        created = len(getattr(pool, "_connections", ()))
+        idle = sum(1 for conn in list(getattr(getattr(pool, "pool", None), "queue", ())) if conn is not None)
+        stats["pool"] = {"max_connections": pool.max_connections, "created": created,
+                         "in_use": created - idle, "idle": idle}
+    return stats
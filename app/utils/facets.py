@@ -0,0 +1,96 @@
+"""
+首页分面导航（faceted navigation）计数。
+
+分面：分类 category、品牌 brand、价格区间 price、是否有货 in_stock。
+计数在进程内增量维护（FacetIndex 继承 CatalogIndex）：每个上架商品加入时按其分面值 +1，
+下架/编辑时先按旧值 -1 再按新值 +1，页面渲染只读内存字典，不再对 goods 做 GROUP BY。
+
+计数分两个作用域：全站（""）与单个分类。选中分类后品牌/价格/有货计数取该分类作用域，
+分类本身的计数始终取全站作用域。
+
+- PRICE_BUCKETS        : 价格区间定义，key → (下限, 上限)，上限为 None 表示不封顶
+- price_bucket         : 价格 → 区间 key
+- facet_index.counts() : 返回各分面的 [(值, 数量)] 列表
+"""
+
+from collections import Counter, defaultdict
+from decimal import Decimal
+
+from app.utils.catalog_index import CatalogIndex
+
+# 价格区间（左闭右开），顺序即页面展示顺序。
+PRICE_BUCKETS = {
+    "0-100": (Decimal("0"), Decimal("100")),
+    "100-500": (Decimal("100"), Decimal("500")),
+    "500-1000": (Decimal("500"), Decimal("1000")),
+    "1000-3000": (Decimal("1000"), Decimal("3000")),
+    "3000-5000": (Decimal("3000"), Decimal("5000")),
+    "5000+": (Decimal("5000"), None),
+}
+FACETS = ("category", "brand", "price", "in_stock")
+
+
+def price_bucket(price) -> str:
+    """返回价格所在区间 key，价格为空按 0 处理。"""
+    value = Decimal(str(price or 0))
+    for key, (low, high) in PRICE_BUCKETS.items():
+        if value >= low and (high is None or value < high):
+            return key
+    return next(iter(PRICE_BUCKETS))
+
+
+class FacetIndex(CatalogIndex):
+    """按作用域（全站 / 分类）增量维护的分面计数。"""
+
+    def __init__(self):
+        super().__init__()
+        self._clear()
+
+    def _clear(self) -> None:
+        self.scopes = defaultdict(lambda: {facet: Counter() for facet in FACETS})
+        self.contributions = {}    # goods_id → 该商品计入的分面值，用于撤销
+
+    def _apply_delta(self, values: dict, delta: int) -> None:
+        # 空分类的商品只属于全站作用域，集合去重避免对全站重复计数。
+        for scope in {"", values["category"]}:
+            counters = self.scopes[scope]
+            for facet in FACETS:
+                counters[facet][values[facet]] += delta
+                if counters[facet][values[facet]] <= 0:
+                    del counters[facet][values[facet]]
+
+    def _add(self, goods) -> None:
+        values = {
+            "category": goods.category or "",
+            "brand": goods.brand or "",
+            "price": price_bucket(goods.price),
+            "in_stock": "1" if (goods.stock or 0) > 0 else "0",
+        }
+        self.contributions[goods.id] = values
+        self._apply_delta(values, 1)
+
+    def _discard(self, goods_id: int) -> None:
+        values = self.contributions.pop(goods_id, None)
+        if values is not None:
+            self._apply_delta(values, -1)
+
+    def counts(self, category: str = None) -> dict:
+        """
+        返回 {分面: [(值, 数量), ...]}。
+        category / brand 按数量降序，price 按区间顺序，in_stock 只返回有货数量。
+        """
+        self.ensure_fresh()
+        with self.lock:
+            overall = self.scopes.get("")
+            scoped = self.scopes.get(category or "")
+            categories = overall["category"] if overall else Counter()
+            scoped = scoped or {facet: Counter() for facet in FACETS}
+            return {
+                "category": [(value, n) for value, n in categories.most_common() if value],
+                "brand": [(value, n) for value, n in scoped["brand"].most_common() if value],
+                "price": [(key, scoped["price"][key]) for key in PRICE_BUCKETS if scoped["price"][key]],
+                "in_stock": scoped["in_stock"]["1"],
+            }
+
+
+facet_index = FacetIndex()
@@ -0,0 +1,64 @@
+"""
+HTTP 条件请求（Conditional GET）支持。
+
+conditional_get(validators) 装饰器：validators(*args, **kwargs) 返回 (etag, last_modified)，
+请求携带的 If-None-Match / If-Modified-Since 与之匹配时直接返回 304，不执行视图函数；
+否则执行视图并在 200 响应上附加 ETag（弱校验）与 Last-Modified。
+validators 返回 None 表示本次请求不参与协商（如已登录用户的个性化页面）。
+
+校验值应来自廉价数据源（Redis 中的版本号、缓存的商品记录），而不是加载完整 ORM 对象。
+ETag 使用弱校验（W/"..."），压缩前后的响应体都视为同一表示。
+"""
+
+from datetime import datetime, timezone
+from functools import wraps
+
+from flask import Response, make_response, request
+
+
+def _as_utc(value):
+    # 数据库 DATETIME 为无时区的本地时间（datetime.now 写入），按本机时区换算为 UTC，与 HTTP 日期比较时保持一致。
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def _not_modified(etag: str, last_modified) -> bool:
+    # RFC 9110：存在 If-None-Match 时忽略 If-Modified-Since。
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(etag)
+    if last_modified is not None and request.if_modified_since is not None:
+        return last_modified <= request.if_modified_since
+    return False
+
+
+def conditional_get(validators, cache_control: str = "no-cache"):
+    """为 GET/HEAD 视图增加 ETag / Last-Modified 协商，命中时返回 304。"""
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if request.method not in ("GET", "HEAD"):
+                return view(*args, **kwargs)
+            tags = validators(*args, **kwargs)
+            if tags is None:
+                return view(*args, **kwargs)
+
+            etag, last_modified = tags
+            last_modified = _as_utc(last_modified)
+            if _not_modified(etag, last_modified):
+                response = Response(status=304)
+            else:
+                response = make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+            response.set_etag(etag, weak=True)
+            if last_modified is not None:
+                response.last_modified = last_modified
+            response.headers["Cache-Control"] = cache_control
+            return response
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,133 @@
+"""
+幂等键（Idempotency-Key 请求头）支持，默认关闭（IDEMPOTENCY_ENABLED=1 开启）。
+
+关闭时装饰器直接执行视图，V-Race-Condition 等并发靶场行为不受影响。开启后对带 Idempotency-Key 的 POST：
+- 首次请求：SET NX 写入"处理中"标记后执行视图，把响应（状态码、Content-Type、响应体）
+  存入 Redis，保留 IDEMPOTENCY_TTL 秒
+- 重复请求：直接重放已保存的响应（附加 Idempotent-Replayed: true），不再执行事务
+- 并发重复：轮询等待首个请求的结果，最多 IDEMPOTENCY_WAIT_SECONDS 秒，超时返回 409
+- 同一个键但请求体不同：返回 422；视图抛出异常或返回 5xx 时删除记录，允许客户端重试
+
+键按"当前登录用户 + 请求路径"隔离，不同用户使用相同的键互不影响。Redis 不可用时退化为直接执行。
+
+- idempotent : 视图装饰器（购物车结算、订单支付、储值券兑换）
+"""
+
+import base64
+import hashlib
+import json
+import logging
+import os
+import time
+from functools import wraps
+
+from flask import Response, jsonify, make_response, request, session
+from redis.exceptions import RedisError
+
+from app.utils.db import redis_client
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_ENABLED = os.getenv("IDEMPOTENCY_ENABLED", "0") == "1"
+IDEMPOTENCY_TTL = int(os.getenv("IDEMPOTENCY_TTL", "86400"))            # 已完成响应的保留秒数
+IDEMPOTENCY_LOCK_TTL = int(os.getenv("IDEMPOTENCY_LOCK_TTL", "30"))     # 处理中标记的最长存活秒数（进程崩溃兜底）
+IDEMPOTENCY_WAIT_SECONDS = float(os.getenv("IDEMPOTENCY_WAIT_SECONDS", "10"))
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+_MAX_KEY_LENGTH = 128
+_POLL_INTERVAL = 0.05
+
+
+def _record_key(key: str) -> str:
+    scope = session.get("user_id") or "anon"
+    digest = hashlib.sha256(f"{scope}\0{request.path}\0{key}".encode("utf-8")).hexdigest()
+    return f"idem:{digest}"
+
+
+def _fingerprint() -> str:
+    # 兑换码等参数可能放在查询串里，与请求体一起参与比对。
+    return hashlib.sha256(request.query_string + b"\0" + request.get_data(cache=True)).hexdigest()
+
+
+def _serialize(response, fingerprint: str) -> str:
+    return json.dumps({
+        "state": "done",
+        "fingerprint": fingerprint,
+        "status": response.status_code,
+        "content_type": response.content_type,
+        "location": response.headers.get("Location"),
+        "body": base64.b64encode(response.get_data()).decode("ascii"),
+    })
+
+
+def _replay(record: dict):
+    response = Response(base64.b64decode(record["body"]), status=record["status"], content_type=record["content_type"])
+    if record.get("location"):
+        response.headers["Location"] = record["location"]
+    response.headers["Idempotent-Replayed"] = "true"
+    return response
+
+
+def _conflict(message: str, status: int):
+    return jsonify({"success": False, "message": message}), status
+
+
+def _wait_for(record_key: str, fingerprint: str):
+    """等待处理中的同键请求完成，返回重放响应；标记消失（首个请求失败）时返回 None，由调用方重新抢占。"""
+    deadline = time.monotonic() + IDEMPOTENCY_WAIT_SECONDS
+    while True:
+        raw = redis_client.get(record_key)
+        if raw is None:
+            return None
+        record = json.loads(raw)
+        if record["fingerprint"] != fingerprint:
+            return _conflict("幂等键已用于不同的请求", 422)
+        if record["state"] == "done":
+            return _replay(record)
+        if time.monotonic() >= deadline:
+            return _conflict("相同请求正在处理中，请稍后重试", 409)
+        time.sleep(_POLL_INTERVAL)
+
+
+def _forget(record_key: str) -> None:
+    try:
+        redis_client.delete(record_key)
+    except RedisError:
+        pass
+
+
+def idempotent(view):
+    """为 POST 视图增加 Idempotency-Key 重放；IDEMPOTENCY_ENABLED 关闭或请求未带该头时原样执行。"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER)
+        if not IDEMPOTENCY_ENABLED or request.method != "POST" or not key:
+            return view(*args, **kwargs)
+        if len(key) > _MAX_KEY_LENGTH:
+            return _conflict("Idempotency-Key 过长", 400)
+
+        record_key, fingerprint = _record_key(key), _fingerprint()
+        pending = json.dumps({"state": "pending", "fingerprint": fingerprint})
+        try:
+            while not redis_client.set(record_key, pending, nx=True, ex=IDEMPOTENCY_LOCK_TTL):
+                replayed = _wait_for(record_key, fingerprint)
+                if replayed is not None:
+                    return replayed
+        except RedisError:
+            logger.warning("idempotency store unavailable, executing request", exc_info=True)
+            return view(*args, **kwargs)
+
+        try:
+            response = make_response(view(*args, **kwargs))
+        except Exception:
+            _forget(record_key)
+            raise
+        if response.status_code >= 500 or response.is_streamed:
+            _forget(record_key)
+            return response
+        try:
+            redis_client.set(record_key, _serialize(response, fingerprint), ex=IDEMPOTENCY_TTL)
+        except RedisError:
+            logger.warning("idempotency response not stored", exc_info=True)
+        return response
+
+    return wrapper
@@ -0,0 +1,95 @@
+"""
+请求级登录身份（g.user）加载。
+
+before_app_request 钩子 auth.load_logged_in_user 通过 load_identity() 设置 g.user：
+- 静态资源、上传文件、健康检查等端点直接跳过，不读 session、不查库
+- 其余请求从 Redis 读取用户快照 UserSnapshot（id / username / email / balance），
+  未命中时按主键查库一次并缓存 USER_CACHE_TTL 秒
+- 需要修改用户的处理函数通过 current_user_for_update() 按需加载完整 ORM 对象
+
+余额、用户名、密码变更提交后调用 invalidate_user(user_id) 删除快照
+（voucher_redeem / checkout / profile / reset_password）。Redis 不可用时降级为直接查库。
+"""
+
+import json
+import logging
+import os
+from dataclasses import asdict, dataclass
+from decimal import Decimal
+
+from flask import g, request, session
+from redis.exceptions import RedisError
+
+from app.models.db import User, db
+from app.utils.db import redis_client
+
+logger = logging.getLogger(__name__)
+
+USER_CACHE_TTL = int(os.getenv("USER_CACHE_TTL", "60"))
+# 不需要登录身份的端点：不访问 session（响应也不会带 Vary: Cookie），不查库。
+ANONYMOUS_ENDPOINTS = {"static", "main.uploads", "main.healthz"}
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """模板与只读逻辑使用的用户快照，不含密码。"""
+    id: int
+    username: str
+    email: str
+    balance: Decimal
+
+    @classmethod
+    def from_user(cls, user) -> "UserSnapshot":
+        return cls(id=user.id, username=user.username, email=user.email, balance=Decimal(str(user.balance or 0)))
+
+
+def _cache_key(user_id) -> str:
+    return f"user:snapshot:{user_id}"
+
+
+def _load_snapshot(user_id):
+    try:
+        raw = redis_client.get(_cache_key(user_id))
+        if raw is not None:
+            data = json.loads(raw)
+            return UserSnapshot(data["id"], data["username"], data["email"], Decimal(data["balance"]))
+    except RedisError:
+        logger.warning("user snapshot cache unavailable", exc_info=True)
+        user = db.session.get(User, user_id)
+        return UserSnapshot.from_user(user) if user else None
+
+    user = db.session.get(User, user_id)
+    if user is None:
+        return None
+    snapshot = UserSnapshot.from_user(user)
+    data = asdict(snapshot)
+    data["balance"] = str(snapshot.balance)
+    try:
+        redis_client.setex(_cache_key(user_id), USER_CACHE_TTL, json.dumps(data, ensure_ascii=False))
+    except RedisError:
+        pass
+    return snapshot
+
+
+def load_identity() -> None:
+    """设置 g.user（UserSnapshot 或 None）。"""
+    if request.endpoint in ANONYMOUS_ENDPOINTS:
+        g.user = None
+        return
+    user_id = session.get("user_id")
+    g.user = _load_snapshot(user_id) if user_id is not None else None
+
+
+def current_user_for_update():
+    """加载当前登录用户的 ORM 对象（修改余额等场景），未登录返回 None。"""
+    if getattr(g, "user", None) is None:
+        return None
+    return db.session.get(User, g.user.id)
+
+
+def invalidate_user(user_id) -> None:
+    """用户名 / 密码 / 余额变更提交后调用，下一次请求重新查库。"""
+    try:
+        redis_client.delete(_cache_key(user_id))
+    except RedisError:
+        logger.exception("invalidate_user failed")
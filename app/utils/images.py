@@ -0,0 +1,174 @@
+"""
+商品图片衍生尺寸（缩略图 / 卡片 / 详情）与 WebP 版本。
+
+后台上传图片后调用 schedule_variants(url)，在后台线程池中生成：
+  /uploads/<name>.thumb.jpg  /uploads/<name>.thumb.webp   （IMAGE_VARIANTS 中每个尺寸各一组）
+  /uploads/<name>.variants.json                           （尺寸清单，生成完成后最后写入）
+带透明通道的图片保留 PNG，其余统一转为渐进式 JPEG。原图保持不变，数据库中的 URL 也不变。
+
+模板通过过滤器按需解析到合适的衍生图，清单不存在（尚未生成 / 外链图片 / 未安装 Pillow）时回退原图：
+- image_src(url, variant)     : 指定尺寸的衍生图 URL
+- image_srcset(url, fmt=None) : "a.thumb.jpg 160w, a.card.jpg 480w, ..." 形式的 srcset，fmt="webp" 取 WebP 版本
+- responsive_image(url, variant) : 上述结果的字典形式，供 JSON 接口使用
+- upload_name / variants_path   : 本地上传文件名解析与尺寸清单路径（补生成脚本 scripts/build_image_variants.py 使用）
+
+依赖：Pillow（可选），未安装时不生成衍生图，页面始终使用原图。
+"""
+
+import json
+import logging
+import os
+import posixpath
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover
+    Image = None
+    ImageOps = None
+
+from app.utils.catalog_cache import bump_catalog_version
+
+logger = logging.getLogger(__name__)
+
+UPLOAD_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "uploads")
+UPLOAD_URL_PREFIX = "/uploads/"
+# 衍生尺寸：名称 → 最大宽度（像素），按宽度升序，srcset 依此顺序输出。
+IMAGE_VARIANTS = {"thumb": 160, "card": 480, "detail": 1024}
+JPEG_QUALITY = 82
+WEBP_QUALITY = 80
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", "2"))
+
+_executor = None
+_executor_lock = threading.Lock()
+_manifests = {}    # 原图文件名 → 尺寸清单（衍生图生成后不再变化，只缓存已存在的清单）
+
+
+def _executor_instance() -> ThreadPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=IMAGE_WORKERS, thread_name_prefix="image-variants")
+        return _executor
+
+
+def upload_name(url):
+    # 只处理本站上传目录下的图片；外链与其他路径一律返回 None。
+    if not url or not url.startswith(UPLOAD_URL_PREFIX):
+        return None
+    name = url[len(UPLOAD_URL_PREFIX):]
+    if not name or name != posixpath.basename(name):
+        return None
+    return name
+
+
+def variants_path(name: str) -> str:
+    return os.path.join(UPLOAD_DIR, posixpath.splitext(name)[0] + ".variants.json")
+
+
+def _save_atomic(image, path: str, **params) -> None:
+    # 先写临时文件再 rename，页面不会引用到写了一半的图片。
+    tmp = path + ".tmp"
+    image.save(tmp, **params)
+    os.replace(tmp, path)
+
+
+def generate_variants(name: str) -> dict:
+    """为 uploads 目录下的原图生成全部衍生图并写出清单，返回清单内容。"""
+    stem = posixpath.splitext(name)[0]
+    with Image.open(os.path.join(UPLOAD_DIR, name)) as original:
+        original = ImageOps.exif_transpose(original)
+        has_alpha = original.mode in ("RGBA", "LA") or (original.mode == "P" and "transparency" in original.info)
+        base = original.convert("RGBA" if has_alpha else "RGB")
+
+    ext, fmt, params = (".png", "PNG", {"optimize": True}) if has_alpha else (
+        ".jpg", "JPEG", {"quality": JPEG_QUALITY, "optimize": True, "progressive": True})
+    manifest = {}
+    for variant, max_width in IMAGE_VARIANTS.items():
+        resized = base.copy()
+        resized.thumbnail((max_width, max_width * 4), Image.LANCZOS)
+        filename = f"{stem}.{variant}{ext}"
+        webp_name = f"{stem}.{variant}.webp"
+        _save_atomic(resized, os.path.join(UPLOAD_DIR, filename), format=fmt, **params)
+        _save_atomic(resized, os.path.join(UPLOAD_DIR, webp_name), format="WEBP", quality=WEBP_QUALITY, method=4)
+        manifest[variant] = {"width": resized.width, "src": filename, "webp": webp_name}
+        if resized.width >= base.width:
+            break   # 原图不够宽，更大的尺寸与当前尺寸相同，不再重复生成
+
+    tmp = variants_path(name) + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, variants_path(name))
+    return manifest
+
+
+def _generate_safely(name: str) -> None:
+    try:
+        generate_variants(name)
+        logger.info("image variants generated for %s", name)
+        bump_catalog_version()    # 让已缓存的页面 / 商品记录改用衍生图
+    except Exception:
+        # 上传内容未经校验，非图片或损坏文件只记录日志，页面继续使用原图。
+        logger.exception("image variant generation failed for %s", name)
+
+
+def schedule_variants(url: str) -> bool:
+    """上传完成后调用：把衍生图生成任务放入后台线程池，不阻塞请求。"""
+    name = upload_name(url)
+    if name is None or Image is None:
+        return False
+    _executor_instance().submit(_generate_safely, name)
+    return True
+
+
+def _load_manifest(url):
+    name = upload_name(url)
+    if name is None:
+        return None
+    manifest = _manifests.get(name)
+    if manifest is None:
+        try:
+            with open(variants_path(name), encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (OSError, ValueError):
+            return None
+        _manifests[name] = manifest
+    return manifest
+
+
+def image_src(url: str, variant: str = "card", fmt: str = None) -> str:
+    """返回指定尺寸的衍生图 URL；该尺寸未生成时取不超过它的最大尺寸，清单不存在时返回原图。"""
+    manifest = _load_manifest(url)
+    if not manifest:
+        return url
+    chosen = None
+    for name in IMAGE_VARIANTS:
+        if name in manifest:
+            chosen = manifest[name]
+        if name == variant:
+            break
+    key = "webp" if fmt == "webp" else "src"
+    return UPLOAD_URL_PREFIX + chosen[key] if chosen else url
+
+
+def image_srcset(url: str, fmt: str = None) -> str:
+    """返回 srcset 字符串；清单不存在时返回空字符串（模板据此省略 srcset 属性）。"""
+    manifest = _load_manifest(url)
+    if not manifest:
+        return ""
+    key = "webp" if fmt == "webp" else "src"
+    return ", ".join(
+        f"{UPLOAD_URL_PREFIX}{manifest[name][key]} {manifest[name]['width']}w"
+        for name in IMAGE_VARIANTS if name in manifest
+    )
+
+
+def responsive_image(url: str, variant: str = "card") -> dict:
+    return {"src": image_src(url, variant), "srcset": image_srcset(url), "webp_srcset": image_srcset(url, "webp")}
+
+
+def init_images(app) -> None:
+    """注册模板过滤器。"""
+    app.add_template_filter(image_src, "image_src")
+    app.add_template_filter(image_srcset, "image_srcset")
@@ -0,0 +1,373 @@
+"""
+库存扣减模式（INVENTORY_MODE）。
+
+- direct（默认）：支付时在 Python 中检查并扣减 goods.stock。
+  保留 V-Race-Condition 靶场行为，热点商品高并发下会超卖。
+- reserve：秒杀 / 压测场景，流程如下：
+  1. 预占：Lua 脚本原子地检查并扣减 Redis 可用库存 inv:stock:{goods_id}，
+     同时登记预占明细 inv:hold:{order_id}，到期时间记在有序集合 inv:holds（分数为时间戳）
+  2. 支付事务中写入 stock_settlements（待扣减数量）；提交后确认预占（删除预占记录），提交失败立即释放
+  3. 结算：后台线程把待扣减数量按商品汇总，一条 UPDATE 扣到 goods.stock 并删除明细
+     （FOR UPDATE SKIP LOCKED，多个 worker 不会重复扣减）
+  4. 回收：到期未确认的预占，订单已支付（提交后进程崩溃）则只删除预占，否则把数量加回可用库存
+  不变式：inv:stock = goods.stock - 未结算数量 - 有效预占数量。
+
+- reserve_stock / confirm_reservation / release_reservation : 支付流程调用
+- hold_items           : 订单明细按商品合并为预占参数
+- add_settlements      : 支付事务内写入待扣减数量
+- settle_pending       : 批量结算到 goods.stock
+- reap_expired_holds   : 回收到期预占
+- reset_available      : 管理员修改库存后删除 Redis 计数，下次预占时按不变式重建
+- reconcile_inventory  : 按不变式检查（可选修正）Redis 可用库存偏差
+- inventory_stats      : 模式、有效预占数、待结算行数与各类计数（/admin/metrics）
+- init_inventory       : reserve 模式下每个 worker 启动结算 / 回收线程
+"""
+
+import logging
+import os
+import time
+
+from flask import current_app
+from redis.exceptions import RedisError
+from sqlalchemy import case, delete, func, select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.models.db import Goods, Order, StockSettlement, db
+from app.utils.background import BackgroundLoop
+from app.utils.catalog_cache import bump_catalog_version, invalidate_goods
+from app.utils.db import get_many, redis_client, redis_script
+from app.utils.page_cache import purge_page
+
+logger = logging.getLogger(__name__)
+
+INVENTORY_MODE = os.getenv("INVENTORY_MODE", "direct").lower()
+INVENTORY_HOLD_SECONDS = int(os.getenv("INVENTORY_HOLD_SECONDS", "60"))        # 预占有效期
+INVENTORY_SETTLE_SECONDS = float(os.getenv("INVENTORY_SETTLE_SECONDS", "1"))   # 结算 / 回收间隔
+INVENTORY_SETTLE_BATCH = int(os.getenv("INVENTORY_SETTLE_BATCH", "500"))       # 每次结算的最大行数
+STOCK_KEY_PREFIX = "inv:stock:"
+HOLDS_KEY = "inv:holds"
+INVENTORY_STATS_KEY = "inv:stats"
+RESERVED, INSUFFICIENT, IN_PROGRESS, UNINITIALIZED = 1, 0, 2, -1
+
+# 预占：全部商品库存充足才一起扣减，并登记预占明细与到期时间。
+# KEYS[1]=inv:holds KEYS[2]=inv:hold:{order_id} KEYS[3..]=各商品可用库存
+# ARGV[1]=order_id ARGV[2]=到期时间戳 ARGV[3..2+n]=数量 ARGV[3+n..]=goods_id
+# 返回 {状态, 序号}：{1,0} 成功 / {0,i} 第 i 个商品不足 / {-1,i} 第 i 个商品未初始化 / {2,0} 已在预占中
+_RESERVE_LUA = """
+local n = #KEYS - 2
+for i = 1, n do
+    local stock = redis.call('GET', KEYS[i + 2])
+    if not stock then
+        return {-1, i}
+    end
+    if tonumber(stock) < tonumber(ARGV[2 + i]) then
+        return {0, i}
+    end
+end
+if redis.call('EXISTS', KEYS[2]) == 1 then
+    return {2, 0}
+end
+for i = 1, n do
+    redis.call('DECRBY', KEYS[i + 2], ARGV[2 + i])
+    redis.call('HINCRBY', KEYS[2], ARGV[2 + n + i], ARGV[2 + i])
+end
+redis.call('ZADD', KEYS[1], ARGV[2], ARGV[1])
+return {1, 0}
+"""
+
+# 释放：预占仍有效时把数量加回可用库存（键名由 ARGV[2] 前缀 + goods_id 拼出）。
+# KEYS[1]=inv:holds KEYS[2]=inv:hold:{order_id}；ARGV[1]=order_id ARGV[2]=可用库存键前缀
+_RELEASE_LUA = """
+if redis.call('ZREM', KEYS[1], ARGV[1]) == 0 then
+    return 0
+end
+local items = redis.call('HGETALL', KEYS[2])
+for i = 1, #items, 2 do
+    redis.call('INCRBY', ARGV[2] .. items[i], items[i + 1])
+end
+redis.call('DEL', KEYS[2])
+return 1
+"""
+
+
+def _reserve_py(client, keys, args):
+    # 与 _RESERVE_LUA 等价，仅供 REDIS_BACKEND=memory 使用。
+    stock_keys, n = keys[2:], len(keys) - 2
+    quantities, goods_ids = args[2:2 + n], args[2 + n:]
+    for i, key in enumerate(stock_keys, start=1):
+        stock = client.get(key)
+        if stock is None:
+            return [UNINITIALIZED, i]
+        if int(stock) < int(quantities[i - 1]):
+            return [INSUFFICIENT, i]
+    if client.exists(keys[1]):
+        return [IN_PROGRESS, 0]
+    for key, quantity, goods_id in zip(stock_keys, quantities, goods_ids):
+        client.decrby(key, int(quantity))
+        client.hincrby(keys[1], goods_id, int(quantity))
+    client.zadd(keys[0], {args[0]: float(args[1])})
+    return [RESERVED, 0]
+
+
+def _release_py(client, keys, args):
+    # 与 _RELEASE_LUA 等价，仅供 REDIS_BACKEND=memory 使用。
+    if not client.zrem(keys[0], args[0]):
+        return 0
+    for goods_id, quantity in client.hgetall(keys[1]).items():
+        client.incrby(args[1] + goods_id, int(quantity))
+    client.delete(keys[1])
+    return 1
+
+
+_reserve = redis_script(_RESERVE_LUA, _reserve_py)
+_release = redis_script(_RELEASE_LUA, _release_py)
+
+
+def inventory_mode() -> str:
+    """当前库存模式（基准脚本会在运行时切换模块变量 INVENTORY_MODE）。"""
+    return INVENTORY_MODE
+
+
+def _stock_key(goods_id) -> str:
+    return f"{STOCK_KEY_PREFIX}{goods_id}"
+
+
+def _hold_key(order_id) -> str:
+    return f"inv:hold:{order_id}"
+
+
+def _count(field: str, amount: int = 1) -> None:
+    try:
+        redis_client.hincrby(INVENTORY_STATS_KEY, field, amount)
+    except RedisError:
+        pass
+
+
+def _held_quantities() -> dict:
+    """全部有效预占按商品汇总 {goods_id: 数量}。"""
+    order_ids = redis_client.zrange(HOLDS_KEY, 0, -1)
+    if not order_ids:
+        return {}
+    pipe = redis_client.pipeline(transaction=False)
+    for order_id in order_ids:
+        pipe.hgetall(_hold_key(order_id))
+    held = {}
+    for items in pipe.execute():
+        for goods_id, quantity in items.items():
+            held[int(goods_id)] = held.get(int(goods_id), 0) + int(quantity)
+    return held
+
+
+def _pending_quantities(goods_ids) -> dict:
+    rows = db.session.execute(
+        select(StockSettlement.goods_id, func.sum(StockSettlement.quantity))
+        .where(StockSettlement.goods_id.in_(list(goods_ids)))
+        .group_by(StockSettlement.goods_id)
+    )
+    return {goods_id: int(quantity) for goods_id, quantity in rows}
+
+
+def _expected_available(goods_ids) -> dict:
+    """按不变式计算可用库存。先读预占再读待结算：两者之间确认的预占会被重复扣除，只会偏少、不会超卖。"""
+    goods_ids = list(goods_ids)
+    held = _held_quantities()
+    pending = _pending_quantities(goods_ids)
+    stocks = dict(db.session.execute(select(Goods.id, Goods.stock).where(Goods.id.in_(goods_ids))).all())
+    return {
+        goods_id: stock - pending.get(goods_id, 0) - held.get(goods_id, 0)
+        for goods_id, stock in stocks.items()
+    }
+
+
+def _initialize(goods_ids) -> None:
+    for goods_id, available in _expected_available(goods_ids).items():
+        # NX：其他请求已经初始化过时保留其值（可能已有新的预占）。
+        redis_client.set(_stock_key(goods_id), available, nx=True)
+
+
+def hold_items(order) -> list:
+    """订单明细按商品合并为 [(goods_id, 数量), ...]（Lua 中同一键只能出现一次）。"""
+    merged = {}
+    for item in order.items:
+        merged[item.goods_id] = merged.get(item.goods_id, 0) + item.quantity
+    return sorted(merged.items())
+
+
+def reserve_stock(order_id: str, items) -> tuple:
+    """
+    items = [(goods_id, 数量), ...]，同一商品已合并。
+    返回 (状态, goods_id)：RESERVED / INSUFFICIENT（goods_id 为不足的商品）/ IN_PROGRESS（同一订单重复提交）。
+    """
+    items = list(items)
+    keys = [HOLDS_KEY, _hold_key(order_id)] + [_stock_key(goods_id) for goods_id, _ in items]
+    args = [order_id, int(time.time()) + INVENTORY_HOLD_SECONDS]
+    args += [quantity for _, quantity in items] + [goods_id for goods_id, _ in items]
+    for _ in range(3):
+        state, index = _reserve(keys=keys, args=args)
+        if state != UNINITIALIZED:
+            break
+        _initialize([goods_id for goods_id, _ in items])
+    goods_id = items[index - 1][0] if index else None
+    _count({RESERVED: "reserved", INSUFFICIENT: "rejected"}.get(state, "duplicates"))
+    return state, goods_id
+
+
+def add_settlements(order) -> None:
+    """支付事务内调用：记录待扣减到 goods.stock 的数量（与支付一起提交）。"""
+    db.session.add_all(
+        StockSettlement(order_id=order.id, goods_id=item.goods_id, quantity=item.quantity) for item in order.items
+    )
+
+
+def confirm_reservation(order_id: str, items) -> None:
+    """支付提交后调用：删除预占。预占已被回收（支付超过有效期）时重新扣减可用库存。"""
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.zrem(HOLDS_KEY, order_id)
+    pipe.delete(_hold_key(order_id))
+    removed, _ = pipe.execute()
+    if removed:
+        return
+    logger.warning("reservation for order %s expired before confirm, re-deducting", order_id)
+    pipe = redis_client.pipeline(transaction=False)
+    for goods_id, quantity in items:
+        pipe.decrby(_stock_key(goods_id), quantity)
+    pipe.hincrby(INVENTORY_STATS_KEY, "late_confirms", 1)
+    pipe.execute()
+
+
+def release_reservation(order_id: str) -> bool:
+    """支付失败时调用：把预占数量加回可用库存。"""
+    released = bool(_release(keys=[HOLDS_KEY, _hold_key(order_id)], args=[order_id, STOCK_KEY_PREFIX]))
+    if released:
+        _count("released")
+    return released
+
+
+def reap_expired_holds(limit: int = 200) -> int:
+    """回收到期预占，返回处理的订单数。"""
+    order_ids = redis_client.zrangebyscore(HOLDS_KEY, "-inf", time.time(), start=0, num=limit)
+    if not order_ids:
+        return 0
+    paid = set(
+        db.session.scalars(
+            select(Order.id).where(Order.id.in_(order_ids), Order.payment_status != "pending")
+        )
+    )
+    for order_id in order_ids:
+        if order_id in paid:
+            # 支付已提交但确认前进程退出：数量已记入 stock_settlements，只删除预占。
+            pipe = redis_client.pipeline(transaction=True)
+            pipe.zrem(HOLDS_KEY, order_id)
+            pipe.delete(_hold_key(order_id))
+            pipe.execute()
+        elif _release(keys=[HOLDS_KEY, _hold_key(order_id)], args=[order_id, STOCK_KEY_PREFIX]):
+            _count("expired")
+    return len(order_ids)
+
+
+def _product_paths(goods_ids) -> list:
+    # 后台线程没有请求上下文，直接用 url_map 生成详情页路径。
+    adapter = current_app.url_map.bind("localhost")
+    return [adapter.build("main.product_detail", {"id": goods_id}) for goods_id in goods_ids]
+
+
+def settle_pending(limit: int = INVENTORY_SETTLE_BATCH) -> int:
+    """把待结算数量按商品汇总扣到 goods.stock，返回结算的明细行数。"""
+    rows = db.session.execute(
+        select(StockSettlement.id, StockSettlement.goods_id, StockSettlement.quantity)
+        .order_by(StockSettlement.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).all()
+    if not rows:
+        db.session.rollback()
+        return 0
+    totals = {}
+    for _, goods_id, quantity in rows:
+        totals[goods_id] = totals.get(goods_id, 0) + quantity
+    try:
+        db.session.execute(
+            update(Goods)
+            .where(Goods.id.in_(list(totals)))
+            .values(stock=Goods.stock - case(totals, value=Goods.id, else_=0))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.execute(delete(StockSettlement).where(StockSettlement.id.in_([row[0] for row in rows])))
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        logger.exception("inventory settlement failed")
+        raise
+
+    _count("settled_rows", len(rows))
+    invalidate_goods(list(totals))
+    purge_page(*_product_paths(totals))
+    sold_out = db.session.scalar(select(func.count()).select_from(Goods).where(Goods.id.in_(list(totals)), Goods.stock <= 0))
+    if sold_out:
+        # 售罄会改变"仅看有货"筛选结果与分面计数，需整体刷新目录。
+        bump_catalog_version()
+    return len(rows)
+
+
+def reset_available(goods_id) -> None:
+    """管理员直接修改 goods.stock 后调用：删除 Redis 可用库存，下次预占时按不变式重建。"""
+    try:
+        redis_client.delete(_stock_key(goods_id))
+    except RedisError:
+        logger.exception("reset_available failed")
+
+
+def reconcile_inventory(fix: bool = False) -> dict:
+    """
+    对已初始化的商品按不变式检查 Redis 可用库存，返回 {checked, drift: {goods_id: 期望 - 实际}, fixed}。
+    fix=True 时用 INCRBY 补差（不覆盖并发预占），建议在流量低谷执行。
+    """
+    goods_ids = [int(key[len(STOCK_KEY_PREFIX):]) for key in redis_client.scan_iter(match=STOCK_KEY_PREFIX + "*")]
+    if not goods_ids:
+        return {"checked": 0, "drift": {}, "fixed": False}
+    expected = _expected_available(goods_ids)
+    actual = get_many(_stock_key(goods_id) for goods_id in goods_ids)
+    drift = {}
+    for goods_id in goods_ids:
+        current = actual.get(_stock_key(goods_id))
+        if goods_id not in expected or current is None:
+            continue
+        diff = expected[goods_id] - int(current)
+        if diff:
+            drift[goods_id] = diff
+    if fix and drift:
+        pipe = redis_client.pipeline(transaction=False)
+        for goods_id, diff in drift.items():
+            pipe.incrby(_stock_key(goods_id), diff)
+        pipe.execute()
+    return {"checked": len(goods_ids), "drift": drift, "fixed": bool(fix and drift)}
+
+
+def inventory_stats() -> dict:
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.zcard(HOLDS_KEY)
+        pipe.hgetall(INVENTORY_STATS_KEY)
+        active_holds, raw = pipe.execute()
+        pending = db.session.scalar(select(func.count()).select_from(StockSettlement))
+    except (RedisError, SQLAlchemyError):
+        return {"mode": inventory_mode(), "available": False}
+    stats = {field: int(raw.get(field, 0)) for field in
+             ("reserved", "rejected", "duplicates", "released", "expired", "late_confirms", "settled_rows")}
+    return dict(stats, mode=inventory_mode(), available=True, active_holds=active_holds, pending_settlements=pending)
+
+
+def _inventory_step() -> None:
+    if inventory_mode() == "reserve":
+        reap_expired_holds()
+        settle_pending()
+    time.sleep(INVENTORY_SETTLE_SECONDS)
+
+
+_settler = BackgroundLoop("inventory-settle", _inventory_step)
+
+
+def init_inventory(app) -> None:
+    """reserve 模式下每个 worker 进程启动结算 / 回收线程。"""
+    if INVENTORY_MODE == "reserve":
+        _settler.bind(app)
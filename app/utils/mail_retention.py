@@ -0,0 +1,144 @@
+"""
+站内信（mail_logs）保留策略与归档压缩。
+
+mail_logs 只保留最近 MAIL_RETENTION_DAYS 天的热数据；更早的邮件按天分桶，
+序列化为 JSON Lines 后 zlib 压缩写入 mail_log_archives，再从主表删除。
+
+- archive_expired_mail : 分批归档过期邮件（每批一个事务：写归档块 + 按主键删除），返回统计
+- load_archived_mail   : 解压某一天的归档，按 id 升序返回邮件字典（排查 / 恢复用）
+
+每批提交后递增站内信版本号，/api/mails 的 ETag 随之变化，客户端不会继续得到列出已归档邮件的 304。
+
+每批按主键顺序取 created_at < 截止时间的行（走 idx_mail_logs_created_at），
+批大小可控，避免长事务与大范围锁。多实例并发执行由 Redis 锁互斥，
+锁值为本次执行的随机令牌，比较后释放：执行超过 RETENTION_LOCK_TTL 也不会删掉其他实例的锁。
+由 scripts/mail_retention.py 调用，可放入 cron 定期执行。
+"""
+
+import json
+import logging
+import os
+import secrets
+import zlib
+from datetime import datetime, timedelta
+
+from redis.exceptions import RedisError
+from sqlalchemy import delete
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.models.db import MailLog, MailLogArchive, db
+from app.utils.db import redis_client, release_lock
+from app.utils.mailbox import bump_mail_version
+
+logger = logging.getLogger(__name__)
+
+MAIL_RETENTION_DAYS = int(os.getenv("MAIL_RETENTION_DAYS", "7"))
+ARCHIVE_BATCH_SIZE = int(os.getenv("MAIL_ARCHIVE_BATCH_SIZE", "1000"))
+RETENTION_LOCK_KEY = "mail:retention:lock"
+RETENTION_LOCK_TTL = 600
+
+
+def _serialize(mail) -> str:
+    return json.dumps(
+        {
+            "id": mail.id,
+            "subject": mail.subject,
+            "sender": mail.sender,
+            "receiver": mail.receiver,
+            "content": mail.content,
+            "created_at": mail.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+            "is_read": mail.is_read,
+        },
+        ensure_ascii=False,
+        separators=(",", ":"),
+    )
+
+
+def _archive_batch(rows) -> dict:
+    # 按天分桶：同一批中每一天生成一个归档块。
+    buckets = {}
+    for mail in rows:
+        buckets.setdefault(mail.created_at.date(), []).append(mail)
+
+    raw_total = compressed_total = 0
+    for day, mails in buckets.items():
+        raw = "\n".join(_serialize(mail) for mail in mails).encode("utf-8")
+        payload = zlib.compress(raw, 9)
+        db.session.add(
+            MailLogArchive(
+                bucket_date=day,
+                first_id=mails[0].id,
+                last_id=mails[-1].id,
+                row_count=len(mails),
+                raw_bytes=len(raw),
+                payload=payload,
+            )
+        )
+        raw_total += len(raw)
+        compressed_total += len(payload)
+
+    db.session.execute(delete(MailLog).where(MailLog.id.in_([mail.id for mail in rows])))
+    db.session.commit()
+    bump_mail_version()
+    return {"archives": len(buckets), "raw_bytes": raw_total, "compressed_bytes": compressed_total}
+
+
+def archive_expired_mail(retention_days: int = MAIL_RETENTION_DAYS, batch_size: int = ARCHIVE_BATCH_SIZE,
+                         max_batches: int = None, dry_run: bool = False) -> dict:
+    """
+    归档 created_at 早于 retention_days 天前的邮件，需在应用上下文中调用。
+    返回 {cutoff, rows_moved, batches, archives, raw_bytes, compressed_bytes, reclaimed_bytes, skipped}；
+    dry_run 只统计待归档行数。其他实例正在执行时 skipped=True。
+    """
+    cutoff = datetime.now() - timedelta(days=retention_days)
+    stats = {"cutoff": cutoff.strftime("%Y-%m-%d %H:%M:%S"), "rows_moved": 0, "batches": 0, "archives": 0,
+             "raw_bytes": 0, "compressed_bytes": 0, "reclaimed_bytes": 0, "skipped": False}
+    expired = MailLog.query.filter(MailLog.created_at < cutoff)
+    if dry_run:
+        stats["rows_pending"] = expired.count()
+        return stats
+
+    token = secrets.token_hex(8)
+    try:
+        if not redis_client.set(RETENTION_LOCK_KEY, token, nx=True, ex=RETENTION_LOCK_TTL):
+            stats["skipped"] = True
+            return stats
+    except RedisError:
+        logger.warning("retention lock unavailable, running without it", exc_info=True)
+
+    try:
+        while max_batches is None or stats["batches"] < max_batches:
+            rows = expired.order_by(MailLog.id).limit(batch_size).all()
+            if not rows:
+                break
+            try:
+                result = _archive_batch(rows)
+            except SQLAlchemyError:
+                db.session.rollback()
+                logger.exception("mail archive batch failed")
+                raise
+            stats["rows_moved"] += len(rows)
+            stats["batches"] += 1
+            for key in ("archives", "raw_bytes", "compressed_bytes"):
+                stats[key] += result[key]
+    finally:
+        try:
+            release_lock(RETENTION_LOCK_KEY, token)
+        except RedisError:
+            pass
+
+    # 主表中这些行的正文字节不再占用热数据空间，归档只保留压缩后的副本。
+    stats["reclaimed_bytes"] = stats["raw_bytes"] - stats["compressed_bytes"]
+    if stats["rows_moved"]:
+        logger.info("mail retention archived %(rows_moved)s rows in %(batches)s batches", stats)
+    return stats
+
+
+def load_archived_mail(day) -> list:
+    """返回某一天归档的全部邮件（字典，id 升序）。"""
+    mails = []
+    archives = MailLogArchive.query.filter_by(bucket_date=day).order_by(MailLogArchive.first_id).all()
+    for archive in archives:
+        raw = zlib.decompress(archive.payload).decode("utf-8")
+        mails.extend(json.loads(line) for line in raw.splitlines() if line)
+    return sorted(mails, key=lambda mail: mail["id"])
@@ -0,0 +1,156 @@
+"""
+站内信（MailLog）读取、变更通知与长轮询等待。
+
+- mail_version / bump_mail_version : 站内信版本号，/api/mails 据此生成 ETag，内容未变时客户端得到 304
+- notify_new_mail                  : 新邮件写入后调用：递增版本号并通过 Redis pub/sub 广播邮件 id
+- fetch_mails                      : 按 id 做 keyset 分页（before_id 向后翻历史，since_id 按升序补齐新邮件），不做 COUNT(*)
+- mail_notifier.wait               : 长轮询等待新邮件；每个 worker 只有一个订阅线程，
+                                     等待中的请求阻塞在进程内 Condition 上，不各自占用 Redis 连接
+
+Gunicorn 使用 gthread worker，长轮询期间每个等待者占用一个线程，
+因此单 worker 同时等待的请求数受 MAIL_WAIT_MAX_WAITERS 限制，超出时立即返回并提示客户端稍后重试。
+"""
+
+import logging
+import os
+import threading
+import time
+
+from redis.exceptions import RedisError
+
+from app.models.db import MailLog
+from app.utils.db import redis_client
+
+logger = logging.getLogger(__name__)
+
+MAIL_VERSION_KEY = "mail:version"
+MAIL_CHANNEL = "mail:new"
+MAIL_PAGE_SIZE = 20
+MAIL_MAX_PAGE_SIZE = 100
+MAIL_WAIT_TIMEOUT = int(os.getenv("MAIL_WAIT_TIMEOUT", "20"))          # 单次长轮询最长挂起秒数
+MAIL_WAIT_MAX_WAITERS = int(os.getenv("MAIL_WAIT_MAX_WAITERS", "2"))   # 单 worker 同时挂起的请求上限
+MAIL_RETRY_AFTER = 10                                                  # 超出上限时建议客户端的重试间隔（秒）
+
+
+def mail_version() -> str:
+    """读取当前站内信版本号，未初始化时为 "0"。"""
+    return redis_client.get(MAIL_VERSION_KEY) or "0"
+
+
+def bump_mail_version() -> None:
+    """站内信写入 / 状态变更后调用。"""
+    try:
+        redis_client.incr(MAIL_VERSION_KEY)
+    except RedisError:
+        logger.exception("bump_mail_version failed")
+
+
+def notify_new_mail(mail_id: int) -> None:
+    """新邮件提交后调用：递增版本号并唤醒所有 worker 中等待的长轮询请求。"""
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.incr(MAIL_VERSION_KEY)
+        pipe.publish(MAIL_CHANNEL, str(mail_id))
+        pipe.execute()
+    except RedisError:
+        logger.exception("notify_new_mail failed")
+
+
+def mail_dict(mail) -> dict:
+    return {
+        "id": mail.id,
+        "subject": mail.subject,
+        "sender": mail.sender,
+        "receiver": mail.receiver,
+        "content": mail.content,
+        "created_at": mail.created_at.strftime("%Y-%m-%d %H:%M:%S"),
+        "is_read": mail.is_read,
+    }
+
+
+def clamp_mail_limit(limit) -> int:
+    try:
+        limit = int(limit)
+    except (TypeError, ValueError):
+        return MAIL_PAGE_SIZE
+    return min(max(limit, 1), MAIL_MAX_PAGE_SIZE)
+
+
+def fetch_mails(before_id: int = None, since_id: int = None, limit: int = MAIL_PAGE_SIZE):
+    """
+    按主键 keyset 分页，返回 (邮件列表（id 降序）, 下一页游标)。多取一条判断是否还有下一页。
+    before_id：取比它更旧的一页，游标为下一页的 before_id；
+    since_id：按 id 升序取紧接 since_id 之后的一批（不会跳过中间的邮件），游标为下一批的 since_id。
+    """
+    query = MailLog.query
+    if before_id:
+        query = query.filter(MailLog.id < before_id)
+    if since_id is not None and not before_id:
+        rows = query.filter(MailLog.id > since_id).order_by(MailLog.id.asc()).limit(limit + 1).all()
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return rows[::-1], (rows[-1].id if has_more else None)
+    rows = query.order_by(MailLog.id.desc()).limit(limit + 1).all()
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return rows, (rows[-1].id if has_more else None)
+
+
+class MailNotifier:
+    """进程内的新邮件通知：一个后台线程订阅 MAIL_CHANNEL，收到消息后唤醒全部等待者。"""
+
+    def __init__(self):
+        self.cond = threading.Condition()
+        self.latest_id = 0
+        self.waiters = 0
+        self._thread = None
+        self._pid = None
+
+    def _ensure_listener(self) -> None:
+        # 惰性启动，并在 fork 后的子进程中重新启动（线程不会随 fork 复制）。
+        with self.cond:
+            if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._thread = threading.Thread(target=self._listen, name="mail-notifier", daemon=True)
+            self._thread.start()
+
+    def _listen(self) -> None:
+        while True:
+            try:
+                pubsub = redis_client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(MAIL_CHANNEL)
+                while True:
+                    # 短超时轮询而非 listen()：空闲期间不会触发 socket 读超时，
+                    # 健康检查也能按 REDIS_HEALTH_CHECK_INTERVAL 正常进行。
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is None or message.get("type") != "message":
+                        continue
+                    try:
+                        mail_id = int(message["data"])
+                    except (TypeError, ValueError):
+                        continue
+                    with self.cond:
+                        self.latest_id = max(self.latest_id, mail_id)
+                        self.cond.notify_all()
+            except RedisError:
+                logger.warning("mail notifier disconnected, retrying", exc_info=True)
+                time.sleep(1)
+
+    def wait(self, since_id: int, timeout: float):
+        """
+        等待 id 大于 since_id 的新邮件通知。
+        返回 True（有新邮件）/ False（超时）/ None（等待者已满，调用方应让客户端稍后重试）。
+        """
+        self._ensure_listener()
+        with self.cond:
+            if self.waiters >= MAIL_WAIT_MAX_WAITERS:
+                return None
+            self.waiters += 1
+            try:
+                return self.cond.wait_for(lambda: self.latest_id > since_id, timeout)
+            finally:
+                self.waiters -= 1
+
+
+mail_notifier = MailNotifier()
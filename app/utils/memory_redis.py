@@ -0,0 +1,532 @@
+"""
+进程内 Redis 替身（REDIS_BACKEND=memory）。
+
+实现本项目用到的 Redis 命令子集，语义与 redis-py（decode_responses=True）保持一致，
+使应用、测试与基准脚本在没有 Redis 服务时也能运行：
+- 字符串：get / set(nx, xx, ex, px) / setex / mget / incr / incrby / decr / decrby
+- 键：delete / exists / expire / ttl / keys / flushdb
+- 哈希：hget / hset / hmget / hgetall / hincrby / hdel / hlen / hexists
+- 列表：lpush / rpush / lpop / rpop / brpop / lrange / llen / ltrim / lrem
+- 集合：sadd / srem / spop / smembers / scard / sismember
+- 有序集合：zadd / zrem / zscore / zcard / zrange / zrangebyscore
+- 发布订阅：publish / pubsub（subscribe / get_message / listen）
+- 管道：pipeline（transaction=True 时在全局锁内整体执行）
+- 脚本：Lua 无法执行，由 app.utils.db.redis_script 提供的等价 Python 函数在锁内原子执行
+
+数据只存在于当前进程，多 worker 部署之间不共享，仅用于开发、测试与基准。
+"""
+
+import fnmatch
+import queue
+import threading
+import time
+
+from redis.exceptions import ResponseError
+
+_WRONGTYPE = "WRONGTYPE Operation against a key holding the wrong kind of value"
+
+
+def _to_str(value) -> str:
+    # decode_responses=True 语义：数字、字节统一转为 str 存储。
+    if isinstance(value, bytes):
+        return value.decode("utf-8")
+    if isinstance(value, float):
+        return repr(value)
+    return str(value)
+
+
+class MemoryPubSub:
+    """与 redis.client.PubSub 接口一致的最小实现。"""
+
+    def __init__(self, server, ignore_subscribe_messages: bool = False):
+        self._server = server
+        self._ignore_subscribe = ignore_subscribe_messages
+        self._queue = queue.Queue()
+        self.channels = set()
+
+    def subscribe(self, *channels) -> None:
+        for channel in channels:
+            channel = _to_str(channel)
+            self.channels.add(channel)
+            self._server._subscribe(channel, self)
+            self._queue.put({"type": "subscribe", "pattern": None, "channel": channel, "data": len(self.channels)})
+
+    def unsubscribe(self, *channels) -> None:
+        for channel in list(channels or self.channels):
+            channel = _to_str(channel)
+            self.channels.discard(channel)
+            self._server._unsubscribe(channel, self)
+            self._queue.put({"type": "unsubscribe", "pattern": None, "channel": channel, "data": len(self.channels)})
+
+    def _deliver(self, message: dict) -> None:
+        self._queue.put(message)
+
+    def get_message(self, ignore_subscribe_messages: bool = False, timeout: float = 0.0):
+        ignore = ignore_subscribe_messages or self._ignore_subscribe
+        deadline = time.monotonic() + (timeout or 0)
+        while True:
+            remaining = deadline - time.monotonic()
+            try:
+                message = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                return None
+            if ignore and message["type"] in ("subscribe", "unsubscribe"):
+                continue
+            return message
+
+    def listen(self):
+        while self.channels or not self._queue.empty():
+            message = self._queue.get()
+            if self._ignore_subscribe and message["type"] in ("subscribe", "unsubscribe"):
+                continue
+            yield message
+
+    def close(self) -> None:
+        self.unsubscribe()
+
+    reset = close
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class MemoryPipeline:
+    """命令排队，execute() 时依次执行并返回结果列表。"""
+
+    def __init__(self, server, transaction: bool = True):
+        self._server = server
+        self._transaction = transaction
+        self._commands = []
+
+    def __getattr__(self, name):
+        method = getattr(self._server, name)
+
+        def queued(*args, **kwargs):
+            self._commands.append((method, args, kwargs))
+            return self
+
+        return queued
+
+    def execute(self, raise_on_error: bool = True):
+        commands, self._commands = self._commands, []
+        results = []
+        # transaction=True 对应 MULTI/EXEC：整组命令在全局锁内执行，其他线程看不到中间状态。
+        with self._server._lock:
+            for method, args, kwargs in commands:
+                try:
+                    results.append(method(*args, **kwargs))
+                except ResponseError as exc:
+                    if raise_on_error:
+                        raise
+                    results.append(exc)
+        return results
+
+    def reset(self) -> None:
+        self._commands = []
+
+    def __len__(self):
+        return len(self._commands)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.reset()
+
+
+class MemoryRedis:
+    """线程安全的进程内 Redis 替身，所有命令在同一把可重入锁下执行。"""
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._changed = threading.Condition(self._lock)
+        self._data = {}         # key → str | dict | list | set
+        self._expires = {}      # key → time.monotonic() 截止时间
+        self._subscribers = {}  # channel → set(MemoryPubSub)
+
+    # ---- 内部工具 ----
+    def _alive(self, key: str) -> bool:
+        deadline = self._expires.get(key)
+        if deadline is not None and deadline <= time.monotonic():
+            self._data.pop(key, None)
+            self._expires.pop(key, None)
+        return key in self._data
+
+    def _typed(self, key, kind, create: bool = False):
+        key = _to_str(key)
+        if self._alive(key):
+            value = self._data[key]
+            if not isinstance(value, kind):
+                raise ResponseError(_WRONGTYPE)
+            return value
+        if create:
+            self._data[key] = kind()
+            return self._data[key]
+        return None
+
+    def _subscribe(self, channel, pubsub) -> None:
+        with self._lock:
+            self._subscribers.setdefault(channel, set()).add(pubsub)
+
+    def _unsubscribe(self, channel, pubsub) -> None:
+        with self._lock:
+            self._subscribers.get(channel, set()).discard(pubsub)
+
+    # ---- 连接 / 管理 ----
+    def ping(self) -> bool:
+        return True
+
+    def flushdb(self) -> bool:
+        with self._lock:
+            self._data.clear()
+            self._expires.clear()
+        return True
+
+    def pipeline(self, transaction: bool = True, shard_hint=None) -> MemoryPipeline:
+        return MemoryPipeline(self, transaction)
+
+    def pubsub(self, ignore_subscribe_messages: bool = False, **kwargs) -> MemoryPubSub:
+        return MemoryPubSub(self, ignore_subscribe_messages)
+
+    def publish(self, channel, message) -> int:
+        channel = _to_str(channel)
+        with self._lock:
+            receivers = list(self._subscribers.get(channel, ()))
+        for pubsub in receivers:
+            pubsub._deliver({"type": "message", "pattern": None, "channel": channel, "data": _to_str(message)})
+        return len(receivers)
+
+    # ---- 键 ----
+    def delete(self, *keys) -> int:
+        with self._lock:
+            removed = 0
+            for key in map(_to_str, keys):
+                if self._alive(key):
+                    del self._data[key]
+                    self._expires.pop(key, None)
+                    removed += 1
+            return removed
+
+    def exists(self, *keys) -> int:
+        with self._lock:
+            return sum(1 for key in map(_to_str, keys) if self._alive(key))
+
+    def expire(self, key, seconds) -> bool:
+        key = _to_str(key)
+        with self._lock:
+            if not self._alive(key):
+                return False
+            self._expires[key] = time.monotonic() + int(seconds)
+            return True
+
+    def ttl(self, key) -> int:
+        key = _to_str(key)
+        with self._lock:
+            if not self._alive(key):
+                return -2
+            deadline = self._expires.get(key)
+            if deadline is None:
+                return -1
+            return max(int(round(deadline - time.monotonic())), 0)
+
+    def keys(self, pattern: str = "*") -> list:
+        with self._lock:
+            return [key for key in list(self._data) if self._alive(key) and fnmatch.fnmatchcase(key, pattern)]
+
+    def scan_iter(self, match: str = "*", count: int = None):
+        return iter(self.keys(match))
+
+    # ---- 字符串 ----
+    def get(self, key):
+        with self._lock:
+            return self._typed(key, str)
+
+    def mget(self, keys, *args) -> list:
+        keys = list(keys) if isinstance(keys, (list, tuple)) else [keys]
+        keys.extend(args)
+        with self._lock:
+            return [self._typed(key, str) for key in keys]
+
+    def set(self, key, value, ex=None, px=None, nx: bool = False, xx: bool = False, keepttl: bool = False):
+        key = _to_str(key)
+        with self._lock:
+            exists = self._alive(key)
+            if (nx and exists) or (xx and not exists):
+                return None
+            self._data[key] = _to_str(value)
+            if ex is not None:
+                self._expires[key] = time.monotonic() + int(ex)
+            elif px is not None:
+                self._expires[key] = time.monotonic() + int(px) / 1000
+            elif not keepttl:
+                self._expires.pop(key, None)
+            return True
+
+    def setex(self, key, seconds, value) -> bool:
+        return self.set(key, value, ex=seconds)
+
+    def incrby(self, key, amount: int = 1) -> int:
+        key = _to_str(key)
+        with self._lock:
+            current = self._typed(key, str)
+            try:
+                value = int(current or 0) + int(amount)
+            except ValueError:
+                raise ResponseError("value is not an integer or out of range") from None
+            self._data[key] = str(value)
+            return value
+
+    def incr(self, key, amount: int = 1) -> int:
+        return self.incrby(key, amount)
+
+    def decrby(self, key, amount: int = 1) -> int:
+        return self.incrby(key, -int(amount))
+
+    def decr(self, key, amount: int = 1) -> int:
+        return self.incrby(key, -int(amount))
+
+    # ---- 哈希 ----
+    def hget(self, key, field):
+        with self._lock:
+            return (self._typed(key, dict) or {}).get(_to_str(field))
+
+    def hmget(self, key, fields, *args) -> list:
+        fields = list(fields) if isinstance(fields, (list, tuple)) else [fields]
+        fields.extend(args)
+        with self._lock:
+            data = self._typed(key, dict) or {}
+            return [data.get(_to_str(field)) for field in fields]
+
+    def hgetall(self, key) -> dict:
+        with self._lock:
+            return dict(self._typed(key, dict) or {})
+
+    def hset(self, key, field=None, value=None, mapping=None, items=None) -> int:
+        pairs = []
+        if field is not None:
+            pairs.append((field, value))
+        if mapping:
+            pairs.extend(mapping.items())
+        if items:
+            pairs.extend(zip(items[::2], items[1::2]))
+        with self._lock:
+            data = self._typed(key, dict, create=True)
+            added = 0
+            for f, v in pairs:
+                f = _to_str(f)
+                added += f not in data
+                data[f] = _to_str(v)
+            return added
+
+    def hincrby(self, key, field, amount: int = 1) -> int:
+        with self._lock:
+            data = self._typed(key, dict, create=True)
+            field = _to_str(field)
+            value = int(data.get(field, 0)) + int(amount)
+            data[field] = str(value)
+            return value
+
+    def hdel(self, key, *fields) -> int:
+        with self._lock:
+            data = self._typed(key, dict)
+            if not data:
+                return 0
+            removed = sum(1 for f in map(_to_str, fields) if data.pop(f, None) is not None)
+            if not data:
+                self.delete(key)
+            return removed
+
+    def hlen(self, key) -> int:
+        with self._lock:
+            return len(self._typed(key, dict) or {})
+
+    def hexists(self, key, field) -> bool:
+        with self._lock:
+            return _to_str(field) in (self._typed(key, dict) or {})
+
+    # ---- 列表 ----
+    def lpush(self, key, *values) -> int:
+        with self._lock:
+            data = self._typed(key, list, create=True)
+            for value in values:
+                data.insert(0, _to_str(value))
+            self._changed.notify_all()
+            return len(data)
+
+    def rpush(self, key, *values) -> int:
+        with self._lock:
+            data = self._typed(key, list, create=True)
+            data.extend(_to_str(value) for value in values)
+            self._changed.notify_all()
+            return len(data)
+
+    def _pop(self, key, count, left: bool):
+        with self._lock:
+            data = self._typed(key, list)
+            if not data:
+                return None
+            n = 1 if count is None else int(count)
+            if left:
+                popped, data[:n] = data[:n], []
+            else:
+                popped = data[-n:][::-1]
+                del data[-n:]
+            if not data:
+                self.delete(key)
+            return popped[0] if count is None else popped
+
+    def lpop(self, key, count: int = None):
+        return self._pop(key, count, left=True)
+
+    def rpop(self, key, count: int = None):
+        return self._pop(key, count, left=False)
+
+    def brpop(self, keys, timeout: float = 0):
+        keys = [keys] if isinstance(keys, (str, bytes)) else list(keys)
+        deadline = None if not timeout else time.monotonic() + timeout
+        with self._lock:
+            while True:
+                for key in keys:
+                    value = self.rpop(key)
+                    if value is not None:
+                        return _to_str(key), value
+                remaining = None if deadline is None else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    return None
+                self._changed.wait(remaining)
+
+    def lrange(self, key, start: int, end: int) -> list:
+        with self._lock:
+            data = self._typed(key, list) or []
+            end = len(data) if end == -1 else end + 1
+            return list(data[start:end] if end else data[start:])
+
+    def llen(self, key) -> int:
+        with self._lock:
+            return len(self._typed(key, list) or [])
+
+    def ltrim(self, key, start: int, end: int) -> bool:
+        with self._lock:
+            data = self._typed(key, list)
+            if data is not None:
+                data[:] = data[start:(None if end == -1 else end + 1)]
+                if not data:
+                    self.delete(key)
+            return True
+
+    def lrem(self, key, count: int, value) -> int:
+        with self._lock:
+            data = self._typed(key, list)
+            if not data:
+                return 0
+            value, removed, kept = _to_str(value), 0, []
+            items = data if count >= 0 else list(reversed(data))
+            for item in items:
+                if item == value and (count == 0 or removed < abs(count)):
+                    removed += 1
+                else:
+                    kept.append(item)
+            data[:] = kept if count >= 0 else list(reversed(kept))
+            if not data:
+                self.delete(key)
+            return removed
+
+    # ---- 集合 ----
+    def sadd(self, key, *members) -> int:
+        with self._lock:
+            data = self._typed(key, set, create=True)
+            before = len(data)
+            data.update(map(_to_str, members))
+            return len(data) - before
+
+    def srem(self, key, *members) -> int:
+        with self._lock:
+            data = self._typed(key, set)
+            if not data:
+                return 0
+            before = len(data)
+            data.difference_update(map(_to_str, members))
+            if not data:
+                self.delete(key)
+            return before - len(data)
+
+    def spop(self, key, count: int = None):
+        with self._lock:
+            data = self._typed(key, set)
+            if not data:
+                return None if count is None else []
+            popped = [data.pop() for _ in range(min(count or 1, len(data)))]
+            if not data:
+                self.delete(key)
+            return popped[0] if count is None else popped
+
+    def smembers(self, key) -> set:
+        with self._lock:
+            return set(self._typed(key, set) or ())
+
+    def scard(self, key) -> int:
+        with self._lock:
+            return len(self._typed(key, set) or ())
+
+    def sismember(self, key, member) -> bool:
+        with self._lock:
+            return _to_str(member) in (self._typed(key, set) or ())
+
+    # ---- 有序集合 ----
+    def zadd(self, key, mapping: dict) -> int:
+        with self._lock:
+            data = self._zset(key)
+            if data is None:
+                data = self._data[_to_str(key)] = {}
+            added = 0
+            for member, score in mapping.items():
+                member = _to_str(member)
+                added += member not in data
+                data[member] = float(score)
+            return added
+
+    def _zset(self, key):
+        # 有序集合以 {member: score} 存储，与哈希区分开：哈希的值是 str，有序集合是 float。
+        data = self._typed(key, dict)
+        if data and not isinstance(next(iter(data.values())), float):
+            raise ResponseError(_WRONGTYPE)
+        return data
+
+    def zrem(self, key, *members) -> int:
+        with self._lock:
+            data = self._zset(key)
+            if not data:
+                return 0
+            removed = sum(1 for m in map(_to_str, members) if data.pop(m, None) is not None)
+            if not data:
+                self.delete(key)
+            return removed
+
+    def zscore(self, key, member):
+        with self._lock:
+            return (self._zset(key) or {}).get(_to_str(member))
+
+    def zcard(self, key) -> int:
+        with self._lock:
+            return len(self._zset(key) or {})
+
+    def _zsorted(self, key) -> list:
+        return sorted((self._zset(key) or {}).items(), key=lambda item: (item[1], item[0]))
+
+    def zrange(self, key, start: int, end: int, withscores: bool = False) -> list:
+        with self._lock:
+            items = self._zsorted(key)
+            items = items[start:(None if end == -1 else end + 1)]
+            return items if withscores else [member for member, _ in items]
+
+    def zrangebyscore(self, key, min, max, start: int = None, num: int = None, withscores: bool = False) -> list:
+        low = float("-inf") if min == "-inf" else float(min)
+        high = float("inf") if max == "+inf" else float(max)
+        with self._lock:
+            items = [(m, s) for m, s in self._zsorted(key) if low <= s <= high]
+            if start is not None and num is not None:
+                items = items[start:start + num]
+            return items if withscores else [member for member, _ in items]
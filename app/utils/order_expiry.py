@@ -0,0 +1,152 @@
+"""
+超时未支付订单自动取消。
+
+下单超过 ORDER_EXPIRY_MINUTES 分钟仍为 pending 的订单改为 cancelled：
+每批按 (payment_status, generatetime) 复合索引取最早的 ORDER_EXPIRY_BATCH_SIZE 个订单 ID，
+再用一条带 payment_status = 'pending' 条件的 UPDATE 批量取消（与并发支付竞争时以先提交者为准），
+每批一个短事务，不会长时间锁表；提交后删除相关用户的订单列表缓存。
+
+每个 worker 进程一个后台线程，每 ORDER_EXPIRY_INTERVAL 秒尝试一次；Redis 锁保证同一时刻只有一个
+进程在执行（Redis 不可用时直接执行：条件 UPDATE 本身可重入，只是可能重复扫描）。
+锁值为本次执行的随机令牌，释放时比较后删除：执行时间超过 EXPIRY_LOCK_TTL 也不会删掉其他进程的锁。
+
+- expire_stale_orders : 分批取消超时订单，返回统计（后台线程与 scripts/expire_orders.py 共用）
+- expiry_stats        : 累计执行次数、取消数量与吞吐（/admin/metrics）
+- init_order_expiry   : 启动后台线程（ORDER_EXPIRY_MINUTES=0 时关闭）
+"""
+
+import logging
+import os
+import secrets
+import time
+from datetime import datetime, timedelta
+
+from redis.exceptions import RedisError
+from sqlalchemy import select, update
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.models.db import Order, db
+from app.utils.background import BackgroundLoop
+from app.utils.db import redis_client, release_lock
+from app.utils.order_history import invalidate_order_history
+
+logger = logging.getLogger(__name__)
+
+ORDER_EXPIRY_MINUTES = int(os.getenv("ORDER_EXPIRY_MINUTES", "30"))        # 0 表示不自动取消
+ORDER_EXPIRY_BATCH_SIZE = int(os.getenv("ORDER_EXPIRY_BATCH_SIZE", "500"))
+ORDER_EXPIRY_MAX_BATCHES = int(os.getenv("ORDER_EXPIRY_MAX_BATCHES", "20"))  # 后台线程每轮最多执行的批次
+ORDER_EXPIRY_INTERVAL = int(os.getenv("ORDER_EXPIRY_INTERVAL", "60"))
+EXPIRY_LOCK_KEY = "order:expiry:lock"
+EXPIRY_LOCK_TTL = 300
+EXPIRY_STATS_KEY = "order:expiry:stats"
+
+
+def _stale_orders(cutoff: datetime, batch_size: int) -> list:
+    return db.session.execute(
+        select(Order.id, Order.user_id)
+        .where(Order.payment_status == "pending", Order.generatetime < cutoff)
+        .order_by(Order.generatetime)
+        .limit(batch_size)
+    ).all()
+
+
+def _cancel_batch(orders) -> int:
+    order_ids = [order_id for order_id, _ in orders]
+    try:
+        cancelled = db.session.execute(
+            update(Order)
+            .where(Order.id.in_(order_ids), Order.payment_status == "pending")
+            .values(payment_status="cancelled")
+            .execution_options(synchronize_session=False)
+        ).rowcount
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        logger.exception("order expiry batch failed")
+        raise
+    invalidate_order_history(*{user_id for _, user_id in orders})
+    return cancelled
+
+
+def _record(stats: dict) -> None:
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.hincrby(EXPIRY_STATS_KEY, "runs", 1)
+        pipe.hincrby(EXPIRY_STATS_KEY, "batches", stats["batches"])
+        pipe.hincrby(EXPIRY_STATS_KEY, "cancelled", stats["cancelled"])
+        pipe.hincrby(EXPIRY_STATS_KEY, "elapsed_ms", int(stats["elapsed_ms"]))
+        pipe.hset(EXPIRY_STATS_KEY, mapping={"last_run_at": int(time.time()), "last_cancelled": stats["cancelled"]})
+        pipe.execute()
+    except RedisError:
+        pass
+
+
+def expire_stale_orders(older_than_minutes: int = ORDER_EXPIRY_MINUTES, batch_size: int = ORDER_EXPIRY_BATCH_SIZE,
+                        max_batches: int = None, dry_run: bool = False) -> dict:
+    """
+    取消 generatetime 早于 older_than_minutes 分钟前的 pending 订单，需在应用上下文中调用。
+    返回 {cutoff, cancelled, batches, elapsed_ms, orders_per_sec, skipped}；dry_run 只统计待取消数量。
+    其他进程正在执行时 skipped=True。
+    """
+    cutoff = datetime.now() - timedelta(minutes=older_than_minutes)
+    stats = {"cutoff": cutoff.strftime("%Y-%m-%d %H:%M:%S"), "cancelled": 0, "batches": 0, "elapsed_ms": 0.0,
+             "orders_per_sec": 0.0, "skipped": False}
+    if dry_run:
+        stats["pending"] = Order.query.filter(Order.payment_status == "pending", Order.generatetime < cutoff).count()
+        return stats
+
+    token = secrets.token_hex(8)
+    try:
+        if not redis_client.set(EXPIRY_LOCK_KEY, token, nx=True, ex=EXPIRY_LOCK_TTL):
+            stats["skipped"] = True
+            return stats
+    except RedisError:
+        logger.warning("order expiry lock unavailable, running without it", exc_info=True)
+
+    started = time.perf_counter()
+    try:
+        while max_batches is None or stats["batches"] < max_batches:
+            orders = _stale_orders(cutoff, batch_size)
+            if not orders:
+                break
+            stats["cancelled"] += _cancel_batch(orders)
+            stats["batches"] += 1
+    finally:
+        try:
+            release_lock(EXPIRY_LOCK_KEY, token)
+        except RedisError:
+            pass
+
+    stats["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 1)
+    if stats["cancelled"]:
+        stats["orders_per_sec"] = round(stats["cancelled"] / (stats["elapsed_ms"] / 1000), 1)
+        logger.info("order expiry cancelled %(cancelled)s orders in %(batches)s batches", stats)
+    if stats["batches"]:
+        _record(stats)
+    return stats
+
+
+def expiry_stats() -> dict:
+    try:
+        raw = redis_client.hgetall(EXPIRY_STATS_KEY)
+    except RedisError:
+        return {"available": False}
+    stats = {field: int(raw.get(field, 0)) for field in
+             ("runs", "batches", "cancelled", "elapsed_ms", "last_run_at", "last_cancelled")}
+    seconds = stats["elapsed_ms"] / 1000
+    return dict(stats, available=True, expiry_minutes=ORDER_EXPIRY_MINUTES,
+                orders_per_sec=round(stats["cancelled"] / seconds, 1) if seconds else 0.0)
+
+
+def _expiry_step() -> None:
+    expire_stale_orders(max_batches=ORDER_EXPIRY_MAX_BATCHES)
+    time.sleep(ORDER_EXPIRY_INTERVAL)
+
+
+_scheduler = BackgroundLoop("order-expiry", _expiry_step)
+
+
+def init_order_expiry(app) -> None:
+    """每个 worker 进程启动一个超时订单取消线程；ORDER_EXPIRY_MINUTES=0 时不启动。"""
+    if ORDER_EXPIRY_MINUTES > 0:
+        _scheduler.bind(app)
@@ -0,0 +1,118 @@
+"""
+个人中心订单列表：keyset 分页 + 首页摘要缓存。
+
+按 (generatetime DESC, id DESC) 分页，游标为上一页最后一条的 (generatetime, id)，
+查询走 idx_order_user_generatetime (user_id, generatetime, id)，翻页耗时与订单总数无关。
+第一页（打开"我的订单"标签时的唯一查询）以紧凑 JSON 缓存在 order:history:{user_id}，
+下单、支付、后台改状态、超时取消后由 invalidate_order_history 删除。
+
+- order_history_page      : 一页订单摘要与下一页游标
+- encode_history_cursor / decode_history_cursor : 游标编解码（URL 安全 base64，非法游标回到第一页）
+- invalidate_order_history : 订单新增或状态变化后删除用户的首页缓存
+"""
+
+import base64
+import json
+import logging
+import os
+from datetime import datetime
+
+from redis.exceptions import RedisError
+from sqlalchemy import and_, or_, select
+
+from app.models.db import Order, db
+from app.utils.db import delete_many, redis_client
+from app.utils.tools import get_order_status_meta
+
+logger = logging.getLogger(__name__)
+
+ORDER_HISTORY_PAGE_SIZE = int(os.getenv("ORDER_HISTORY_PAGE_SIZE", "10"))
+ORDER_HISTORY_CACHE_TTL = int(os.getenv("ORDER_HISTORY_CACHE_TTL", "600"))
+
+
+def _cache_key(user_id) -> str:
+    return f"order:history:{user_id}"
+
+
+def encode_history_cursor(generated_at: datetime, order_id: str) -> str:
+    raw = json.dumps([generated_at.isoformat(), order_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_history_cursor(cursor: str):
+    """解析游标，返回 (generatetime, order_id)；为空或格式错误时返回 None（从第一页开始）。"""
+    if not cursor:
+        return None
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        generated_at, order_id = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+        return datetime.fromisoformat(generated_at), str(order_id)
+    except (ValueError, TypeError, UnicodeError):
+        return None
+
+
+def _summary(row) -> list:
+    # 紧凑行：[id, 订单号, 日期, 金额, 状态]，缓存只存这些字段。
+    order_id, order_number, generated_at, total_amount, status = row
+    return [order_id, order_number, generated_at.strftime("%Y-%m-%d") if generated_at else "", str(total_amount), status]
+
+
+def _expand(summary) -> dict:
+    order_id, order_number, date, total, status = summary
+    label, css_class = get_order_status_meta(status)
+    return {"id": order_id, "display_id": order_number, "date": date, "total": total,
+            "status_label": label, "status_class": css_class}
+
+
+def _query_page(user_id: int, after, limit: int):
+    query = (
+        select(Order.id, Order.order_number, Order.generatetime, Order.total_amount, Order.payment_status)
+        .where(Order.user_id == user_id)
+        .order_by(Order.generatetime.desc(), Order.id.desc())
+        .limit(limit + 1)
+    )
+    if after is not None:
+        generated_at, order_id = after
+        query = query.where(or_(Order.generatetime < generated_at,
+                                and_(Order.generatetime == generated_at, Order.id < order_id)))
+    rows = db.session.execute(query).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_history_cursor(rows[-1].generatetime, rows[-1].id)
+    return [_summary(row) for row in rows], next_cursor
+
+
+def order_history_page(user_id: int, cursor: str = None, limit: int = ORDER_HISTORY_PAGE_SIZE):
+    """返回 (订单摘要列表, 下一页游标)；第一页优先读缓存。"""
+    after = decode_history_cursor(cursor)
+    cacheable = after is None and limit == ORDER_HISTORY_PAGE_SIZE
+    if cacheable:
+        try:
+            raw = redis_client.get(_cache_key(user_id))
+            if raw is not None:
+                cached = json.loads(raw)
+                return [_expand(summary) for summary in cached["items"]], cached["next_cursor"]
+        except RedisError:
+            logger.warning("order history cache unavailable", exc_info=True)
+            cacheable = False
+
+    summaries, next_cursor = _query_page(user_id, after, limit)
+    if cacheable:
+        try:
+            payload = json.dumps({"items": summaries, "next_cursor": next_cursor}, ensure_ascii=False)
+            redis_client.setex(_cache_key(user_id), ORDER_HISTORY_CACHE_TTL, payload)
+        except RedisError:
+            pass
+    return [_expand(summary) for summary in summaries], next_cursor
+
+
+def invalidate_order_history(*user_ids) -> None:
+    """订单新增或状态变化提交后调用。"""
+    keys = {_cache_key(user_id) for user_id in user_ids if user_id is not None}
+    if not keys:
+        return
+    try:
+        delete_many(keys)
+    except RedisError:
+        logger.exception("invalidate_order_history failed")
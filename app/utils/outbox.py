@@ -0,0 +1,212 @@
+"""
+站内信发件箱（异步批量写入 mail_logs）。
+
+请求内只把邮件记录 LPUSH 到 Redis 列表 MAIL_OUTBOX_KEY，立即返回；
+每个 worker 进程有一个后台线程从列表尾部取出邮件，凑满 MAIL_OUTBOX_BATCH_SIZE 条
+或等待 MAIL_OUTBOX_FLUSH_MS 毫秒后，用一条多行 INSERT 写入 mail_logs，再广播新邮件通知。
+
+- enqueue_mail : 邮件入队；Redis 不可用时退回到请求内同步写库
+- init_outbox  : 每个 worker 进程（含 fork 后）启动一个投递线程（BackgroundLoop）
+- flush_outbox : 同步投递队列中现有的全部邮件（进程退出、脚本与测试使用）
+- outbox_stats : 队列深度、批次数、平均 / 最大批大小、投递延迟分布（跨 worker 汇总在 Redis）
+
+写库失败时整批放回队列尾部等待重试；进程在取出后、写库前被强制杀死时该批邮件会丢失，
+对验证码这类短时邮件可以接受。
+"""
+
+import atexit
+import json
+import logging
+import os
+import time
+from datetime import datetime
+
+from redis.exceptions import RedisError
+from sqlalchemy import func, insert, select
+from sqlalchemy.exc import SQLAlchemyError
+
+from app.models.db import MailLog, db
+from app.utils.background import BackgroundLoop
+from app.utils.db import redis_client
+from app.utils.mailbox import notify_new_mail
+
+logger = logging.getLogger(__name__)
+
+MAIL_OUTBOX_KEY = "mail:outbox"
+MAIL_OUTBOX_STATS_KEY = "mail:outbox:stats"
+MAIL_OUTBOX_BATCH_SIZE = int(os.getenv("MAIL_OUTBOX_BATCH_SIZE", "100"))   # 单次 INSERT 的最大行数
+MAIL_OUTBOX_FLUSH_MS = int(os.getenv("MAIL_OUTBOX_FLUSH_MS", "200"))       # 第一条邮件到达后最多再等多久凑批
+MAIL_OUTBOX_POLL_SECONDS = 1                                               # 空队列时 BRPOP 的阻塞秒数
+# 投递延迟直方图桶上界（毫秒）：入队到写库提交的耗时。
+_LATENCY_BUCKETS_MS = (50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+def _insert_rows(rows) -> int:
+    """一条多行 INSERT 写入邮件并提交，返回当前最大邮件 id（用于唤醒长轮询）。"""
+    try:
+        db.session.execute(insert(MailLog), rows)
+        db.session.commit()
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+    return db.session.scalar(select(func.max(MailLog.id)))
+
+
+def enqueue_mail(subject: str, sender: str, receiver: str, content: str) -> None:
+    """邮件入队；失败时直接在当前请求内写库（保证邮件不丢）。"""
+    _worker.ensure()
+    now = datetime.now()
+    record = {"subject": subject, "sender": sender, "receiver": receiver, "content": content,
+              "created_at": now.strftime("%Y-%m-%d %H:%M:%S"), "enqueued_at": time.time()}
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.lpush(MAIL_OUTBOX_KEY, json.dumps(record, ensure_ascii=False))
+        pipe.hincrby(MAIL_OUTBOX_STATS_KEY, "enqueued", 1)
+        pipe.execute()
+        return
+    except RedisError:
+        logger.warning("mail outbox unavailable, inserting synchronously", exc_info=True)
+    row = {key: record[key] for key in ("subject", "sender", "receiver", "content")}
+    notify_new_mail(_insert_rows([dict(row, created_at=now, is_read=False)]))
+
+
+def _decode(raw: str) -> dict:
+    record = json.loads(raw)
+    record["created_at"] = datetime.strptime(record["created_at"], "%Y-%m-%d %H:%M:%S")
+    record["is_read"] = False
+    return record
+
+
+def _record_batch(records, delivered_at: float) -> None:
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.hincrby(MAIL_OUTBOX_STATS_KEY, "batches", 1)
+    pipe.hincrby(MAIL_OUTBOX_STATS_KEY, "delivered", len(records))
+    pipe.hincrby(MAIL_OUTBOX_STATS_KEY, f"batch_size:{len(records)}", 1)
+    for record in records:
+        latency_ms = (delivered_at - record["enqueued_at"]) * 1000
+        pipe.hincrby(MAIL_OUTBOX_STATS_KEY, "latency_ms_sum", int(latency_ms))
+        bucket = next((str(b) for b in _LATENCY_BUCKETS_MS if latency_ms <= b), "inf")
+        pipe.hincrby(MAIL_OUTBOX_STATS_KEY, f"latency_le:{bucket}", 1)
+    pipe.execute()
+
+
+def _deliver(raws) -> int:
+    """写入一批邮件（JSON 字符串列表，按入队顺序），返回写入条数。失败时放回队列。"""
+    records = [_decode(raw) for raw in raws]
+    rows = [{key: r[key] for key in ("subject", "sender", "receiver", "content", "created_at", "is_read")}
+            for r in records]
+    try:
+        latest_id = _insert_rows(rows)
+    except SQLAlchemyError:
+        logger.exception("mail outbox batch insert failed, requeueing %d mails", len(raws))
+        # 放回消费端（列表尾部），保持原有顺序，下一轮优先重试。
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.rpush(MAIL_OUTBOX_KEY, *reversed(raws))
+        pipe.hincrby(MAIL_OUTBOX_STATS_KEY, "errors", 1)
+        pipe.execute()
+        return 0
+    notify_new_mail(latest_id)
+    try:
+        _record_batch(records, time.time())
+    except RedisError:
+        pass
+    return len(rows)
+
+
+def _take_batch(block: bool):
+    """
+    取出一批邮件：阻塞等待第一条，然后在 MAIL_OUTBOX_FLUSH_MS 内继续凑批，
+    满 MAIL_OUTBOX_BATCH_SIZE 条立即返回（按大小或时间触发）。
+    """
+    if block:
+        first = redis_client.brpop(MAIL_OUTBOX_KEY, timeout=MAIL_OUTBOX_POLL_SECONDS)
+        if first is None:
+            return []
+        batch = [first[1]]
+        deadline = time.monotonic() + MAIL_OUTBOX_FLUSH_MS / 1000
+    else:
+        batch, deadline = [], 0
+    while len(batch) < MAIL_OUTBOX_BATCH_SIZE:
+        more = redis_client.rpop(MAIL_OUTBOX_KEY, MAIL_OUTBOX_BATCH_SIZE - len(batch))
+        if more:
+            batch.extend(more)
+        elif time.monotonic() >= deadline:
+            break
+        else:
+            time.sleep(0.02)
+    return batch
+
+
+def _drain_step() -> None:
+    batch = _take_batch(block=True)
+    if batch:
+        _deliver(batch)
+
+
+_worker = BackgroundLoop("mail-outbox", _drain_step)
+
+
+def init_outbox(app) -> None:
+    """每个 worker 进程（含 fork 后）启动一个投递线程；进程退出时尽量投递完队列。"""
+    _worker.bind(app)
+    atexit.register(_flush_at_exit, app)
+
+
+def flush_outbox() -> int:
+    """同步投递队列中现有的邮件（需在应用上下文中调用），返回写入条数。"""
+    delivered = 0
+    while True:
+        batch = _take_batch(block=False)
+        if not batch:
+            return delivered
+        written = _deliver(batch)
+        if not written:
+            return delivered
+        delivered += written
+
+
+def _flush_at_exit(app) -> None:
+    # 只在启动过投递线程的进程（处理过请求的 worker）里执行，脚本与镜像构建退出时不连接 Redis。
+    if not _worker.running:
+        return
+    try:
+        with app.app_context():
+            flush_outbox()
+    except Exception:
+        logger.warning("mail outbox flush at exit failed", exc_info=True)
+
+
+def outbox_stats() -> dict:
+    """队列深度、批次、批大小与投递延迟（毫秒，p50 / p99 为直方图桶上界估算）。"""
+    try:
+        pipe = redis_client.pipeline(transaction=False)
+        pipe.llen(MAIL_OUTBOX_KEY)
+        pipe.hgetall(MAIL_OUTBOX_STATS_KEY)
+        depth, raw = pipe.execute()
+    except RedisError:
+        return {"available": False}
+
+    counts = {field: int(raw.get(field, 0)) for field in ("enqueued", "delivered", "batches", "errors")}
+    sizes = {int(field.split(":", 1)[1]): int(v) for field, v in raw.items() if field.startswith("batch_size:")}
+    latency = [(float(b), int(raw.get(f"latency_le:{b}", 0))) for b in _LATENCY_BUCKETS_MS]
+    latency.append((float("inf"), int(raw.get("latency_le:inf", 0))))
+
+    def percentile(q: float):
+        target, seen = counts["delivered"] * q, 0
+        for bound, n in latency:
+            seen += n
+            if n and seen >= target:
+                return bound if bound != float("inf") else None
+        return None
+
+    delivered = counts["delivered"]
+    return dict(
+        counts,
+        available=True,
+        depth=depth,
+        avg_batch_size=round(delivered / counts["batches"], 2) if counts["batches"] else 0.0,
+        max_batch_size=max(sizes) if sizes else 0,
+        avg_latency_ms=round(int(raw.get("latency_ms_sum", 0)) / delivered, 1) if delivered else 0.0,
+        p50_latency_ms=percentile(0.5),
+        p99_latency_ms=percentile(0.99),
+    )
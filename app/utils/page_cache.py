@@ -0,0 +1,84 @@
+"""
+匿名访客整页缓存。
+
+首页、商品详情、搜索页对未登录访客的渲染结果只取决于 URL（路径 + 查询串），
+因此可以把整页 HTML 存入 Redis，命中时直接返回，不经过 SQLAlchemy 和 Jinja。
+
+- cache_anonymous_page : 视图装饰器，仅对匿名 GET 请求生效
+- purge_page           : 按路径主动清除单页（如支付后商品详情页库存变化）
+- page_cache_stats     : 命中/未命中计数，供 /admin/metrics 展示
+
+缓存键复用目录版本号（catalog_cache.read_through），后台商品写操作递增版本号即整体失效；
+同时受 PAGE_CACHE_TTL 秒兜底过期。以下请求一律绕过缓存：
+已登录用户（session 含 user_id）、带 flash 消息的请求、非 200 或设置了 Cookie 的响应。
+"""
+
+import hashlib
+import os
+from functools import wraps
+
+from flask import Response, make_response, request, session
+
+from app.utils.catalog_cache import cache_stats, invalidate, read_through
+
+PAGE_CACHE_TTL = int(os.getenv("PAGE_CACHE_TTL", "60"))
+PAGE_STATS_KEY = "pagecache:stats"
+
+
+def _page_ident(full_path: str) -> str:
+    return hashlib.sha1(full_path.encode("utf-8")).hexdigest()
+
+
+def _request_path() -> str:
+    # request.full_path 在无查询串时以 "?" 结尾，统一去掉，保证与 purge_page 的键一致。
+    return request.full_path.rstrip("?")
+
+
+def _is_cacheable_request() -> bool:
+    return request.method == "GET" and not session.get("user_id") and "_flashes" not in session
+
+
+def _is_cacheable_response(response) -> bool:
+    return (
+        response.status_code == 200
+        and response.mimetype == "text/html"
+        and not response.direct_passthrough
+        and "Set-Cookie" not in response.headers
+    )
+
+
+def cache_anonymous_page(view):
+    """匿名访客整页缓存装饰器。"""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        if not _is_cacheable_request():
+            return view(*args, **kwargs)
+
+        rendered = {}
+
+        def build():
+            response = make_response(view(*args, **kwargs))
+            rendered["response"] = response
+            if not _is_cacheable_response(response):
+                return None
+            return {"body": response.get_data(as_text=True), "mimetype": response.mimetype}
+
+        cached = read_through("page", _page_ident(_request_path()), build, ttl=PAGE_CACHE_TTL, stats_key=PAGE_STATS_KEY)
+        if "response" in rendered:
+            response = rendered["response"]
+            response.headers["X-Page-Cache"] = "MISS"
+            return response
+        response = Response(cached["body"], mimetype=cached["mimetype"])
+        response.headers["X-Page-Cache"] = "HIT"
+        return response
+
+    return wrapper
+
+
+def purge_page(*paths: str) -> None:
+    """清除指定路径（含查询串，如 "/product-detail/1"）的缓存页。"""
+    invalidate("page", [_page_ident(path) for path in paths])
+
+
+def page_cache_stats() -> dict:
+    return cache_stats(PAGE_STATS_KEY)
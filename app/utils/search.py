@@ -0,0 +1,149 @@
+"""
+商品搜索引擎（进程内倒排索引）。
+
+替代 goodsname/category 的 ILIKE '%q%' 全表扫描：
+- tokenize         : 英文/数字按词切分并小写；中日韩连续字符切为二元组（bigram），
+                     索引侧额外保留单字，查询侧仅在单字查询时使用单字
+- SearchIndex      : 字段加权的倒排索引 + BM25 打分，索引 goodsname / brand / model /
+                     category / GoodsSpec.value，文档内直接保存列表卡片字典，检索无需回表
+- search_index     : 模块级单例，首次查询时从 MySQL 构建，之后随目录版本号增量同步
+
+分页检索：search_index.search(query, page, per_page) → (cards, total)。
+基准测试见 scripts/bench_search.py。
+"""
+
+import math
+import re
+from collections import defaultdict
+
+from sqlalchemy.orm import selectinload
+
+from app.models.db import Goods
+from app.utils.catalog import goods_card
+from app.utils.catalog_index import CatalogIndex
+
+# 字段权重（BM25F 简化：按权重累加词频）。
+FIELD_WEIGHTS = {
+    "goodsname": 3.0,
+    "brand": 2.0,
+    "model": 2.0,
+    "category": 1.5,
+    "specs": 1.0,
+}
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+_WORD_RE = re.compile(r"[a-z0-9]+")
+_CJK_RE = re.compile(r"[\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uac00-\ud7af]+")
+
+
+def _cjk_tokens(run: str, with_unigrams: bool):
+    if len(run) == 1:
+        return [run]
+    tokens = [run[i:i + 2] for i in range(len(run) - 1)]
+    if with_unigrams:
+        tokens.extend(run)
+    return tokens
+
+
+def tokenize(text: str, for_query: bool = False):
+    """切词：英文数字按词，中日韩字符按二元组；for_query=True 时不生成单字（除非查询本身是单字）。"""
+    if not text:
+        return []
+    text = text.lower()
+    tokens = _WORD_RE.findall(text)
+    for run in _CJK_RE.findall(text):
+        tokens.extend(_cjk_tokens(run, with_unigrams=not for_query))
+    return tokens
+
+
+class SearchIndex(CatalogIndex):
+    """字段加权倒排索引，BM25 排序。"""
+
+    def __init__(self):
+        super().__init__()
+        self._clear()
+
+    def _clear(self) -> None:
+        self.postings = defaultdict(dict)   # term → {goods_id: 加权词频}
+        self.doc_terms = {}                 # goods_id → 该文档出现过的 term 集合（用于删除）
+        self.doc_lengths = {}               # goods_id → 加权文档长度
+        self.docs = {}                      # goods_id → 列表卡片字典
+        self.total_length = 0.0
+
+    def _query_options(self):
+        return [selectinload(Goods.specs)]
+
+    def _add(self, goods) -> None:
+        fields = {
+            "goodsname": goods.goodsname,
+            "brand": goods.brand,
+            "model": goods.model,
+            "category": goods.category,
+            "specs": " ".join(spec.value or "" for spec in goods.specs),
+        }
+        weighted_tf = defaultdict(float)
+        for field, text in fields.items():
+            weight = FIELD_WEIGHTS[field]
+            for token in tokenize(text):
+                weighted_tf[token] += weight
+        if not weighted_tf:
+            return
+
+        doc_length = sum(weighted_tf.values())
+        for term, tf in weighted_tf.items():
+            self.postings[term][goods.id] = tf
+        self.doc_terms[goods.id] = set(weighted_tf)
+        self.doc_lengths[goods.id] = doc_length
+        self.docs[goods.id] = goods_card(goods)
+        self.total_length += doc_length
+
+    def _discard(self, goods_id: int) -> None:
+        terms = self.doc_terms.pop(goods_id, None)
+        if terms is None:
+            return
+        for term in terms:
+            bucket = self.postings.get(term)
+            if bucket is not None:
+                bucket.pop(goods_id, None)
+                if not bucket:
+                    del self.postings[term]
+        self.total_length -= self.doc_lengths.pop(goods_id, 0.0)
+        self.docs.pop(goods_id, None)
+
+    def _score(self, terms):
+        doc_count = len(self.doc_lengths)
+        if not doc_count:
+            return {}
+        avg_length = self.total_length / doc_count
+        scores = defaultdict(float)
+        for term in set(terms):
+            bucket = self.postings.get(term)
+            if not bucket:
+                continue
+            df = len(bucket)
+            idf = math.log(1 + (doc_count - df + 0.5) / (df + 0.5))
+            for goods_id, tf in bucket.items():
+                norm = BM25_K1 * (1 - BM25_B + BM25_B * self.doc_lengths[goods_id] / avg_length)
+                scores[goods_id] += idf * tf * (BM25_K1 + 1) / (tf + norm)
+        return scores
+
+    def search(self, query: str, page: int = 1, per_page: int = 20):
+        """按 BM25 得分降序分页返回 (cards, total)；同分时销量高、上架晚的优先。"""
+        self.ensure_fresh()
+        terms = tokenize(query, for_query=True)
+        if not terms:
+            return [], 0
+        page = max(int(page or 1), 1)
+        with self.lock:
+            scores = self._score(terms)
+            ranked = sorted(
+                scores.items(),
+                key=lambda item: (-item[1], -self.docs[item[0]]["sales_count"], -item[0]),
+            )
+            start = (page - 1) * per_page
+            cards = [dict(self.docs[goods_id], score=round(score, 4)) for goods_id, score in ranked[start:start + per_page]]
+        return cards, len(ranked)
+
+
+search_index = SearchIndex()
@@ -0,0 +1,151 @@
+"""
+搜索联想（search-as-you-type）前缀索引。
+
+基于有序数组 + bisect 的前缀查找，数据来自 Goods.goodsname / brand / category：
+- 商品名整体及其中每个词的起始位置都作为前缀入口（输入 "pro" 可联想到 "iPhone 14 Pro"）
+- 品牌、分类按去重后的分组入库，得分为该组商品销量之和
+- 商品条目得分为 sales_count，结果按得分降序，同名只保留一条
+- 在整个前缀区间 [lo, hi) 内排序后再截取，不会因扫描上限漏掉高销量条目；
+  1~TOPK_PREFIX_LEN 个字符的短前缀区间大，其前 MAX_LIMIT 名按前缀缓存，索引有增删时清空
+
+SuggestIndex 继承 CatalogIndex：首次查询时全量构建，之后随目录版本号增量同步，
+后台新增/编辑/上下架商品后其他 worker 也会在 SYNC_INTERVAL 内刷新。
+"""
+
+import bisect
+import heapq
+import re
+
+from app.utils.catalog_index import CatalogIndex
+
+DEFAULT_LIMIT = 8
+MAX_LIMIT = 20
+TOPK_PREFIX_LEN = 3     # 不超过该长度的前缀缓存排序结果（如 "a"、"ip"），同步后首次查询重新计算
+_PREFIX_END = "\U0010ffff"
+_SPLIT_RE = re.compile(r"[\s/()（）,，·\-]+")
+
+
+def _normalize(text: str) -> str:
+    return (text or "").strip().lower()
+
+
+class SuggestIndex(CatalogIndex):
+    """有序数组前缀索引。条目为 (前缀键, 类型, 展示文本, goods_id) 四元组。"""
+
+    def __init__(self):
+        super().__init__()
+        self._bulk_loading = False
+        self._clear()
+
+    def rebuild(self) -> int:
+        # 全量构建时先追加后统一排序，避免逐条 insort 的 O(n^2) 开销。
+        with self.lock:
+            self._bulk_loading = True
+            try:
+                count = super().rebuild()
+            finally:
+                self._bulk_loading = False
+                self.entries.sort()
+        return count
+
+    def _clear(self) -> None:
+        self.entries = []          # 按前缀键排序的条目
+        self.goods_entries = {}    # goods_id → 该商品写入的条目列表
+        self.goods_sales = {}      # goods_id → 销量
+        self.goods_groups = {}     # goods_id → [(kind, text)] 所属品牌/分类分组
+        self.group_sales = {}      # (kind, text) → 组内销量之和
+        self.group_members = {}    # (kind, text) → 组内商品数
+        self.top_by_prefix = {}    # 短前缀 → 前 MAX_LIMIT 名 [(score, entry)]
+
+    def _insert(self, entry) -> None:
+        if self._bulk_loading:
+            self.entries.append(entry)
+        else:
+            bisect.insort(self.entries, entry)
+
+    def _delete(self, entry) -> None:
+        pos = bisect.bisect_left(self.entries, entry)
+        if pos < len(self.entries) and self.entries[pos] == entry:
+            del self.entries[pos]
+
+    def _add(self, goods) -> None:
+        self.top_by_prefix.clear()   # 条目或销量变化，短前缀排序结果失效
+        name = (goods.goodsname or "").strip()
+        entries = []
+        if name:
+            keys = {_normalize(name)}
+            # 商品名中每个词的起始位置也作为入口，便于从型号/系列名开始输入。
+            for match in _SPLIT_RE.finditer(name):
+                suffix = _normalize(name[match.end():])
+                if suffix:
+                    keys.add(suffix)
+            entries = [(key, "goods", name, goods.id) for key in sorted(keys)]
+            for entry in entries:
+                self._insert(entry)
+        self.goods_entries[goods.id] = entries
+        self.goods_sales[goods.id] = goods.sales_count or 0
+
+        groups = [(kind, (text or "").strip()) for kind, text in (("brand", goods.brand), ("category", goods.category))]
+        groups = [group for group in groups if group[1]]
+        for group in groups:
+            if not self.group_members.get(group):
+                self._insert((_normalize(group[1]), group[0], group[1], 0))
+            self.group_members[group] = self.group_members.get(group, 0) + 1
+            self.group_sales[group] = self.group_sales.get(group, 0) + self.goods_sales[goods.id]
+        self.goods_groups[goods.id] = groups
+
+    def _discard(self, goods_id: int) -> None:
+        self.top_by_prefix.clear()
+        for entry in self.goods_entries.pop(goods_id, []):
+            self._delete(entry)
+        sales = self.goods_sales.pop(goods_id, 0)
+        for group in self.goods_groups.pop(goods_id, []):
+            self.group_members[group] -= 1
+            self.group_sales[group] -= sales
+            if not self.group_members[group]:
+                del self.group_members[group]
+                del self.group_sales[group]
+                self._delete((_normalize(group[1]), group[0], group[1], 0))
+
+    def _score(self, entry) -> int:
+        _, kind, text, goods_id = entry
+        if kind == "goods":
+            return self.goods_sales.get(goods_id, 0)
+        return self.group_sales.get((kind, text), 0)
+
+    def _rank(self, prefix: str):
+        # 遍历完整的前缀区间，去重后取前 MAX_LIMIT 名。
+        lo = bisect.bisect_left(self.entries, (prefix,))
+        hi = bisect.bisect_left(self.entries, (prefix + _PREFIX_END,), lo)
+        candidates = {}
+        for entry in self.entries[lo:hi]:
+            dedupe_key = (entry[1], entry[2])
+            score = self._score(entry)
+            if dedupe_key not in candidates or candidates[dedupe_key][0] < score:
+                candidates[dedupe_key] = (score, entry)
+        return heapq.nlargest(MAX_LIMIT, candidates.values(), key=lambda item: item[0])
+
+    def suggest(self, prefix: str, limit: int = DEFAULT_LIMIT):
+        """返回前缀匹配的联想词列表，按销量（分组为销量之和）降序。"""
+        self.ensure_fresh()
+        prefix = _normalize(prefix)
+        if not prefix:
+            return []
+        limit = min(max(int(limit or DEFAULT_LIMIT), 1), MAX_LIMIT)
+
+        with self.lock:
+            if len(prefix) <= TOPK_PREFIX_LEN:
+                ranked = self.top_by_prefix.get(prefix)
+                if ranked is None:
+                    ranked = self.top_by_prefix[prefix] = self._rank(prefix)
+            else:
+                ranked = self._rank(prefix)
+            top = ranked[:limit]
+
+        return [
+            {"text": entry[2], "type": entry[1], "goods_id": entry[3] or None, "score": score}
+            for score, entry in top
+        ]
+
+
+suggest_index = SuggestIndex()
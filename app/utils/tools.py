@@ -8,10 +8,10 @@ HackShop 通用工具函数模块。
 - 请求解析：request_data（兼容 JSON / form）
 - DB 提交：safe_commit（统一事务提交与异常处理）
 - 订单状态映射：get_order_status_meta
-- 认证逻辑：authenticate_user（含 Redis 防爆破）、admin_auth（AES 解密）
-- 密码重置：send_reset_url（V-Host-Inject 漏洞保留）
+- 认证逻辑：authenticate_user（含 Redis 防爆破，Lua 脚本单次往返）、admin_auth（AES 解密）
+- 密码重置：send_reset_url（V-Host-Inject 漏洞保留，邮件经发件箱异步写入）
 - AES 解密：aes_decrypt（V-Admin-AES 漏洞配套）
-- 原生 SQL 查询：query_order_detail_raw（V-SQL-Union 漏洞保留）
+- 原生 SQL 查询：query_order_detail_raw（V-SQL-Union 漏洞保留，连接取自引擎连接池）
 """
 
 import base64
@@ -29,8 +29,9 @@ from flask import g, jsonify, redirect, request, session, url_for
 from sqlalchemy.exc import SQLAlchemyError
 
 from app.config import Config
-from app.models.db import Admin, MailLog, User, db
-from app.utils.db import redis_client
+from app.models.db import Admin, User, db
+from app.utils.db import redis_client, redis_script
+from app.utils.outbox import enqueue_mail
 
 logger = logging.getLogger(__name__)
 
@@ -79,7 +80,7 @@ def generate_mailcode() -> str:
 
 
 def generate_uuid_hex() -> str:
-    """生成 32 位无横线 UUID，用于订单主键、储值券兑换码等场景。"""
+    """生成 32 位无横线 UUID，用于储值券兑换码等场景（订单主键见 order_ids.generate_order_id）。"""
     return uuid.uuid4().hex
 
 
@@ -126,29 +127,69 @@ def verify_email_code(email: str, code: str) -> bool:
     return True
 
 
+LOGIN_MAX_FAILURES = 5      # 连续失败次数达到该值后锁定
+LOGIN_LOCK_SECONDS = 300    # 失败计数窗口与锁定时长（秒）
+
+# 登录限流脚本：锁定检查 + 失败计数 / 清零在 Redis 服务端原子执行，一次网络往返。
+# KEYS[1]=锁定键 KEYS[2]=失败计数键；ARGV[1]=本次密码是否正确(1/0) ARGV[2]=失败上限 ARGV[3]=窗口秒数
+# 返回 {状态, 值}：{1, 锁定剩余秒数} 已锁定 / {0, 0} 登录成功 / {2, 失败次数} 密码错误
+_LOGIN_THROTTLE_LUA = """
+if redis.call('GET', KEYS[1]) == '1' then
+    return {1, redis.call('TTL', KEYS[1])}
+end
+if ARGV[1] == '1' then
+    redis.call('DEL', KEYS[2])
+    return {0, 0}
+end
+local count = redis.call('INCR', KEYS[2])
+if count == 1 then
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+end
+if count >= tonumber(ARGV[2]) then
+    redis.call('SETEX', KEYS[1], ARGV[3], '1')
+    redis.call('DEL', KEYS[2])
+end
+return {2, count}
+"""
+
+
+def _login_throttle_py(client, keys, args):
+    # 与 _LOGIN_THROTTLE_LUA 等价，仅供 REDIS_BACKEND=memory 使用。
+    lock_key, fail_key = keys
+    if client.get(lock_key) == "1":
+        return [1, client.ttl(lock_key)]
+    if args[0] == "1":
+        client.delete(fail_key)
+        return [0, 0]
+    count = client.incr(fail_key)
+    if count == 1:
+        client.expire(fail_key, int(args[2]))
+    if count >= int(args[1]):
+        client.setex(lock_key, int(args[2]), "1")
+        client.delete(fail_key)
+    return [2, count]
+
+
+_login_throttle = redis_script(_LOGIN_THROTTLE_LUA, _login_throttle_py)
+LOGIN_LOCKED, LOGIN_OK, LOGIN_FAILED = 1, 0, 2
+
+
 def authenticate_user(email: str, password: str):
     """
     前台用户登录认证。
     基于 Redis 的防爆破机制：5 次失败后锁定 5 分钟（V-Auth-DoS 漏洞场景）。
     """
-    # 基于 Redis 的简单防爆破：失败计数 + 临时锁定。
-    lock_key = f"login:lock:{email}"
-    if redis_client.get(lock_key) == "1":
-        ttl = redis_client.ttl(lock_key)
-        return {"status": "error", "message": "账号已锁定，请稍后再试", "lock_ttl": ttl}, 403
-
+    # 先按唯一索引查用户，再用一次脚本调用完成锁定检查与失败计数（EVALSHA，一次往返）。
     user = User.query.filter_by(email=email).first()
-    if not user or user.password != password:
-        fail_key = f"login:fail:{email}"
-        count = redis_client.incr(fail_key)
-        if count == 1:
-            redis_client.expire(fail_key, 300)
-        if count >= 5:
-            redis_client.setex(lock_key, 300, "1")
-            redis_client.delete(fail_key)
-        return {"status": "error", "message": "用户名或密码错误", "fail_count": count}, 401
-
-    redis_client.delete(f"login:fail:{email}")
+    password_ok = user is not None and user.password == password
+    state, value = _login_throttle(
+        keys=[f"login:lock:{email}", f"login:fail:{email}"],
+        args=[1 if password_ok else 0, LOGIN_MAX_FAILURES, LOGIN_LOCK_SECONDS],
+    )
+    if state == LOGIN_LOCKED:
+        return {"status": "error", "message": "账号已锁定，请稍后再试", "lock_ttl": value}, 403
+    if state == LOGIN_FAILED:
+        return {"status": "error", "message": "用户名或密码错误", "fail_count": value}, 401
     return {"status": "ok", "message": "登录成功", "user_id": user.id}, 200
 
 
@@ -163,18 +204,15 @@ def send_reset_url(email: str, host: str, user_id: int):
     # Host Injection 漏洞保留：为靶场演示不做 host 白名单校验。
     reset_link = f"http://{host}{url_for('auth.reset_password', token=token)}"
 
-    mail = MailLog(
-        subject="重置您的密码 - HackShop",
-        sender="security@hackshop.local",
-        receiver=email,
-        content=f"请点击以下链接重置密码：{reset_link}\n如果您未请求重置密码，请忽略此邮件。",
-    )
     try:
-        db.session.add(mail)
-        db.session.commit()
+        enqueue_mail(
+            subject="重置您的密码 - HackShop",
+            sender="security@hackshop.local",
+            receiver=email,
+            content=f"请点击以下链接重置密码：{reset_link}\n如果您未请求重置密码，请忽略此邮件。",
+        )
     except SQLAlchemyError:
-        db.session.rollback()
-        logger.exception("send_reset_url commit failed")
+        logger.exception("send_reset_url enqueue failed")
         raise
     return True
 
@@ -223,18 +261,12 @@ def query_order_detail_raw(order_id: str):
     使用原生 SQL 查询订单详情（绕过 ORM）。
     V-SQL-Union 漏洞：order_id 直接拼接到 SQL 语句中，未使用参数化查询，
     攻击者可通过 UNION SELECT 注入获取任意数据。
+    连接从 SQLAlchemy 引擎连接池借用（与 ORM 共用 SQLALCHEMY_ENGINE_OPTIONS 的上限与 pre-ping），
+    不再每次请求新建 TCP 连接并认证；close() 归还连接池，归还时自动回滚。
     """
-    conn = pymysql.connect(
-        host=os.getenv("MYSQL_HOST", "127.0.0.1"),
-        port=int(os.getenv("MYSQL_PORT", "3306")),
-        user=os.getenv("MYSQL_USER", "hackshop_user"),
-        password=os.getenv("MYSQL_PASSWORD", "hackshop_password"),
-        db=os.getenv("MYSQL_DB", "hackshop_db"),
-        charset="utf8mb4",
-        cursorclass=pymysql.cursors.DictCursor,
-    )
+    conn = db.engine.raw_connection()
     try:
-        with conn.cursor() as cur:
+        with conn.cursor(pymysql.cursors.DictCursor) as cur:
             # SQL 注入漏洞保留：故意拼接 SQL 用于 V-SQL-Union 场景。
             sql = (
                 "SELECT "
@@ -0,0 +1,140 @@
+"""
+库存扣减基准测试：direct（默认，Python 中检查后扣减 goods.stock） vs reserve（Redis 原子预占 + 异步结算）。
+
+模拟秒杀：一个库存为 --stock 的商品，--users 个用户各有一笔 1 件的待支付订单，
+--threads 个线程并发提交支付（POST /order/check/<id>），两种模式依次运行，输出
+吞吐（次/秒）、支付成功数、结算后的 goods.stock 与超卖件数（成功数 - 初始库存）。
+direct 模式保留 V-Race-Condition，高并发下通常会超卖；reserve 模式成功数不会超过库存。
+测试数据使用 bench-inv- 前缀（商品、用户、订单），结束后删除。
+
+用法：
+  python scripts/bench_inventory.py                              # 默认库存 50、200 个用户、16 线程
+  python scripts/bench_inventory.py --stock 100 --users 1000 --threads 32
+  docker compose exec web python scripts/bench_inventory.py
+"""
+
+import argparse
+import os
+import sys
+import threading
+import time
+from datetime import datetime
+
+# 确保从项目根目录导入 app 包
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import delete, func, select
+
+from app import app
+from app.models.db import Goods, Order, OrderItem, StockSettlement, User, db
+from app.utils import inventory
+from app.utils.identity import invalidate_user
+from app.utils.order_ids import generate_order_id
+
+PREFIX = "bench-inv-"
+
+
+def _setup(users: int, stock: int):
+    goods = Goods(goodsname=f"{PREFIX}flash", category=f"{PREFIX}category", mainimg="", content="", stock=stock,
+                  price=1)
+    db.session.add(goods)
+    db.session.add_all(User(username=f"{PREFIX}{i}", email=f"{PREFIX}{i}@hackshop.local", password="bench",
+                            balance=100) for i in range(users))
+    db.session.commit()
+    return goods.id, db.session.scalars(select(User.id).where(User.username.startswith(PREFIX))).all()
+
+
+def _reset(goods_id: int, user_ids, stock: int):
+    """清空上一轮的订单与结算记录，恢复库存和余额，为每个用户生成一笔待支付订单。"""
+    _clear_orders(user_ids)
+    db.session.execute(Goods.__table__.update().where(Goods.id == goods_id).values(stock=stock))
+    db.session.execute(User.__table__.update().where(User.id.in_(user_ids)).values(balance=100))
+    orders = []
+    for user_id in user_ids:
+        order_id = generate_order_id()
+        orders.append((user_id, order_id))
+        db.session.add(Order(id=order_id, order_number=f"{PREFIX}{order_id}", user_id=user_id, total_amount=1,
+                             generatetime=datetime.now(), payment_status="pending", payment_method="balance"))
+        db.session.add(OrderItem(order_id=order_id, goods_id=goods_id, quantity=1, unit_price=1, subtotal=1))
+    db.session.commit()
+    inventory.reset_available(goods_id)
+    for user_id in user_ids:
+        invalidate_user(user_id)
+    return orders
+
+
+def _clear_orders(user_ids):
+    order_ids = select(Order.id).where(Order.user_id.in_(user_ids))
+    db.session.execute(delete(StockSettlement).where(StockSettlement.order_id.in_(order_ids)))
+    db.session.execute(delete(OrderItem).where(OrderItem.order_id.in_(order_ids)))
+    db.session.execute(delete(Order).where(Order.user_id.in_(user_ids)))
+    db.session.commit()
+
+
+def _pay_all(orders, threads: int) -> float:
+    """按线程切分订单并发支付，返回耗时（秒）。每个线程一个测试客户端，逐单切换登录用户。"""
+    def worker(chunk):
+        client = app.test_client()
+        for user_id, order_id in chunk:
+            with client.session_transaction() as sess:
+                sess["user_id"] = user_id
+            client.post(f"/order/check/{order_id}", data={"payment_method": "balance"})
+
+    chunks = [orders[i::threads] for i in range(threads)]
+    workers = [threading.Thread(target=worker, args=(chunk,)) for chunk in chunks if chunk]
+    started = time.perf_counter()
+    for t in workers:
+        t.start()
+    for t in workers:
+        t.join()
+    return time.perf_counter() - started
+
+
+def _run(mode: str, goods_id: int, user_ids, stock: int, threads: int) -> dict:
+    inventory.INVENTORY_MODE = mode
+    orders = _reset(goods_id, user_ids, stock)
+    elapsed = _pay_all(orders, threads)
+    while inventory.settle_pending():
+        pass
+    db.session.expire_all()
+    paid = db.session.scalar(select(func.count()).select_from(Order)
+                             .where(Order.user_id.in_(user_ids), Order.payment_status == "paid"))
+    final_stock = db.session.scalar(select(Goods.stock).where(Goods.id == goods_id))
+    return {"mode": mode, "rps": len(orders) / elapsed, "paid": paid, "final_stock": final_stock,
+            "oversold": max(0, paid - stock)}
+
+
+def _cleanup(goods_id: int, user_ids):
+    _clear_orders(user_ids)
+    db.session.execute(delete(User).where(User.id.in_(user_ids)))
+    db.session.execute(delete(Goods).where(Goods.id == goods_id))
+    db.session.commit()
+    inventory.reset_available(goods_id)
+    for user_id in user_ids:
+        invalidate_user(user_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="库存扣减基准测试")
+    parser.add_argument("--stock", type=int, default=50, help="秒杀商品初始库存")
+    parser.add_argument("--users", type=int, default=200, help="并发下单的用户（订单）数")
+    parser.add_argument("--threads", type=int, default=16, help="并发线程数")
+    args = parser.parse_args()
+
+    original_mode = inventory.INVENTORY_MODE
+    with app.app_context():
+        goods_id, user_ids = _setup(args.users, args.stock)
+        try:
+            results = [_run(mode, goods_id, user_ids, args.stock, args.threads) for mode in ("direct", "reserve")]
+        finally:
+            inventory.INVENTORY_MODE = original_mode
+            _cleanup(goods_id, user_ids)
+
+    print(f"stock={args.stock} users={args.users} threads={args.threads}")
+    for r in results:
+        print(f"{r['mode']:<8} {r['rps']:8.1f} req/s   paid {r['paid']:>5}   final stock {r['final_stock']:>5}   "
+              f"oversold {r['oversold']}")
+
+
+if __name__ == "__main__":
+    main()
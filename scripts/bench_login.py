@@ -0,0 +1,98 @@
+"""
+登录限流基准测试：逐条 Redis 命令（旧实现） vs 单次 Lua 脚本（authenticate_user）。
+
+模拟撞库流量：对 --emails 个不存在的邮箱轮流提交错误密码（覆盖失败计数、加锁与已锁定三种路径），
+输出每次认证的平均 / p50 / p99 耗时（毫秒）与 Redis 往返次数。
+注意：旧实现在已锁定时跳过 MySQL 查询，新实现始终先按唯一索引查一次用户，再做一次脚本调用。
+测试使用 bench:login: 前缀的邮箱，结束后清理 Redis 键，不写数据库。
+
+用法：
+  python scripts/bench_login.py                 # 默认 2000 次
+  python scripts/bench_login.py -n 5000 --emails 200
+  docker compose exec web python scripts/bench_login.py
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# 确保从项目根目录导入 app 包
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import app
+from app.models.db import User
+from app.utils.db import redis_client
+from app.utils.tools import authenticate_user
+
+
+def legacy_authenticate_user(email: str, password: str):
+    """优化前的实现：锁定检查、计数、过期、加锁分别是独立的 Redis 命令（最多 5 次往返）。"""
+    lock_key = f"login:lock:{email}"
+    if redis_client.get(lock_key) == "1":
+        ttl = redis_client.ttl(lock_key)
+        return {"status": "error", "lock_ttl": ttl}, 403
+
+    user = User.query.filter_by(email=email).first()
+    if not user or user.password != password:
+        fail_key = f"login:fail:{email}"
+        count = redis_client.incr(fail_key)
+        if count == 1:
+            redis_client.expire(fail_key, 300)
+        if count >= 5:
+            redis_client.setex(lock_key, 300, "1")
+            redis_client.delete(fail_key)
+        return {"status": "error", "fail_count": count}, 401
+
+    redis_client.delete(f"login:fail:{email}")
+    return {"status": "ok", "user_id": user.id}, 200
+
+
+def _cleanup(emails):
+    keys = [f"login:{kind}:{email}" for email in emails for kind in ("lock", "fail")]
+    if keys:
+        redis_client.delete(*keys)
+
+
+def _run(func, attempts: int, emails):
+    _cleanup(emails)
+    timings = []
+    for i in range(attempts):
+        email = emails[i % len(emails)]
+        started = time.perf_counter()
+        func(email, "wrong-password")
+        timings.append((time.perf_counter() - started) * 1000)
+    _cleanup(emails)
+    return timings
+
+
+def _summary(name: str, timings) -> str:
+    ordered = sorted(timings)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return (f"{name:<10} avg {statistics.mean(timings):7.3f} ms   p50 {statistics.median(timings):7.3f} ms   "
+            f"p99 {p99:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="登录限流基准测试")
+    parser.add_argument("-n", "--attempts", type=int, default=2000, help="每种实现的认证次数")
+    parser.add_argument("--emails", type=int, default=100, help="参与测试的邮箱数量")
+    args = parser.parse_args()
+
+    emails = [f"bench:login:{i}@hackshop.local" for i in range(args.emails)]
+    with app.app_context():
+        # 预热连接池与脚本缓存（EVALSHA）。
+        _run(authenticate_user, 20, emails)
+        _run(legacy_authenticate_user, 20, emails)
+
+        legacy = _run(legacy_authenticate_user, args.attempts, emails)
+        scripted = _run(authenticate_user, args.attempts, emails)
+
+    print(f"attempts={args.attempts} emails={args.emails}")
+    print(_summary("legacy", legacy) + "   Redis 往返 1~5 次/次")
+    print(_summary("lua", scripted) + "   Redis 往返 1 次/次")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,101 @@
+"""
+订单主键插入基准测试：随机 uuid4 hex（旧方案） vs 按时间递增的 19 位主键（generate_order_id）。
+
+为每种方案建一对临时表，结构与 order / order_items 的主键和外键列一致：
+  bench_ids_<scheme>_order(id VARCHAR(32) 主键, payload) + bench_ids_<scheme>_item(id 自增, order_id 索引)
+每批插入 --batch 个订单（每单 --items 条明细）并提交，输出插入吞吐（订单/秒），
+MySQL 下另外输出 ANALYZE 后的数据 / 索引大小（随机主键会导致页分裂，表和索引更大）。
+结束后删除临时表。
+
+用法：
+  python scripts/bench_order_ids.py                       # 默认 50000 单、每单 3 条明细
+  python scripts/bench_order_ids.py -n 200000 --batch 1000
+  docker compose exec web python scripts/bench_order_ids.py
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# 确保从项目根目录导入 app 包
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import Column, Integer, MetaData, String, Table, insert, text
+
+from app import app
+from app.models.db import db
+from app.utils.order_ids import generate_order_id
+from app.utils.tools import generate_uuid_hex
+
+SCHEMES = {"uuid4": generate_uuid_hex, "snowflake": generate_order_id}
+
+
+def _tables(scheme: str):
+    metadata = MetaData()
+    orders = Table(f"bench_ids_{scheme}_order", metadata,
+                   Column("id", String(32), primary_key=True),
+                   Column("payload", String(64), nullable=False))
+    items = Table(f"bench_ids_{scheme}_item", metadata,
+                  Column("id", Integer, primary_key=True, autoincrement=True),
+                  Column("order_id", String(32), nullable=False, index=True),
+                  Column("quantity", Integer, nullable=False))
+    return metadata, orders, items
+
+
+def _table_sizes(names) -> dict:
+    """MySQL：ANALYZE 后从 information_schema 读取数据 / 索引字节数；其他数据库返回空。"""
+    if db.engine.dialect.name != "mysql":
+        return {}
+    with db.engine.connect() as conn:
+        for name in names:
+            conn.execute(text(f"ANALYZE TABLE {name}"))
+        rows = conn.execute(
+            text("SELECT SUM(data_length), SUM(index_length) FROM information_schema.tables "
+                 "WHERE table_schema = DATABASE() AND table_name IN :names").bindparams(names=tuple(names))
+        ).one()
+    return {"data_bytes": int(rows[0] or 0), "index_bytes": int(rows[1] or 0)}
+
+
+def _run(scheme: str, total: int, batch: int, items_per_order: int) -> dict:
+    generate = SCHEMES[scheme]
+    metadata, orders, items = _tables(scheme)
+    metadata.drop_all(db.engine)
+    metadata.create_all(db.engine)
+    try:
+        started = time.perf_counter()
+        with db.engine.connect() as conn:
+            for start in range(0, total, batch):
+                ids = [generate() for _ in range(min(batch, total - start))]
+                conn.execute(insert(orders), [{"id": order_id, "payload": "x" * 32} for order_id in ids])
+                conn.execute(insert(items), [{"order_id": order_id, "quantity": 1}
+                                             for order_id in ids for _ in range(items_per_order)])
+                conn.commit()
+        elapsed = time.perf_counter() - started
+        result = {"scheme": scheme, "orders_per_sec": total / elapsed, "seconds": elapsed}
+        result.update(_table_sizes([orders.name, items.name]))
+        return result
+    finally:
+        metadata.drop_all(db.engine)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="订单主键插入基准测试")
+    parser.add_argument("-n", "--orders", type=int, default=50000, help="每种方案插入的订单数")
+    parser.add_argument("--batch", type=int, default=500, help="每次提交的订单数")
+    parser.add_argument("--items", type=int, default=3, help="每单明细条数")
+    args = parser.parse_args()
+
+    with app.app_context():
+        results = [_run(scheme, args.orders, args.batch, args.items) for scheme in SCHEMES]
+
+    print(f"orders={args.orders} batch={args.batch} items/order={args.items}")
+    for r in results:
+        line = f"{r['scheme']:<10} {r['orders_per_sec']:10.0f} orders/s   {r['seconds']:7.2f} s"
+        if "data_bytes" in r:
+            line += f"   data {r['data_bytes'] / 2**20:7.1f} MiB   index {r['index_bytes'] / 2**20:7.1f} MiB"
+        print(line)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+"""
+订单详情原生 SQL 基准测试：每次新建 pymysql 连接（旧实现） vs 借用引擎连接池（query_order_detail_raw）。
+
+对同一个订单 ID 重复执行订单详情查询，输出每次查询的平均 / p50 / p99 耗时（毫秒），
+并单独测量"只建连 + 关闭"的开销，即旧实现每次请求额外付出的 TCP + 认证握手成本。
+未指定 --order-id 时取最新的一笔订单（没有订单时查询一个不存在的 ID，仍会完整执行 SQL）。只读，不写数据库。
+
+用法：
+  python scripts/bench_raw_sql.py                  # 默认 1000 次
+  python scripts/bench_raw_sql.py -n 5000 --order-id <订单ID>
+  docker compose exec web python scripts/bench_raw_sql.py
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# 确保从项目根目录导入 app 包
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+import pymysql
+
+from app import app
+from app.models.db import Order, db
+from app.utils.tools import query_order_detail_raw
+
+
+def _legacy_connect():
+    """优化前每次请求的建连方式。"""
+    return pymysql.connect(
+        host=os.getenv("MYSQL_HOST", "127.0.0.1"),
+        port=int(os.getenv("MYSQL_PORT", "3306")),
+        user=os.getenv("MYSQL_USER", "hackshop_user"),
+        password=os.getenv("MYSQL_PASSWORD", "hackshop_password"),
+        db=os.getenv("MYSQL_DB", "hackshop_db"),
+        charset="utf8mb4",
+        cursorclass=pymysql.cursors.DictCursor,
+    )
+
+
+def legacy_query_order_detail(order_id: str):
+    """优化前的实现：新建连接 → 执行同一条拼接 SQL → 关闭连接。"""
+    conn = _legacy_connect()
+    try:
+        with conn.cursor() as cur:
+            cur.execute(
+                "SELECT o.id, o.order_number, o.generatetime, o.total_amount, o.user_id, "
+                "a.receiver, a.phone, a.addressname, g.goodsname, oi.unit_price, oi.quantity "
+                "FROM `order` o "
+                "LEFT JOIN address a ON a.id = o.address_id "
+                "LEFT JOIN order_items oi ON oi.order_id = o.id "
+                "LEFT JOIN goods g ON g.id = oi.goods_id "
+                "WHERE o.id = '" + order_id + "'"
+            )
+            return cur.fetchall()
+    finally:
+        conn.close()
+
+
+def _connect_only(_order_id: str):
+    _legacy_connect().close()
+
+
+def _run(func, order_id: str, attempts: int):
+    timings = []
+    for _ in range(attempts):
+        started = time.perf_counter()
+        func(order_id)
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+
+def _summary(name: str, timings) -> str:
+    ordered = sorted(timings)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    return (f"{name:<14} avg {statistics.mean(timings):7.3f} ms   p50 {statistics.median(timings):7.3f} ms   "
+            f"p99 {p99:7.3f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="订单详情原生 SQL 连接基准测试")
+    parser.add_argument("-n", "--attempts", type=int, default=1000, help="每种实现的查询次数")
+    parser.add_argument("--order-id", help="查询的订单 ID（默认取最新订单）")
+    args = parser.parse_args()
+
+    with app.app_context():
+        order_id = args.order_id or db.session.scalar(
+            db.select(Order.id).order_by(Order.generatetime.desc()).limit(1)) or "missing"
+        db.session.remove()
+        # 预热：连接池建好连接，MySQL 缓存好执行计划与数据页。
+        _run(query_order_detail_raw, order_id, 20)
+        _run(legacy_query_order_detail, order_id, 20)
+
+        connect = _run(_connect_only, order_id, args.attempts)
+        legacy = _run(legacy_query_order_detail, order_id, args.attempts)
+        pooled = _run(query_order_detail_raw, order_id, args.attempts)
+
+    print(f"attempts={args.attempts} order_id={order_id}")
+    print(_summary("connect+close", connect) + "   旧实现每次请求的额外开销")
+    print(_summary("per-request", legacy) + "   每次新建连接")
+    print(_summary("pooled", pooled) + "   借用引擎连接池")
+
+
+if __name__ == "__main__":
+    main()
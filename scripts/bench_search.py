@@ -0,0 +1,82 @@
+"""
+搜索基准测试：ILIKE '%q%' 全表扫描 vs 进程内倒排索引（app/utils/search.py）。
+
+对同一组关键词分别执行：
+  1. 旧路径：Goods.goodsname ILIKE / Goods.category ILIKE（取全部命中行）
+  2. 新路径：search_index.search()（BM25 排序，取第一页）
+输出两种路径的平均 / p50 / p99 耗时（毫秒）以及索引构建耗时。
+
+用法：
+  python scripts/bench_search.py                       # 默认关键词，每个跑 200 次
+  python scripts/bench_search.py -n 500 手机 Apple 黑色
+  docker compose exec web python scripts/bench_search.py
+"""
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+# 确保从项目根目录导入 app 包
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import app
+from app.models.db import GOODS_ON_SALE, Goods
+from app.utils.search import search_index
+
+DEFAULT_QUERIES = ["手机", "Apple", "电脑办公", "黑色", "Pro", "耳机"]
+
+
+def _like_search(keyword: str):
+    like_kw = f"%{keyword}%"
+    return (
+        Goods.query.filter(
+            Goods.status == GOODS_ON_SALE,
+            (Goods.goodsname.ilike(like_kw)) | (Goods.category.ilike(like_kw)),
+        )
+        .order_by(Goods.id.desc())
+        .all()
+    )
+
+
+def _measure(func, queries, rounds: int):
+    samples = []
+    for _ in range(rounds):
+        for keyword in queries:
+            start = time.perf_counter()
+            func(keyword)
+            samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "avg": statistics.fmean(samples),
+        "p50": samples[len(samples) // 2],
+        "p99": samples[min(len(samples) - 1, int(len(samples) * 0.99))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="LIKE vs inverted-index search benchmark")
+    parser.add_argument("queries", nargs="*", default=DEFAULT_QUERIES)
+    parser.add_argument("-n", "--rounds", type=int, default=200)
+    args = parser.parse_args()
+
+    with app.app_context():
+        start = time.perf_counter()
+        doc_count = search_index.rebuild()
+        print(f"index build: {doc_count} goods in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+        for keyword in args.queries:
+            _, total = search_index.search(keyword)
+            print(f"  {keyword!r}: like={len(_like_search(keyword))} index={total}")
+
+        like = _measure(_like_search, args.queries, args.rounds)
+        index = _measure(lambda q: search_index.search(q), args.queries, args.rounds)
+
+    print(f"{'path':<8}{'avg ms':>10}{'p50 ms':>10}{'p99 ms':>10}")
+    for name, stats in (("like", like), ("index", index)):
+        print(f"{name:<8}{stats['avg']:>10.3f}{stats['p50']:>10.3f}{stats['p99']:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+静态资源构建脚本：内容哈希指纹化 + 预压缩 + manifest。
+
+处理 app/static 下的全部文件（dist/ 除外），输出到 app/static/dist/：
+  1. 按内容哈希重命名：css/hackshop.css → css/hackshop.<hash>.css（目录结构不变）
+  2. CSS 中引用的字体等相对路径改写为带哈希的文件名（先处理非 CSS 文件）
+  3. 文本类资源生成 .gz（gzip -9）与 .br（需安装 brotli，未安装时跳过）
+  4. 写出 manifest.json：{"css/hackshop.css": "css/hackshop.<hash>.css", ...}
+运行时由 app/utils/assets.py 读取 manifest，url_for('static', ...) 自动指向带哈希文件。
+
+镜像构建时执行（见 Dockerfile）；本地开发不执行即保持原始文件直出。
+
+用法：
+  python scripts/build_assets.py
+  python scripts/build_assets.py --clean   # 仅删除 dist/
+"""
+
+import argparse
+import gzip
+import json
+import os
+import shutil
+import sys
+
+# 确保从项目根目录导入 app 包
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app.utils.assets import ASSET_DIST_DIR, ASSET_MANIFEST, fingerprinted_name, rewrite_css_urls
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover
+    brotli = None
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app", "static")
+DIST_DIR = os.path.join(STATIC_DIR, ASSET_DIST_DIR)
+# woff2 / 图片本身已压缩，只对文本类资源生成预压缩副本。
+COMPRESSIBLE_EXTS = {".css", ".js", ".svg", ".json", ".txt", ".map", ".ttf", ".eot"}
+MIN_COMPRESS_SIZE = 512
+
+
+def _collect_sources():
+    # CSS 排在最后：改写其中的 url(...) 时，被引用的字体必须已在 manifest 中。
+    sources = []
+    for root, dirs, files in os.walk(STATIC_DIR):
+        dirs[:] = [d for d in dirs if os.path.join(root, d) != DIST_DIR]
+        for name in files:
+            rel = os.path.relpath(os.path.join(root, name), STATIC_DIR).replace(os.sep, "/")
+            sources.append(rel)
+    return sorted(sources, key=lambda rel: (rel.endswith(".css"), rel))
+
+
+def _write(rel: str, content: bytes) -> None:
+    path = os.path.join(DIST_DIR, rel)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+def _precompress(rel: str, content: bytes, totals: dict) -> None:
+    # 只保留确实更小的压缩副本；mtime=0 保证同一内容的 .gz 字节级一致。
+    if os.path.splitext(rel)[1] not in COMPRESSIBLE_EXTS or len(content) < MIN_COMPRESS_SIZE:
+        return
+    gz = gzip.compress(content, compresslevel=9, mtime=0)
+    if len(gz) < len(content):
+        _write(rel + ".gz", gz)
+        totals["gzip"] += len(gz)
+    if brotli is not None:
+        br = brotli.compress(content, quality=11)
+        if len(br) < len(content):
+            _write(rel + ".br", br)
+            totals["br"] += len(br)
+
+
+def build() -> dict:
+    """重新生成 dist/ 并返回 manifest。"""
+    shutil.rmtree(DIST_DIR, ignore_errors=True)
+    manifest = {}
+    totals = {"files": 0, "original": 0, "gzip": 0, "br": 0}
+    for rel in _collect_sources():
+        with open(os.path.join(STATIC_DIR, rel), "rb") as f:
+            content = f.read()
+        if rel.endswith(".css"):
+            content = rewrite_css_urls(content.decode("utf-8"), rel, manifest).encode("utf-8")
+        hashed = fingerprinted_name(rel, content)
+        manifest[rel] = hashed
+        _write(hashed, content)
+        _precompress(hashed, content, totals)
+        totals["files"] += 1
+        totals["original"] += len(content)
+
+    with open(os.path.join(DIST_DIR, ASSET_MANIFEST), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2, sort_keys=True)
+
+    print(f"built {totals['files']} assets into {DIST_DIR}")
+    print(f"  original {totals['original']} bytes, gzip {totals['gzip']} bytes"
+          + (f", br {totals['br']} bytes" if brotli is not None else " (brotli 未安装，跳过 .br)"))
+    return manifest
+
+
+def main():
+    parser = argparse.ArgumentParser(description="静态资源指纹化与预压缩")
+    parser.add_argument("--clean", action="store_true", help="仅删除 dist/ 构建产物")
+    args = parser.parse_args()
+    if args.clean:
+        shutil.rmtree(DIST_DIR, ignore_errors=True)
+        print(f"removed {DIST_DIR}")
+        return
+    build()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+"""
+商品图片衍生图补生成脚本。
+
+新上传的图片在后台线程中自动生成衍生图（app/utils/images.py），
+本脚本用于为历史上传（或 Pillow 安装之前上传）的图片补生成缩略图 / 卡片 / 详情尺寸及 WebP 版本。
+只处理 Goods.mainimg 与 GoodsImage.url 中引用的 /uploads/ 本地图片，已有尺寸清单的默认跳过。
+
+用法：
+  python scripts/build_image_variants.py
+  python scripts/build_image_variants.py --force     # 重新生成全部
+  docker compose exec web python scripts/build_image_variants.py
+"""
+
+import argparse
+import os
+import sys
+
+# 确保从项目根目录导入 app 包
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import app
+from app.models.db import Goods, GoodsImage, db
+from app.utils import images
+from app.utils.catalog_cache import bump_catalog_version
+
+
+def _referenced_names():
+    urls = [row[0] for row in db.session.query(Goods.mainimg).all()]
+    urls += [row[0] for row in db.session.query(GoodsImage.url).all()]
+    names = {images.upload_name(url) for url in urls}
+    names.discard(None)
+    return sorted(names)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="为已上传的商品图片补生成衍生图")
+    parser.add_argument("--force", action="store_true", help="忽略已有尺寸清单，全部重新生成")
+    args = parser.parse_args()
+    if images.Image is None:
+        print("未安装 Pillow，无法生成衍生图（pip install Pillow）")
+        sys.exit(1)
+
+    with app.app_context():
+        names = _referenced_names()
+    generated = skipped = failed = 0
+    for name in names:
+        if not os.path.isfile(os.path.join(images.UPLOAD_DIR, name)):
+            failed += 1
+            print(f"missing  {name}")
+            continue
+        if not args.force and os.path.isfile(images.variants_path(name)):
+            skipped += 1
+            continue
+        try:
+            manifest = images.generate_variants(name)
+        except Exception as exc:
+            failed += 1
+            print(f"failed   {name}: {exc}")
+            continue
+        generated += 1
+        print(f"ok       {name}: " + ", ".join(f"{k}={v['width']}px" for k, v in manifest.items()))
+
+    if generated:
+        with app.app_context():
+            bump_catalog_version()
+    print(f"generated={generated} skipped={skipped} failed={failed}")
+
+
+if __name__ == "__main__":
+    main()
@@ -32,12 +32,25 @@ INDEXES = [
     ("goods", "idx_goods_status", "CREATE INDEX idx_goods_status ON goods (status)"),
     ("goods", "idx_goods_category", "CREATE INDEX idx_goods_category ON goods (category)"),
     ("goods", "idx_goods_price", "CREATE INDEX idx_goods_price ON goods (price)"),
+    # 首页 keyset 分页：(status, 排序列, id) 复合索引，seek 条件与 ORDER BY 均可走索引。
+    ("goods", "idx_goods_status_id", "CREATE INDEX idx_goods_status_id ON goods (status, id)"),
+    ("goods", "idx_goods_status_category_id", "CREATE INDEX idx_goods_status_category_id ON goods (status, category, id)"),
+    ("goods", "idx_goods_status_brand_id", "CREATE INDEX idx_goods_status_brand_id ON goods (status, brand, id)"),
+    ("goods", "idx_goods_status_price_id", "CREATE INDEX idx_goods_status_price_id ON goods (status, price, id)"),
+    ("goods", "idx_goods_status_sales_id", "CREATE INDEX idx_goods_status_sales_id ON goods (status, sales_count, id)"),
+    ("goods", "idx_goods_status_rating_id", "CREATE INDEX idx_goods_status_rating_id ON goods (status, rating_avg, id)"),
     ("cart_items", "idx_cart_items_user_id", "CREATE INDEX idx_cart_items_user_id ON cart_items (user_id)"),
     ("cart_items", "idx_cart_items_goods_id", "CREATE INDEX idx_cart_items_goods_id ON cart_items (goods_id)"),
     ("cart_items", "idx_cart_items_user_goods", "CREATE INDEX idx_cart_items_user_goods ON cart_items (user_id, goods_id)"),
     ("`order`", "idx_order_user_id", "CREATE INDEX idx_order_user_id ON `order` (user_id)"),
     ("`order`", "idx_order_generatetime", "CREATE INDEX idx_order_generatetime ON `order` (generatetime)"),
+    # 个人中心订单列表 keyset 分页：user_id = ? AND (generatetime, id) < (?, ?) ORDER BY generatetime DESC, id DESC。
+    ("`order`", "idx_order_user_generatetime",
+     "CREATE INDEX idx_order_user_generatetime ON `order` (user_id, generatetime, id)"),
     ("`order`", "idx_order_payment_status", "CREATE INDEX idx_order_payment_status ON `order` (payment_status)"),
+    # 超时订单取消：payment_status = 'pending' AND generatetime < ? ORDER BY generatetime 走索引范围扫描。
+    ("`order`", "idx_order_status_generatetime",
+     "CREATE INDEX idx_order_status_generatetime ON `order` (payment_status, generatetime)"),
     ("order_items", "idx_order_items_order_id", "CREATE INDEX idx_order_items_order_id ON order_items (order_id)"),
     ("order_items", "idx_order_items_goods_id", "CREATE INDEX idx_order_items_goods_id ON order_items (goods_id)"),
     ("address", "idx_address_user_id", "CREATE INDEX idx_address_user_id ON address (user_id)"),
@@ -0,0 +1,49 @@
+"""
+超时未支付订单取消脚本。
+
+把下单超过 ORDER_EXPIRY_MINUTES（默认 30）分钟仍为 pending 的订单分批改为 cancelled，
+输出取消数量、批次数与吞吐。正常情况下由各 worker 的后台线程定期执行（见 app/utils/order_expiry.py），
+本脚本用于首次上线清理积压或手动补跑；与后台线程共用 Redis 锁，不会并发执行。
+
+用法：
+  python scripts/expire_orders.py --dry-run              # 只统计待取消订单数
+  python scripts/expire_orders.py                        # 取消全部超时订单
+  python scripts/expire_orders.py --minutes 1440 --batch-size 2000
+  docker compose exec web python scripts/expire_orders.py
+"""
+
+import argparse
+import os
+import sys
+
+# 确保从项目根目录导入 app 包
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import app
+from app.utils.order_expiry import ORDER_EXPIRY_BATCH_SIZE, ORDER_EXPIRY_MINUTES, expire_stale_orders
+
+
+def main():
+    parser = argparse.ArgumentParser(description="超时未支付订单取消")
+    parser.add_argument("--minutes", type=int, default=ORDER_EXPIRY_MINUTES or 30, help="下单后多少分钟未支付视为超时")
+    parser.add_argument("--batch-size", type=int, default=ORDER_EXPIRY_BATCH_SIZE, help="每批取消的订单数")
+    parser.add_argument("--max-batches", type=int, default=None, help="本次最多执行的批次数")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不修改数据")
+    args = parser.parse_args()
+
+    with app.app_context():
+        stats = expire_stale_orders(args.minutes, args.batch_size, args.max_batches, dry_run=args.dry_run)
+
+    if stats["skipped"]:
+        print("another expiry run is in progress, skipped")
+        return
+    print(f"cutoff: {stats['cutoff']}")
+    if args.dry_run:
+        print(f"orders pending: {stats['pending']}")
+        return
+    print(f"cancelled: {stats['cancelled']} in {stats['batches']} batches, "
+          f"{stats['elapsed_ms']} ms ({stats['orders_per_sec']} orders/s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""
+站内信保留策略执行脚本。
+
+把 created_at 早于保留天数的 mail_logs 行按天压缩归档到 mail_log_archives，并从主表删除，
+输出归档行数、批次数、压缩前后字节数以及从热数据表移出的字节数。
+逻辑见 app/utils/mail_retention.py；多实例同时执行时只有一个会真正运行。
+
+用法：
+  python scripts/mail_retention.py                    # 默认保留 MAIL_RETENTION_DAYS（7）天
+  python scripts/mail_retention.py --days 3 --batch-size 500
+  python scripts/mail_retention.py --dry-run          # 只统计待归档行数
+  python scripts/mail_retention.py --show 2024-01-01  # 查看某天的归档内容
+  docker compose exec web python scripts/mail_retention.py
+
+建议通过 cron 每天执行一次，例如：
+  15 3 * * * docker compose exec -T web python scripts/mail_retention.py
+"""
+
+import argparse
+import os
+import sys
+from datetime import date
+
+# 确保从项目根目录导入 app 包
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import app
+from app.utils.mail_retention import ARCHIVE_BATCH_SIZE, MAIL_RETENTION_DAYS, archive_expired_mail, load_archived_mail
+
+
+def main():
+    parser = argparse.ArgumentParser(description="站内信过期归档")
+    parser.add_argument("--days", type=int, default=MAIL_RETENTION_DAYS, help="热数据保留天数")
+    parser.add_argument("--batch-size", type=int, default=ARCHIVE_BATCH_SIZE, help="每批归档行数")
+    parser.add_argument("--max-batches", type=int, default=None, help="本次最多执行的批次数")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不移动数据")
+    parser.add_argument("--show", metavar="YYYY-MM-DD", help="打印某天的归档邮件")
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.show:
+            for mail in load_archived_mail(date.fromisoformat(args.show)):
+                print(f"{mail['id']:>8}  {mail['created_at']}  {mail['receiver']}  {mail['subject']}")
+            return
+
+        stats = archive_expired_mail(args.days, args.batch_size, args.max_batches, dry_run=args.dry_run)
+
+    if stats["skipped"]:
+        print("another retention run is in progress, skipped")
+        return
+    print(f"cutoff: {stats['cutoff']}")
+    if args.dry_run:
+        print(f"rows pending: {stats['rows_pending']}")
+        return
+    print(f"rows moved: {stats['rows_moved']} in {stats['batches']} batches ({stats['archives']} archive blocks)")
+    print(f"bytes: raw {stats['raw_bytes']}, compressed {stats['compressed_bytes']}, reclaimed {stats['reclaimed_bytes']}")
+
+
+if __name__ == "__main__":
+    main()
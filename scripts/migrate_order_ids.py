@@ -0,0 +1,128 @@
+"""
+历史订单主键迁移脚本：32 位随机 UUID → 19 位按时间递增主键（见 app/utils/order_ids.py）。
+
+按 (generatetime, id) 顺序分批，为每个旧订单用下单时间 + 保留 worker 号 1023 生成新主键，
+同一事务中用 CASE 批量改写 order.id、order_items.order_id 与 stock_settlements.order_id。
+订单号 order_number 保持不变（用户与客服可能已经记录）。新旧主键共存不影响运行，可随时中断后重跑。
+
+注意：迁移后旧的支付 / 详情链接（/order/check/<旧 ID>）失效，建议在维护窗口执行；
+MySQL 的外键不带 ON UPDATE CASCADE，迁移事务内临时关闭 FOREIGN_KEY_CHECKS（仅当前连接）。
+
+用法：
+  python scripts/migrate_order_ids.py --dry-run       # 只统计待迁移订单数
+  python scripts/migrate_order_ids.py                 # 默认每批 500 单
+  python scripts/migrate_order_ids.py --batch-size 2000
+  docker compose exec web python scripts/migrate_order_ids.py
+"""
+
+import argparse
+import os
+import sys
+import time
+
+# 确保从项目根目录导入 app 包
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from sqlalchemy import BigInteger, case, cast, func, select, text, update
+
+from app import app
+from app.models.db import Order, OrderItem, StockSettlement, db
+from app.utils.order_ids import (
+    MAX_SEQUENCE,
+    MIGRATION_WORKER_ID,
+    ORDER_ID_EPOCH_MS,
+    ORDER_ID_WIDTH,
+    SEQUENCE_BITS,
+    WORKER_BITS,
+    compose_order_id,
+)
+
+_legacy = func.length(Order.id) != ORDER_ID_WIDTH
+
+
+class _Renumberer:
+    """按下单时间递增分配新主键；同一毫秒内递增序号，用尽时顺延到下一毫秒。"""
+
+    def __init__(self):
+        self.last_ms, self.sequence = 0, -1
+
+    def resume(self) -> None:
+        """从已迁移的最大主键（worker 号为 MIGRATION_WORKER_ID）继续编号，中断后重跑不会撞号。"""
+        numeric = cast(Order.id, BigInteger)
+        worker = (numeric // (1 << SEQUENCE_BITS)) % (1 << WORKER_BITS)
+        last = db.session.scalar(select(func.max(numeric)).where(~_legacy, worker == MIGRATION_WORKER_ID))
+        if last is not None:
+            self.last_ms = (last >> (WORKER_BITS + SEQUENCE_BITS)) + ORDER_ID_EPOCH_MS
+            self.sequence = last & MAX_SEQUENCE
+
+    def next_id(self, generated_at) -> str:
+        ms = int(generated_at.timestamp() * 1000) if generated_at else ORDER_ID_EPOCH_MS
+        ms = max(ms, ORDER_ID_EPOCH_MS, self.last_ms)
+        if ms == self.last_ms and self.sequence < MAX_SEQUENCE:
+            self.sequence += 1
+        elif ms == self.last_ms:
+            ms, self.sequence = ms + 1, 0
+        else:
+            self.sequence = 0
+        self.last_ms = ms
+        return compose_order_id(ms, MIGRATION_WORKER_ID, self.sequence)
+
+
+def _migrate_batch(rows, renumberer: _Renumberer) -> int:
+    mapping = {order_id: renumberer.next_id(generated_at) for order_id, generated_at in rows}
+    old_ids = list(mapping)
+    mysql = db.engine.dialect.name == "mysql"
+    try:
+        if mysql:
+            db.session.execute(text("SET FOREIGN_KEY_CHECKS = 0"))
+        try:
+            for column in (OrderItem.order_id, StockSettlement.order_id, Order.id):
+                db.session.execute(
+                    update(column.class_)
+                    .where(column.in_(old_ids))
+                    .values({column.key: case(mapping, value=column)})
+                    .execution_options(synchronize_session=False)
+                )
+        finally:
+            # 会话变量跟随连接回到连接池：失败时也要在回滚、归还连接之前恢复外键检查。
+            if mysql:
+                db.session.execute(text("SET FOREIGN_KEY_CHECKS = 1"))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return len(mapping)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="历史订单主键迁移")
+    parser.add_argument("--batch-size", type=int, default=500, help="每批迁移的订单数")
+    parser.add_argument("--dry-run", action="store_true", help="只统计，不修改数据")
+    args = parser.parse_args()
+
+    with app.app_context():
+        pending = db.session.scalar(select(func.count()).select_from(Order).where(_legacy))
+        print(f"legacy orders: {pending}")
+        if args.dry_run or not pending:
+            return
+
+        renumberer, migrated, batches = _Renumberer(), 0, 0
+        renumberer.resume()
+        started = time.perf_counter()
+        while True:
+            # 已迁移的行不再满足 _legacy 条件，每批都从头取即可，中断后重跑从剩余部分继续。
+            rows = db.session.execute(
+                select(Order.id, Order.generatetime).where(_legacy)
+                .order_by(Order.generatetime, Order.id).limit(args.batch_size)
+            ).all()
+            if not rows:
+                break
+            migrated += _migrate_batch(rows, renumberer)
+            batches += 1
+        elapsed = time.perf_counter() - started
+
+    print(f"migrated: {migrated} orders in {batches} batches, {elapsed:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""
+库存预占对账脚本（INVENTORY_MODE=reserve）。
+
+按不变式 Redis 可用库存 = goods.stock - 未结算数量 - 有效预占数量 检查每个已初始化的商品，
+输出偏差（期望 - 实际）；--fix 时用 INCRBY 补差。也可手动回收到期预占并结算待扣减数量
+（正常情况下由各 worker 的后台线程完成）。逻辑见 app/utils/inventory.py。
+
+用法：
+  python scripts/reconcile_inventory.py            # 只检查
+  python scripts/reconcile_inventory.py --fix      # 检查并修正
+  python scripts/reconcile_inventory.py --settle   # 先回收到期预占、结算全部待扣减数量，再检查
+  docker compose exec web python scripts/reconcile_inventory.py --settle --fix
+"""
+
+import argparse
+import os
+import sys
+
+# 确保从项目根目录导入 app 包
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from app import app
+from app.utils.inventory import reap_expired_holds, reconcile_inventory, settle_pending
+
+
+def main():
+    parser = argparse.ArgumentParser(description="库存预占对账")
+    parser.add_argument("--fix", action="store_true", help="修正 Redis 可用库存偏差")
+    parser.add_argument("--settle", action="store_true", help="对账前回收到期预占并结算待扣减数量")
+    args = parser.parse_args()
+
+    with app.app_context():
+        if args.settle:
+            reaped = reap_expired_holds()
+            settled = 0
+            while True:
+                rows = settle_pending()
+                if not rows:
+                    break
+                settled += rows
+            print(f"reaped holds: {reaped}, settled rows: {settled}")
+        report = reconcile_inventory(fix=args.fix)
+
+    print(f"checked goods: {report['checked']}")
+    for goods_id, diff in sorted(report["drift"].items()):
+        print(f"  goods {goods_id}: drift {diff:+d}")
+    if report["drift"]:
+        print("fixed" if report["fixed"] else "run with --fix to correct")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,21 @@
+"""
+测试公共夹具。
+
+- sqlite_db: 内存 SQLite 上的最小 Flask 应用，已进入应用上下文并建好全部表，用完即弃
+"""
+
+import pytest
+from flask import Flask
+
+from app.models.db import db
+
+
+@pytest.fixture
+def sqlite_db():
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = "sqlite://"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield db
+        db.session.remove()
@@ -3,16 +3,55 @@ HackShop 基础单元测试。
 
 测试范围（不依赖数据库 / Redis）：
 - _parse_positive_int: 数量参数解析与兜底
+- _cart_goods_ids: 购物车行标识（商品 ID）解析，忽略非法值
 - generate_uuid_hex: ID 生成非空且不重复
-- _generate_order_number: 同一用户高频调用不碰撞
+- _generate_order_number: 高频调用不碰撞
+- generate_order_id: 订单主键定长、按时间递增且不重复
 - get_order_status_meta: 未知状态回退到默认值
 - unique_filename: 保留原始文件扩展名
+- encode_cursor / decode_cursor: 首页 keyset 游标往返与非法游标兜底
+- encode_history_cursor / decode_history_cursor: 个人中心订单游标往返与非法游标兜底
+- tokenize: 搜索切词（英文小写 + 中文二元组）
+- SuggestIndex._rank: 短前缀在完整前缀区间内按销量排序，不受字典序位置影响
+- price_bucket: 价格分面区间边界（左闭右开）
+- FacetIndex: 空分类商品在全站作用域只计一次，移除后计数归零
+- fingerprinted_name / rewrite_css_urls: 静态资源哈希命名与 CSS 引用改写
+- image_src / image_srcset: 外链或未生成衍生图时回退原图
+- MemoryRedis: 进程内 Redis 替身的 NX / 过期 / 哈希 / 管道语义与登录限流脚本的等价实现
+- 库存预占脚本（Python 等价实现）: 不足时整体拒绝、重复预占、释放后归还库存
+- _create_order: 购物车结算写订单的 SQL 条数与商品数无关，总额为精确 Decimal（内存 SQLite）
+- fetch_mails: since_id 超过一批时按升序补齐，不跳过中间的新邮件（内存 SQLite）
+- expire_stale_orders: 只分批取消超时的 pending 订单（内存 SQLite）
+- idempotent: 关闭时原样执行；开启后同键重放、请求体不同返回 422（MemoryRedis）
+
+标注"内存 SQLite"的用例使用 tests/conftest.py 中的 sqlite_db 夹具。
 
 运行方式：pytest tests/test_basic.py
 """
 
-from app.controller.order import _generate_order_number, _parse_positive_int
-from app.utils.tools import generate_uuid_hex, get_order_status_meta, unique_filename
+from datetime import datetime, timedelta
+from decimal import Decimal
+from types import SimpleNamespace
+
+from flask import Flask
+from sqlalchemy import event
+
+from app.controller.order import _cart_goods_ids, _create_order, _generate_order_number, _parse_positive_int
+from app.models.db import Goods, MailLog, Order, OrderItem, User, db
+from app.utils.assets import fingerprinted_name, rewrite_css_urls
+from app.utils.catalog import decode_cursor, encode_cursor
+from app.utils.facets import FacetIndex, price_bucket
+from app.utils import idempotency
+from app.utils.images import image_src, image_srcset, upload_name
+from app.utils.inventory import _release_py, _reserve_py
+from app.utils.mailbox import fetch_mails
+from app.utils.memory_redis import MemoryRedis
+from app.utils.order_expiry import expire_stale_orders
+from app.utils.order_history import decode_history_cursor, encode_history_cursor
+from app.utils.order_ids import ORDER_ID_WIDTH, compose_order_id, generate_order_id, order_id_datetime
+from app.utils.search import tokenize
+from app.utils.suggest import SuggestIndex
+from app.utils.tools import _login_throttle_py, generate_uuid_hex, get_order_status_meta, unique_filename
 
 
 def test_parse_positive_int_with_valid_value():
@@ -24,6 +63,11 @@ def test_parse_positive_int_with_invalid_value():
     assert _parse_positive_int("-9", default=2) == 2
 
 
+def test_cart_goods_ids_parsing():
+    assert _cart_goods_ids(["3", 4, "x", None]) == [3, 4]
+    assert _cart_goods_ids("3") == []
+
+
 def test_generated_ids_are_non_empty_and_distinct():
     id_a = generate_uuid_hex()
     id_b = generate_uuid_hex()
@@ -33,10 +77,19 @@ def test_generated_ids_are_non_empty_and_distinct():
 
 
 def test_generate_order_number_should_be_unique():
-    numbers = {_generate_order_number(1) for _ in range(100)}
+    numbers = {_generate_order_number(generate_order_id()) for _ in range(100)}
     assert len(numbers) == 100
 
 
+def test_order_ids_are_time_ordered_and_compact():
+    ids = [generate_order_id() for _ in range(5000)]
+    assert ids == sorted(ids) and len(set(ids)) == len(ids)
+    assert all(len(order_id) == ORDER_ID_WIDTH and order_id.isdigit() for order_id in ids)
+    assert abs((order_id_datetime(ids[-1]) - datetime.now()).total_seconds()) < 5
+    # 时间戳占高位：早一毫秒的 ID 无论 worker 号 / 序号多大都更小。
+    assert compose_order_id(1704038400001, 1022, 4095) < compose_order_id(1704038400002, 0, 0)
+
+
 def test_get_order_status_meta_fallback():
     label, cls = get_order_status_meta("unknown")
     assert label == "待付款"
@@ -46,3 +99,189 @@ def test_get_order_status_meta_fallback():
 def test_unique_filename_should_keep_extension():
     name = unique_filename("avatar.png")
     assert name.endswith(".png")
+
+
+def test_catalog_cursor_round_trip():
+    cursor = encode_cursor("price-low", "1999.90", 42)
+    assert decode_cursor("price-low", cursor) == (Decimal("1999.90"), 42)
+
+
+def test_catalog_cursor_rejects_invalid_or_mismatched_sort():
+    assert decode_cursor("default", "not-a-cursor") is None
+    assert decode_cursor("sales", encode_cursor("rating", 4.5, 7)) is None
+
+
+def test_order_history_cursor_round_trip():
+    generated_at = datetime(2026, 1, 2, 3, 4, 5, 678000)
+    cursor = encode_history_cursor(generated_at, "0001234567890123456")
+    assert decode_history_cursor(cursor) == (generated_at, "0001234567890123456")
+    assert decode_history_cursor("not-a-cursor") is None
+    assert decode_history_cursor("") is None
+
+
+def test_search_tokenize_mixed_text():
+    assert tokenize("iPhone 14 深空黑色", for_query=True) == ["iphone", "14", "深空", "空黑", "黑色"]
+    assert "黑" in tokenize("黑色")
+    assert tokenize("黑", for_query=True) == ["黑"]
+
+
+def test_suggest_ranks_whole_prefix_range_by_sales():
+    index = SuggestIndex()
+    for i in range(500):
+        index._add(SimpleNamespace(id=i + 1, goodsname=f"a{i:04d}", sales_count=i, brand=None, category=None))
+    assert [entry[2] for _, entry in index._rank("a")[:2]] == ["a0499", "a0498"]
+    assert [entry[2] for _, entry in index._rank("a00")[:1]] == ["a0099"]
+
+
+def test_price_bucket_boundaries():
+    assert price_bucket(None) == "0-100"
+    assert price_bucket(Decimal("99.99")) == "0-100"
+    assert price_bucket(100) == "100-500"
+    assert price_bucket(8999) == "5000+"
+
+
+def test_facet_counts_goods_without_category_once():
+    index = FacetIndex()
+    index._add(SimpleNamespace(id=1, category="", brand="b", price=Decimal("10"), stock=1))
+    assert index.scopes[""]["brand"] == {"b": 1}
+    index._discard(1)
+    assert index.scopes[""]["brand"] == {}
+
+
+def test_asset_fingerprint_and_css_url_rewrite():
+    hashed = fingerprinted_name("webfonts/fa-solid-900.woff2", b"font")
+    assert hashed.startswith("webfonts/fa-solid-900.") and hashed.endswith(".woff2")
+    assert hashed != fingerprinted_name("webfonts/fa-solid-900.woff2", b"font v2")
+
+    manifest = {"webfonts/fa-solid-900.woff2": hashed}
+    css = 'src:url(../webfonts/fa-solid-900.woff2?v=6) format("woff2"),url(../webfonts/missing.ttf);b:url("data:x")'
+    out = rewrite_css_urls(css, "css/all.min.css", manifest)
+    assert f"url(../{hashed}?v=6)" in out
+    assert "url(../webfonts/missing.ttf)" in out and 'url("data:x")' in out
+
+
+def test_image_variants_fall_back_to_original():
+    external = "https://images.unsplash.com/photo-1?w=800"
+    assert image_src(external, "thumb") == external
+    assert image_srcset(external) == ""
+    assert upload_name("/uploads/../config.py") is None
+    assert image_src("/uploads/not-generated-yet.jpg", "card") == "/uploads/not-generated-yet.jpg"
+
+
+def test_memory_redis_semantics_and_login_throttle():
+    client = MemoryRedis()
+    assert client.set("lock", "1", nx=True, ex=5) is True
+    assert client.set("lock", "1", nx=True, ex=5) is None
+    assert 0 < client.ttl("lock") <= 5 and client.ttl("missing") == -2
+
+    pipe = client.pipeline(transaction=False)
+    pipe.incr("n")
+    pipe.hincrby("stats", "hits", 2)
+    pipe.get("n")
+    assert pipe.execute() == [1, 2, "1"]
+    assert client.hgetall("stats") == {"hits": "2"}
+    assert client.mget(["n", "missing"]) == ["1", None]
+
+    keys = ["login:lock:x", "login:fail:x"]
+    results = [_login_throttle_py(client, keys, ["0", "3", "300"]) for _ in range(4)]
+    assert [state for state, _ in results] == [2, 2, 2, 1]
+    assert results[3][1] == 300
+
+
+def test_inventory_reserve_and_release_scripts():
+    client = MemoryRedis()
+    client.set("inv:stock:1", 5)
+    client.set("inv:stock:2", 1)
+    keys = ["inv:holds", "inv:hold:o1", "inv:stock:1", "inv:stock:2"]
+    assert _reserve_py(client, keys[:2] + ["inv:stock:9"], ["o1", "100", "1", "9"]) == [-1, 1]
+    # 第二个商品不足时两个商品都不扣减。
+    assert _reserve_py(client, keys, ["o1", "100", "2", "3", "1", "2"]) == [0, 2]
+    assert client.mget(["inv:stock:1", "inv:stock:2"]) == ["5", "1"]
+
+    assert _reserve_py(client, keys, ["o1", "100", "2", "1", "1", "2"]) == [1, 0]
+    assert _reserve_py(client, keys, ["o1", "100", "2", "0", "1", "2"]) == [2, 0]
+    assert client.mget(["inv:stock:1", "inv:stock:2"]) == ["3", "0"]
+    assert client.hgetall("inv:hold:o1") == {"1": "2", "2": "1"} and client.zscore("inv:holds", "o1") == 100
+
+    assert _release_py(client, ["inv:holds", "inv:hold:o1"], ["o1", "inv:stock:"]) == 1
+    assert _release_py(client, ["inv:holds", "inv:hold:o1"], ["o1", "inv:stock:"]) == 0
+    assert client.mget(["inv:stock:1", "inv:stock:2"]) == ["5", "1"]
+    assert client.zcard("inv:holds") == 0 and not client.exists("inv:hold:o1")
+
+
+def test_create_order_statement_count_is_constant(sqlite_db):
+    db.session.add(User(username="u", email="u@t.com", password="p", balance=0))
+    db.session.add_all(Goods(goodsname=f"g{i}", category="c", mainimg="", content="", stock=9,
+                             price=Decimal("19.99")) for i in range(50))
+    db.session.commit()
+
+    statements = []
+    event.listen(db.engine, "before_cursor_execute", lambda *args: statements.append(args[2]))
+    counts = []
+    for size in (1, 50):
+        goods = Goods.query.order_by(Goods.id).all()
+        statements.clear()
+        order_id = _create_order(1, [(g, 3) for g in goods[:size]])
+        db.session.commit()
+        counts.append(len(statements))
+        order = db.session.get(Order, order_id)
+        assert Decimal(order.total_amount) == Decimal("59.97") * size
+        assert OrderItem.query.filter_by(order_id=order_id).count() == size
+    assert counts == [2, 2]
+
+
+def test_fetch_mails_since_id_walks_forward_without_gaps(sqlite_db):
+    db.session.add_all(MailLog(subject="s", sender="a", receiver="b", content="c") for _ in range(25))
+    db.session.commit()
+
+    seen, since_id = [], 0
+    while True:
+        mails, next_since_id = fetch_mails(since_id=since_id, limit=10)
+        assert [m.id for m in mails] == sorted((m.id for m in mails), reverse=True)
+        seen += [m.id for m in mails]
+        if next_since_id is None:
+            break
+        assert next_since_id == mails[0].id
+        since_id = next_since_id
+    assert sorted(seen) == list(range(1, 26))
+
+
+def test_expire_stale_orders_cancels_only_old_pending_orders(sqlite_db):
+    old, fresh = datetime.now() - timedelta(hours=2), datetime.now()
+    rows = [("pending", old)] * 5 + [("paid", old), ("pending", fresh)]
+    for i, (status, generated_at) in enumerate(rows):
+        db.session.add(Order(id=f"o{i}", order_number=f"n{i}", payment_status=status, generatetime=generated_at,
+                             payment_method="online", total_amount=1))
+    db.session.commit()
+
+    stats = expire_stale_orders(older_than_minutes=30, batch_size=2)
+    assert stats["cancelled"] == 5 and stats["batches"] == 3
+    statuses = dict(db.session.execute(db.select(Order.id, Order.payment_status)).all())
+    assert statuses == {**{f"o{i}": "cancelled" for i in range(5)}, "o5": "paid", "o6": "pending"}
+
+
+def test_idempotent_view_replays_first_response(monkeypatch):
+    app = Flask(__name__)
+    app.secret_key = "test"
+    calls = []
+
+    @app.route("/pay", methods=["POST"])
+    @idempotency.idempotent
+    def pay():
+        calls.append(1)
+        return {"calls": len(calls)}, 201
+
+    client = app.test_client()
+    headers = {"Idempotency-Key": "k1"}
+    client.post("/pay", data={"x": "1"}, headers=headers)
+    assert len(calls) == 1  # 默认关闭：不读写 Redis，直接执行
+
+    monkeypatch.setattr(idempotency, "IDEMPOTENCY_ENABLED", True)
+    monkeypatch.setattr(idempotency, "redis_client", MemoryRedis())
+    first = client.post("/pay", data={"x": "1"}, headers=headers)
+    replayed = client.post("/pay", data={"x": "1"}, headers=headers)
+    assert first.status_code == replayed.status_code == 201
+    assert replayed.get_json() == {"calls": 2} and replayed.headers["Idempotent-Replayed"] == "true"
+    assert client.post("/pay", data={"x": "2"}, headers=headers).status_code == 422
+    assert client.post("/pay", data={"x": "1"}).get_json() == {"calls": 3}
+